@@ -9,11 +9,16 @@ from langchain.vectorstores import FAISS
 from langchain.chains import RetrievalQA
 import os
 from dotenv import load_dotenv
+# LLM response cache and rate limiting (agent_ui, see requirements.txt)
+from agent_ui.llm_cache import cached_embeddings, enable_llm_cache
+from agent_ui.scheduler import scheduler
+client_kwargs, scheduled_embeddings = scheduler.client_kwargs, scheduler.embeddings
 from src.prompt import *
 
 
 # OpenAI authentication
 load_dotenv()
+enable_llm_cache()   # set LLM_CACHE_MODE=record|replay to record/replay LLM responses
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
 
@@ -59,9 +64,11 @@ def llm_pipeline(file_path):
 
     document_ques_gen, document_answer_gen = file_processing(file_path)
 
+    # question/answer generation is batch work: interactive chats get served first
     llm_ques_gen_pipeline = ChatOpenAI(
         temperature = 0.3,
-        model = "gpt-3.5-turbo"
+        model = "gpt-3.5-turbo",
+        **client_kwargs("gpt-3.5-turbo", priority="batch")
     )
 
    
@@ -83,11 +90,13 @@ def llm_pipeline(file_path):
 
     ques = ques_gen_chain.run(document_ques_gen)
 
-    embeddings = OpenAIEmbeddings()
+    embeddings = cached_embeddings(scheduled_embeddings(OpenAIEmbeddings(), "text-embedding-ada-002"),
+                                   "text-embedding-ada-002")
 
     vector_store = FAISS.from_documents(document_answer_gen, embeddings)
 
-    llm_answer_gen = ChatOpenAI(temperature=0.1, model="gpt-3.5-turbo")
+    llm_answer_gen = ChatOpenAI(temperature=0.1, model="gpt-3.5-turbo",
+                                **client_kwargs("gpt-3.5-turbo", priority="batch"))
 
     ques_list = ques.split("\n")
     filtered_ques_list = [element for element in ques_list if element.endswith('?') or element.endswith('.')]
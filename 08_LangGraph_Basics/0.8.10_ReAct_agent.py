@@ -1,15 +1,20 @@
 from typing import Annotated, Sequence, TypedDict
 from dotenv import load_dotenv  
+# LLM response cache and rate limiting (agent_ui, see requirements.txt)
+from agent_ui.llm_cache import enable_llm_cache
+from agent_ui.scheduler import scheduler
+from agent_ui.tool_cache import cached_tool
+client_kwargs = scheduler.client_kwargs
 from langchain_core.messages import BaseMessage # The foundational class for all message types in LangGraph
 from langchain_core.messages import ToolMessage # Passes data back to LLM after it calls a tool such as the content and the tool_call_id
 from langchain_core.messages import SystemMessage # Message for providing instructions to the LLM
 from langchain_openai import ChatOpenAI
-from langchain_core.tools import tool
 from langgraph.graph.message import add_messages
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import ToolNode
 
 load_dotenv()
+enable_llm_cache()   # set LLM_CACHE_MODE=record|replay to record/replay LLM responses
 
 # State with Annotated (standard procedure in LangGraph)
 class AgentState(TypedDict):
@@ -17,19 +22,19 @@ class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]    # BaseMessage is the parent class for all LangChain messages
 
 
-# Tools definitions
-@tool
+# Tools definitions (pure functions: results are memoized)
+@cached_tool
 def add(a: int, b:int):
     """This is an addition function that adds 2 numbers together"""
 
     return a + b 
 
-@tool
+@cached_tool
 def subtract(a: int, b: int):
     """Subtraction function"""
     return a - b
 
-@tool
+@cached_tool
 def multiply(a: int, b: int):
     """Multiplication function"""
     return a * b
@@ -38,7 +43,7 @@ tools = [add, subtract, multiply]
 
 
 # llm + bind tools
-model = ChatOpenAI(model = "gpt-4o").bind_tools(tools)
+model = ChatOpenAI(model = "gpt-4o", **client_kwargs("gpt-4o")).bind_tools(tools)
 
 
 # define model call node
@@ -1,47 +1,85 @@
-from typing import Annotated, Sequence, TypedDict
+import asyncio
+import os
+import re
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Annotated, Dict, Sequence
+from typing_extensions import TypedDict
 from dotenv import load_dotenv  
-from langchain_core.messages import BaseMessage, HumanMessage, ToolMessage, SystemMessage
+# LLM response cache and rate limiting (agent_ui, see requirements.txt)
+from agent_ui.llm_cache import enable_llm_cache
+from agent_ui.scheduler import scheduler
+client_kwargs = scheduler.client_kwargs
+from langchain_core.messages import BaseMessage, HumanMessage, ToolMessage, SystemMessage, RemoveMessage, AIMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_openai import ChatOpenAI
-from langchain_core.tools import tool
+from langchain_core.tools import tool, InjectedToolCallId
 from langgraph.graph.message import add_messages
 from langgraph.graph import StateGraph, END, START
-from langgraph.prebuilt import ToolNode
+from langgraph.prebuilt import ToolNode, InjectedState
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.types import Command, interrupt
 
 load_dotenv()
+enable_llm_cache()   # set LLM_CACHE_MODE=record|replay to record/replay LLM responses
+
+# max number of messages kept in state (the document itself lives in the system prompt, so old turns can go)
+MAX_MESSAGES = 20
+# saved documents go to <SAVE_FOLDER>/<session>/<name>.txt, whatever path the model asks for
+SAVE_FOLDER = Path(os.environ.get("DRAFTER_SAVE_FOLDER", "drafts"))
+
+
+def update_tool_index(existing: Dict[str, str] | None = None, new: Dict[str, str] | None = None) -> Dict[str, str]:
+    """Reducer for the tool index: newer entries overwrite older ones."""
+    return {**(existing or {}), **(new or {})}
 
-# This is the global variable to store document content
-document_content = ""
 
 class AgentState(TypedDict):
     messages : Annotated[Sequence[BaseMessage], add_messages]
+    document : str      # the document lives in state (not in a global), so every session has its own
+    tool_index : Annotated[Dict[str, str], update_tool_index]    # tool name -> id of its latest successful ToolMessage
 
 
 @tool
-def update(content: str) -> str:
+def update(content: str, tool_call_id: Annotated[str, InjectedToolCallId]) -> Command:
     """Updates the document with the provided content."""
-    global document_content
-    document_content = content
-    return f"Document has been updated successfully! The current content is:\n{document_content}"
+    return Command(update={
+        "document": content,
+        "messages": [
+            ToolMessage(f"Document has been updated successfully! The current content is:\n{content}",
+                        name="update", tool_call_id=tool_call_id)
+        ]
+    })
+
+def safe_name(name: str, default: str) -> str:
+    """A file or folder name that can't leave its folder: no separators, no dots, nothing but word characters."""
+    return re.sub(r"[^\w\- ]+", "_", name).strip(" _") or default
+
+
+def save_path(filename: str, session_id: str) -> Path:
+    """Where a document is saved: the model only chooses the name, the folder is the session's own."""
+    return SAVE_FOLDER / safe_name(session_id, "session") / f"{safe_name(Path(filename).stem, 'document')}.txt"
+
 
 @tool
-def save(filename: str) -> str:
+def save(filename: str, state: Annotated[AgentState, InjectedState], config: RunnableConfig) -> str:
     """Save the current document to a text file and finish the process.
     
     Args:
         filename: Name for the text file.
     """
 
-    global document_content
-
-    if not filename.endswith('.txt'):
-        filename = f"{filename}.txt"
-
+    path = save_path(Path(filename).name, config["configurable"]["thread_id"])
 
     try:
-        with open(filename, 'w') as file:
-            file.write(document_content)
-        print(f"\n💾 Document has been saved to: {filename}")
-        return f"Document has been saved successfully to '{filename}'."
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(state.get("document", ""))
+        print(f"\n💾 Document has been saved to: {path}")
+        return f"Document has been saved successfully to '{path.name}'."
     
     except Exception as e:
         return f"Error saving document: {str(e)}"
@@ -49,10 +87,11 @@ def save(filename: str) -> str:
 
 tools = [update, save]
 
-model = ChatOpenAI(model="gpt-4o").bind_tools(tools)
+model = ChatOpenAI(model="gpt-4o", **client_kwargs("gpt-4o")).bind_tools(tools)
 
 
-def our_agent(state: AgentState) -> AgentState:
+def start_turn(state: AgentState) -> tuple[list, HumanMessage]:
+    """Builds the model input for this turn. Pauses the graph (interrupt) until the user answers."""
     system_prompt = SystemMessage(content=f"""
     You are Drafter, a helpful writing assistant. You are going to help the user update and modify documents.
     
@@ -60,90 +99,316 @@ def our_agent(state: AgentState) -> AgentState:
     - If the user wants to save and finish, you need to use the 'save' tool.
     - Make sure to always show the current document state after modifications.
     
-    The current document content is:{document_content}
+    The current document content is:{state.get("document", "")}
     """)
 
     # it there have been no messages yet:
     if not state["messages"]:
         user_input = "I'm ready to help you update a document. What would you like to create?"
-        user_message = HumanMessage(content=user_input)
-
     else:
-        user_input = input("\nWhat would you like to do with the document? ")
-        print(f"\n👤 USER: {user_input}")
-        user_message = HumanMessage(content=user_input)
+        # the graph stops here and is resumed with Command(resume=user_input): no blocking input() in the node
+        user_input = interrupt("What would you like to do with the document?")
+
+    user_message = HumanMessage(content=user_input)
+    return [system_prompt] + list(state["messages"]) + [user_message], user_message
+
+
+def end_turn(state: AgentState, user_message: HumanMessage, response: AIMessage) -> AgentState:
+    # only return the new messages: add_messages appends them (returning the whole history makes it re-merge everything)
+    # room is also kept for the ToolMessages the tools node will add for this response
+    new_count = 2 + len(response.tool_calls)
+    return {"messages": drop_old_messages(state["messages"], new_count) + [user_message, response]}
 
-    # invoke llm with all messages
-    all_messages = [system_prompt] + list(state["messages"]) + [user_message]
+
+def our_agent(state: AgentState) -> AgentState:
+    all_messages, user_message = start_turn(state)
     response = model.invoke(all_messages)
+    return end_turn(state, user_message, response)
+
+
+async def our_agent_async(state: AgentState) -> AgentState:
+    """Same as our_agent, used when the graph runs with ainvoke/astream (server mode)"""
+    all_messages, user_message = start_turn(state)
+    response = await model.ainvoke(all_messages)
+    return end_turn(state, user_message, response)
+
+
+def drop_old_messages(messages: Sequence[BaseMessage], new_count: int) -> list:
+    """
+    Returns the RemoveMessage updates needed to keep the state at MAX_MESSAGES at most once
+    `new_count` messages are added. The cut always lands on a HumanMessage, so an AI tool call
+    is never separated from its ToolMessages: when the last turn alone is longer than that,
+    nothing is dropped until the next one.
+    """
+    overflow = len(messages) + new_count - MAX_MESSAGES
+    if overflow <= 0:
+        return []
+
+    for cut in range(overflow, len(messages)):
+        if isinstance(messages[cut], HumanMessage):
+            return [RemoveMessage(id=m.id) for m in messages[:cut]]
+
+    return []
+
 
-    print(f"\n🤖 AI: {response.content}")
-    if hasattr(response, "tool_calls") and response.tool_calls:
-        print(f"🔧 USING TOOLS: {[tc['name'] for tc in response.tool_calls]}")
+def is_successful(message: ToolMessage) -> bool:
+    """A save only counts once the document is actually on disk."""
+    if message.name == "save":
+        content = message.content.lower()
+        return "saved" in content and "document" in content
+    return message.status == "success"
 
-    return {"messages": list(state["messages"]) + [user_message, response]}
+
+def index_tools(state: AgentState) -> AgentState:
+    """Indexes the ToolMessages produced by the last tools step (only those, not the whole history)."""
+    index = {}
+    for message in reversed(state["messages"]):
+        if not isinstance(message, ToolMessage):
+            break
+        if is_successful(message) and message.name not in index:
+            index[message.name] = message.id
+
+    return {"tool_index": index}
 
 
 def should_continue(state: AgentState) -> str:
     """Determine if we should continue or end the conversation."""
 
-    messages = state["messages"]
-    
-    if not messages:
-        return "continue"
-    
-    # This looks for the most recent tool message....
-    for message in reversed(messages):
-        # ... and checks if this is a ToolMessage resulting from save
-        if (isinstance(message, ToolMessage) and 
-            "saved" in message.content.lower() and
-            "document" in message.content.lower()):
-            return "end" # goes to the end edge which leads to the endpoint
-        
+    # O(1): the index already knows whether the document was saved
+    if "save" in state.get("tool_index", {}):
+        return "end" # goes to the end edge which leads to the endpoint
+
     return "continue"
 
 
-def print_messages(messages):
-    """Function I made to print the messages in a more readable format"""
-    if not messages:
-        return
-    
-    for message in messages[-3:]:
-        if isinstance(message, ToolMessage):
-            print(f"\n🛠️ TOOL RESULT: {message.content}")
+def print_update(update: dict):
+    """Prints the messages produced by one graph step (stream_mode="updates")"""
+    for node, values in update.items():
+        if not isinstance(values, dict):   # e.g. the __interrupt__ update
+            continue
+        for message in values.get("messages", []):
+            if isinstance(message, AIMessage):
+                print(f"\n🤖 AI: {message.content}")
+                if message.tool_calls:
+                    print(f"🔧 USING TOOLS: {[tc['name'] for tc in message.tool_calls]}")
+            elif isinstance(message, ToolMessage):
+                print(f"\n🛠️ TOOL RESULT: {message.content}")
+
+
+class LatestCheckpointSaver(InMemorySaver):
+    """
+    In-memory checkpointer that keeps only the latest checkpoint of each thread
+    (no time travel), so an idle session costs one checkpoint plus its bounded state.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.latest_versions = {}   # (thread_id, checkpoint_ns) -> {channel: version} of the latest checkpoint
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        new_config = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+
+        # drop older checkpoints and their pending writes
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        for checkpoint_id in [c for c in checkpoints if c != checkpoint["id"]]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+        # drop channel values that have been overwritten by a newer version
+        versions = self.latest_versions.setdefault((thread_id, checkpoint_ns), {})
+        for channel, version in new_versions.items():
+            old_version = versions.get(channel)
+            if old_version is not None and old_version != version:
+                self.blobs.pop((thread_id, checkpoint_ns, channel, old_version), None)
+            versions[channel] = version
+
+        return new_config
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        for key in [k for k in self.latest_versions if k[0] == thread_id]:
+            del self.latest_versions[key]
 
 
 # graph
 graph = StateGraph(AgentState)
 
-graph.add_node("agent", our_agent)
+graph.add_node("agent", RunnableLambda(our_agent, afunc=our_agent_async))
 graph.add_node("tools", ToolNode(tools))
+graph.add_node("index", index_tools)
 
 graph.add_edge(START, "agent")
 graph.add_edge("agent", "tools")
-graph.add_edge("tools", "agent")
-graph.add_conditional_edges(source="tools",
+graph.add_edge("tools", "index")
+graph.add_conditional_edges(source="index",
                             path=should_continue,
                             path_map={
                                 "continue" : "agent",
                                 "end" : END
                             })
-app = graph.compile()
+app = graph.compile(checkpointer=LatestCheckpointSaver())
+
+
+def new_session() -> dict:
+    return {"messages": [], "document": "", "tool_index": {}}
 
 
 def run_document_agent():
     print("\n ===== DRAFTER =====")
     
-    state = {"messages": []}
-    
-    for step in app.stream(state, stream_mode="values"):
-        if "messages" in step:
-            print_messages(step["messages"])
+    config = {"configurable": {"thread_id": "terminal"}}
+    command = new_session()
+
+    while True:
+        for update in app.stream(command, config, stream_mode="updates"):
+            print_update(update)
+
+        snapshot = app.get_state(config)
+        if not snapshot.next:   # nothing left to run: the document was saved
+            break
+
+        # the graph is paused on the interrupt in our_agent: ask the user and resume
+        question = snapshot.tasks[0].interrupts[0].value
+        user_input = input(f"\n{question} ")
+        print(f"\n👤 USER: {user_input}")
+        command = Command(resume=user_input)
     
     print("\n ===== DRAFTER FINISHED =====")
 
+
+# ----------------------
+# Server mode
+# ----------------------
+class SessionConflict(Exception):
+    """The session exists but can't take this request now: a turn is running, or the drafting is finished."""
+
+
+class DraftingSessions:
+    """
+    Tracks the drafting sessions served by one process. Each session is a thread of the
+    shared graph: while it waits for the user it is just a checkpoint, no task or thread is held.
+    Sessions idle for more than `idle_ttl` seconds (or beyond `max_sessions`) are evicted.
+    """
+
+    def __init__(self, graph, max_sessions: int = 1000, idle_ttl: float = 30 * 60):
+        self.graph = graph
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.last_seen = OrderedDict()   # session id -> last activity, least recent first
+        self.locks = {}                  # one turn at a time per session
+
+    def _config(self, session_id: str) -> dict:
+        return {"configurable": {"thread_id": session_id}}
+
+    def _touch(self, session_id: str):
+        self.last_seen[session_id] = time.monotonic()
+        self.last_seen.move_to_end(session_id)
+
+    def evict(self):
+        """
+        Deletes sessions that have been idle too long, or the oldest ones when over capacity, in one pass:
+        sessions in the middle of a turn are skipped (they may keep the count over capacity until the next call).
+        """
+        now = time.monotonic()
+        for session_id, seen in list(self.last_seen.items()):
+            if now - seen < self.idle_ttl and len(self.last_seen) <= self.max_sessions:
+                break
+            if not self.locks[session_id].locked():
+                self.delete(session_id)
+
+    def delete(self, session_id: str):
+        """Deletes a session and its checkpoints. KeyError for an unknown or already evicted session."""
+        lock = self.locks.get(session_id)
+        if lock is None:
+            raise KeyError(session_id)
+        if lock.locked():
+            raise SessionConflict(f"Session '{session_id}' is in the middle of a turn")
+        self.last_seen.pop(session_id, None)
+        self.locks.pop(session_id, None)
+        self.graph.checkpointer.delete_thread(session_id)
+
+    async def _run(self, session_id: str, command) -> dict:
+        config = self._config(session_id)
+        async with self.locks[session_id]:
+            # checked under the lock: a concurrent reply may just have finished the drafting
+            if isinstance(command, Command) and not (await self.graph.aget_state(config)).next:
+                raise SessionConflict(f"Session '{session_id}' is finished: nothing waits for an answer")
+            await self.graph.ainvoke(command, config)
+            snapshot = await self.graph.aget_state(config)
+        if session_id in self.locks:     # not deleted meanwhile
+            self._touch(session_id)
+
+        messages = snapshot.values.get("messages", [])
+        reply = next((m.content for m in reversed(messages) if isinstance(m, AIMessage)), "")
+        return {
+            "session_id": session_id,
+            "reply": reply,
+            "document": snapshot.values.get("document", ""),
+            "question": snapshot.tasks[0].interrupts[0].value if snapshot.next else None,
+            "finished": not snapshot.next,
+        }
+
+    async def start(self) -> dict:
+        self.evict()
+        session_id = uuid.uuid4().hex
+        self.locks[session_id] = asyncio.Lock()
+        self._touch(session_id)
+        return await self._run(session_id, new_session())
+
+    async def reply(self, session_id: str, user_input: str) -> dict:
+        if session_id not in self.locks:
+            raise KeyError(session_id)
+        return await self._run(session_id, Command(resume=user_input))
+
+
+def build_server(sessions: DraftingSessions):
+    """FastAPI app exposing the Drafter: one process, many concurrent drafting sessions"""
+    from fastapi import FastAPI, HTTPException
+    from pydantic import BaseModel
+
+    class UserMessage(BaseModel):
+        content: str
+
+    server = FastAPI(title="Drafter")
+
+    @server.post("/sessions")
+    async def create_session():
+        return await sessions.start()
+
+    @server.post("/sessions/{session_id}/messages")
+    async def send_message(session_id: str, message: UserMessage):
+        try:
+            return await sessions.reply(session_id, message.content)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"Unknown or expired session '{session_id}'")
+        except SessionConflict as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+    @server.delete("/sessions/{session_id}")
+    async def delete_session(session_id: str):
+        try:
+            sessions.delete(session_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"Unknown or expired session '{session_id}'")
+        except SessionConflict as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        return {"session_id": session_id, "deleted": True}
+
+    return server
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000):
+    import uvicorn
+    uvicorn.run(build_server(DraftingSessions(app)), host=host, port=port)
+
+
 if __name__ == "__main__":
-    run_document_agent()
+    if "--serve" in sys.argv:
+        serve()
+    else:
+        run_document_agent()
 
 
 
@@ -0,0 +1,90 @@
+"""
+# Drafter benchmark
+
+Drives the Drafter graph for 200 turns with a fake model and scripted user input (no API calls),
+resuming it after every interrupt, and checks that the cost of a turn stays flat as the session grows.
+
+    python 0.8.11_Drafter_benchmark.py
+"""
+
+import importlib.util
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from langchain_core.messages import AIMessage
+from langgraph.types import Command
+
+TURNS = 200
+WINDOW = 20          # number of turns averaged at the start and at the end of the run
+MAX_SLOWDOWN = 2.0   # last turns may be at most this much slower than the first ones
+
+
+def load_drafter():
+    """Imports 0.8.11_Drafter.py (its name is not a valid module name)"""
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")    # ChatOpenAI is built at import time, never called
+    path = Path(__file__).with_name("0.8.11_Drafter.py")
+    spec = importlib.util.spec_from_file_location("drafter", path)
+    drafter = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(drafter)
+    return drafter
+
+
+class FakeModel:
+    """Stands in for the bound ChatOpenAI model: updates the document every turn, saves on the last one."""
+
+    def __init__(self, turns: int, filename: str):
+        self.turns = turns
+        self.filename = filename
+        self.calls = 0
+        self.timestamps = []
+
+    def invoke(self, messages):
+        self.timestamps.append(time.perf_counter())
+        self.calls += 1
+        if self.calls >= self.turns:
+            tool_call = {"name": "save", "args": {"filename": self.filename}, "id": f"call_{self.calls}"}
+        else:
+            tool_call = {"name": "update", "args": {"content": f"Draft number {self.calls}"}, "id": f"call_{self.calls}"}
+        return AIMessage(content=f"Turn {self.calls}", tool_calls=[tool_call])
+
+
+def run_benchmark(turns: int = TURNS) -> list:
+    drafter = load_drafter()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fake = FakeModel(turns, filename="benchmark.txt")
+        drafter.model = fake
+        drafter.SAVE_FOLDER = Path(tmp)
+        drafter.print = lambda *args, **kwargs: None
+
+        max_messages = 0
+        config = {"configurable": {"thread_id": "benchmark"}}
+        command = drafter.new_session()
+        while True:
+            for step in drafter.app.stream(command, config, stream_mode="values"):
+                max_messages = max(max_messages, len(step["messages"]))
+            if not drafter.app.get_state(config).next:
+                break
+            command = Command(resume="Please change the draft.")
+
+        checkpoints = len(drafter.app.checkpointer.storage["benchmark"][""])
+
+    durations = [b - a for a, b in zip(fake.timestamps, fake.timestamps[1:])]
+    print(f"turns: {fake.calls} | max messages in state: {max_messages} | checkpoints kept: {checkpoints}")
+    return durations
+
+
+if __name__ == "__main__":
+    durations = run_benchmark()
+    first = statistics.mean(durations[:WINDOW])
+    last = statistics.mean(durations[-WINDOW:])
+    print(f"first {WINDOW} turns: {first * 1000:.2f} ms/turn")
+    print(f"last {WINDOW} turns: {last * 1000:.2f} ms/turn")
+    print(f"slowdown: {last / first:.2f}x")
+
+    if last / first > MAX_SLOWDOWN:
+        sys.exit(f"Per-turn cost grew more than {MAX_SLOWDOWN}x over {TURNS} turns")
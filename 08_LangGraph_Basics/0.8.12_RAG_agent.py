@@ -1,4 +1,8 @@
 from dotenv import load_dotenv
+# LLM response cache and rate limiting (agent_ui, see requirements.txt)
+from agent_ui.llm_cache import cached_embeddings, enable_llm_cache
+from agent_ui.scheduler import scheduler
+client_kwargs, scheduled_embeddings = scheduler.client_kwargs, scheduler.embeddings
 import os
 from langgraph.graph import StateGraph, END
 from typing import TypedDict, Annotated, Sequence
@@ -12,14 +16,16 @@ from langchain_chroma import Chroma
 from langchain_core.tools import tool
 
 load_dotenv()
+enable_llm_cache()   # set LLM_CACHE_MODE=record|replay to record/replay LLM responses
 
 llm = ChatOpenAI(
-    model="gpt-4o", temperature = 0) # I want to minimize hallucination - temperature = 0 makes the model output more deterministic 
+    model="gpt-4o", temperature = 0, **client_kwargs("gpt-4o")) # I want to minimize hallucination - temperature = 0 makes the model output more deterministic 
 
 # Our Embedding Model - has to also be compatible with the LLM
-embeddings = OpenAIEmbeddings(
+# (cached like the LLM responses: a replayed run embeds the PDF without calling the API)
+embeddings = cached_embeddings(scheduled_embeddings(OpenAIEmbeddings(
     model="text-embedding-3-small",
-)
+), "text-embedding-3-small"), "text-embedding-3-small")
 
 
 pdf_path = "Stock_Market_Performance_2024.pdf"
@@ -12,8 +12,13 @@ from langchain_core.messages import HumanMessage, AIMessage
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, START, END
 from dotenv import load_dotenv 
+# LLM response cache and rate limiting (agent_ui, see requirements.txt)
+from agent_ui.llm_cache import enable_llm_cache
+from agent_ui.scheduler import scheduler
+client_kwargs = scheduler.client_kwargs
 
 load_dotenv()
+enable_llm_cache()   # set LLM_CACHE_MODE=record|replay to record/replay LLM responses
 
 
 # AgentState
@@ -22,7 +27,7 @@ class AgentState(TypedDict):
 
 
 # initialize llm
-llm = ChatOpenAI(model="gpt-4o")
+llm = ChatOpenAI(model="gpt-4o", **client_kwargs("gpt-4o"))
 
 
 # define llm node
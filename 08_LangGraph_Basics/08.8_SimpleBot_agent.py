@@ -14,16 +14,21 @@ from langchain_core.messages import HumanMessage
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, START, END
 from dotenv import load_dotenv 
+# LLM response cache and rate limiting (agent_ui, see requirements.txt)
+from agent_ui.llm_cache import enable_llm_cache
+from agent_ui.scheduler import scheduler
+client_kwargs = scheduler.client_kwargs
 import os
 
 load_dotenv()
+enable_llm_cache()   # set LLM_CACHE_MODE=record|replay to record/replay LLM responses
 
 # a new state for the chat bot
 class AgentState(TypedDict):
     messages : List[HumanMessage]   # the state is a list of human messages
 
 # initialize llm
-llm = ChatOpenAI(model="gpt-4o")
+llm = ChatOpenAI(model="gpt-4o", **client_kwargs("gpt-4o"))
 
 # define llm node
 def process(state: AgentState) -> AgentState:
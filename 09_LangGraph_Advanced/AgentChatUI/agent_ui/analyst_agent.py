@@ -1,6 +1,10 @@
 from langgraph.prebuilt import create_react_agent
+from langchain.chat_models import init_chat_model
 from agent_ui.state import DatasetState
-from agent_ui.tools import list_loadable_datasets, list_inmemory_datasets, load_dataset
+from agent_ui.tools import list_loadable_datasets, list_inmemory_datasets, load_dataset, unload_dataset, \
+    sql_query, aggregate_dataset, top_k_rows
+from agent_ui.scheduler import scheduler
+from agent_ui.compaction import history_compactor
 import agent_ui.load_env 
 
 prompt = (
@@ -8,13 +12,18 @@ prompt = (
     "The files you need to load are in the subdirectory at ../LLM_data\n"
     "Datasets are stored as `file_name.parquet`\n\n"
     "You can check which datasets are currently loaded with the `list_inmemory_datasets()` tool, \
-    and which datasets are available to load using the `list_loadable_datasets()` tool.\n\n"
+    and which datasets are available to load using the `list_loadable_datasets()` tool.\n"
+    "Use `unload_dataset()` to free datasets you no longer need; loading a dataset again replaces it.\n"
+    "For counts, aggregations, filters or joins, use the `sql_query()` tool: it runs SQL directly on the parquet files, without loading them.\n"
+    "For datasets too large to load, use `aggregate_dataset()` and `top_k_rows()`: they stream the file in bounded memory.\n\n"
 )
 
 analyst_agent = create_react_agent(
-    model="openai:gpt-4o-mini",
-    tools=[list_loadable_datasets, list_inmemory_datasets, load_dataset],
+    model=init_chat_model("openai:gpt-4o-mini", **scheduler.client_kwargs("openai:gpt-4o-mini")),
+    tools=[list_loadable_datasets, list_inmemory_datasets, load_dataset, unload_dataset, sql_query, aggregate_dataset,
+           top_k_rows],
     prompt=prompt,
+    pre_model_hook=history_compactor.hook("data_analyst"),     # old tool outputs summarized for the model
     name="data_analyst",
     state_schema=DatasetState,
 )
@@ -0,0 +1,181 @@
+"""
+Figures and maps produced by tool calls, stored once on disk and looked up by the tool_call_id that produced them.
+Tool messages only carry small references, so graph state and checkpoints never hold image or HTML payloads,
+and the frontend shows exactly the artifacts of the message it is rendering: by file path (images), or by URL
+from a route serving the store's folder (maps, see `file_name`).
+"""
+
+# Standard library
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+from typing_extensions import TypedDict
+
+
+ARTIFACT_DIR = Path(os.environ.get("ARTIFACT_DIR", Path(tempfile.gettempdir()) / "agent_ui-artifacts"))
+ARTIFACT_TTL = float(os.environ.get("ARTIFACT_TTL_SECONDS", 24 * 3600))
+ARTIFACT_BYTES = int(os.environ.get("ARTIFACT_BYTES", 1024 ** 3))
+
+DEFAULT_FORMATS = {"image": "png", "html": "html"}
+MIME_TYPES = {"png": "image/png", "svg": "image/svg+xml", "html": "text/html"}
+FILE_NAME = re.compile(r"^[0-9a-f]{64}\.(png|svg|html)$")     # what the store names its files
+
+
+class ArtifactRef(TypedDict):
+    """What a ToolMessage carries of an artifact."""
+    tool_call_id: str
+    kind: str           # image or html
+    format: str         # png, svg or html
+    sha256: str
+    path: str
+    mime: str
+    size: int
+
+
+class ArtifactStore:
+    """
+    Content-addressed files (<sha256>.png / .svg / .html: the same figure produced twice is stored once),
+    indexed in memory by tool_call_id. Artifacts older than `ttl` seconds are garbage-collected, and the oldest
+    go first when the folder exceeds `budget` bytes.
+    The index starts empty in every process, while the references live on in checkpointed messages: `restore`
+    indexes them again, for the files still on disk.
+    """
+
+    def __init__(self, folder: Union[str, Path] = ARTIFACT_DIR, ttl: Optional[float] = ARTIFACT_TTL,
+                 budget: int = ARTIFACT_BYTES):
+        self.folder = Path(folder)
+        self.ttl = ttl
+        self.budget = budget
+        self.index = OrderedDict()      # tool_call_id -> (created, [ArtifactRef]), oldest first
+        self.refcounts: Dict[str, int] = {}     # file -> number of references in the index
+        self.bytes_stored = 0
+        self.swept = False
+        self.lock = threading.Lock()
+
+    def put(self, tool_call_id: str, kind: str, data: Union[bytes, str], format: Optional[str] = None) -> ArtifactRef:
+        """Stores an artifact of a tool call (kind: image or html, format: png/svg for images) and returns its reference."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        format = format or DEFAULT_FORMATS[kind]
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.folder / f"{digest}.{format}"
+        ref = ArtifactRef(tool_call_id=tool_call_id, kind=kind, format=format, sha256=digest, path=str(path),
+                          mime=MIME_TYPES[format], size=len(data))
+
+        with self.lock:
+            new_file = self.refcounts.get(ref["path"], 0) == 0
+            if new_file:
+                if not self.swept:
+                    self._sweep()
+                self.folder.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+                self.bytes_stored += len(data)
+            self.refcounts[ref["path"]] = self.refcounts.get(ref["path"], 0) + 1
+            created, refs = self.index.pop(tool_call_id, (time.time(), []))
+            self.index[tool_call_id] = (created, refs + [ref])
+            self._collect()
+        return ref
+
+    def get(self, tool_call_id: str, kind: Optional[str] = None) -> List[ArtifactRef]:
+        """The artifacts of a tool call (of one kind, if given), in the order they were stored."""
+        with self.lock:
+            _, refs = self.index.get(tool_call_id, (None, []))
+        return [ref for ref in refs if kind is None or ref["kind"] == kind]
+
+    def read(self, ref: ArtifactRef) -> bytes:
+        return Path(ref["path"]).read_bytes()
+
+    def restore(self, refs: List[ArtifactRef]) -> List[ArtifactRef]:
+        """
+        Indexes the references of a checkpointed message again (e.g. after a restart), dated by their file, and
+        returns those whose file still exists. References already indexed are returned as they are.
+        """
+        restored = []
+        with self.lock:
+            for ref in refs:
+                _, indexed = self.index.get(ref["tool_call_id"], (None, []))
+                if ref in indexed:
+                    restored.append(ref)
+                    continue
+                try:
+                    created = os.stat(ref["path"]).st_mtime
+                except OSError:
+                    continue
+                if self.refcounts.get(ref["path"], 0) == 0:
+                    self.bytes_stored += ref["size"]
+                self.refcounts[ref["path"]] = self.refcounts.get(ref["path"], 0) + 1
+                created, indexed = self.index.pop(ref["tool_call_id"], (created, []))
+                self.index[ref["tool_call_id"]] = (created, indexed + [ref])
+                restored.append(ref)
+        return restored
+
+    def file_name(self, ref: ArtifactRef) -> str:
+        """Name of the artifact's file in the store's folder, for a route serving it (see `path_of`)."""
+        return Path(ref["path"]).name
+
+    def path_of(self, file_name: str) -> Optional[Path]:
+        """The file served for a name taken from a URL: only the store's own file names, and only existing files."""
+        if not FILE_NAME.match(file_name):
+            return None
+        path = self.folder / file_name
+        return path if path.is_file() else None
+
+    def collect(self):
+        """Removes expired artifacts, and the oldest ones while over budget."""
+        with self.lock:
+            self._collect()
+
+    def _collect(self):
+        now = time.time()
+        while self.index:
+            tool_call_id, (created, refs) = next(iter(self.index.items()))
+            expired = self.ttl is not None and now - created > self.ttl
+            # over budget: drop the oldest, but never the one just stored
+            if not expired and (self.bytes_stored <= self.budget or len(self.index) == 1):
+                break
+            del self.index[tool_call_id]
+            for ref in refs:
+                self.refcounts[ref["path"]] -= 1
+                if not self.refcounts[ref["path"]]:
+                    del self.refcounts[ref["path"]]
+                    self.bytes_stored -= ref["size"]
+                    try:
+                        os.unlink(ref["path"])
+                    except OSError:
+                        pass
+
+    def _sweep(self):
+        """Once per process: the index starts empty, so expired files left by previous runs are removed by age."""
+        self.swept = True
+        if self.ttl is None or not self.folder.is_dir():
+            return
+        cutoff = time.time() - self.ttl
+        for entry in os.scandir(self.folder):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self.lock:
+            for path in self.refcounts:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            self.index.clear()
+            self.refcounts.clear()
+            self.bytes_stored = 0
+
+
+# shared by every session of the process
+artifact_store = ArtifactStore()
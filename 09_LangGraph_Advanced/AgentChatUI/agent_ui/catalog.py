@@ -0,0 +1,191 @@
+# Standard library
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+# Third-party libraries
+import pyarrow.parquet as pq
+
+
+@dataclass
+class DatasetInfo:
+    """Everything the parquet footer tells about a dataset, without reading any data page."""
+    name: str
+    path: str
+    size: int
+    mtime_ns: int
+    version: str                        # hash of the footer: changes whenever the content does
+    num_rows: int
+    num_row_groups: int
+    columns: List[Tuple[str, str]]      # (name, arrow type)
+    geometry: Dict[str, dict] = field(default_factory=dict)   # geometry column -> {"crs", "geometry_types"}
+    primary_geometry: Optional[str] = None
+    column_bytes: Dict[str, int] = field(default_factory=dict)    # uncompressed size of each column, all row groups
+
+    @property
+    def kind(self) -> str:
+        return "GeoDataFrame" if self.primary_geometry else "DataFrame"
+
+    def memory_estimate(self, columns: Optional[List[str]] = None) -> int:
+        """Uncompressed size of a full read (of `columns` only, if given): a lower bound of the loaded frame size."""
+        if columns is None:
+            return sum(self.column_bytes.values())
+        columns = set(columns) | ({self.primary_geometry} if self.primary_geometry else set())
+        return sum(size for name, size in self.column_bytes.items() if name in columns)
+
+    def summary(self) -> str:
+        """One line, for listings."""
+        line = f"{self.name}.parquet: {self.kind} ({self.num_rows} rows x {len(self.columns)} columns, {self.size / 1e6:.1f} MB)"
+        if self.primary_geometry:
+            geo = self.geometry[self.primary_geometry]
+            line += f" | {'/'.join(geo['geometry_types']) or 'geometry'} in {geo['crs']}"
+        return line
+
+    def describe(self) -> str:
+        """Schema description, for describe_dataset on a dataset that is not loaded yet."""
+        cols = "\n".join(f"- {name} ({dtype})" for name, dtype in self.columns)
+        return (
+            f"{self.summary()}\n"
+            f"Row groups: {self.num_row_groups}\n"
+            f"---\n"
+            f"Columns:\n{cols}"
+        )
+
+
+def crs_name(crs) -> str:
+    """GeoParquet stores the CRS as PROJJSON (missing means OGC:CRS84)."""
+    if crs is None:
+        return "OGC:CRS84"
+    if isinstance(crs, dict):
+        crs_id = crs.get("id") or {}
+        if crs_id:
+            return f"{crs_id.get('authority')}:{crs_id.get('code')}"
+        return crs.get("name", "unknown CRS")
+    return str(crs)
+
+
+def read_footer(path: Path) -> bytes:
+    """Raw footer bytes: [footer][4-byte little-endian length]['PAR1'] at the end of the file."""
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size < 12:
+            raise ValueError(f"{size} bytes: too small to be a parquet file")
+        f.seek(-8, os.SEEK_END)
+        length = int.from_bytes(f.read(4), "little")
+        if f.read(4) != b"PAR1":
+            raise ValueError("no parquet magic at the end of the file (truncated or not parquet)")
+        if length > size - 12:
+            raise ValueError(f"footer length {length} beyond the file size (truncated)")
+        f.seek(-8 - length, os.SEEK_END)
+        return f.read(length)
+
+
+def footer_version(path: Path) -> str:
+    """Version of a dataset: the hash of its footer (schema, row groups, statistics), which changes with the content."""
+    return hashlib.sha1(read_footer(path)).hexdigest()
+
+
+def read_info(path: Path, stat: os.stat_result, version: str) -> DatasetInfo:
+    metadata = pq.read_metadata(path)
+    schema = metadata.schema.to_arrow_schema()
+
+    geometry, primary = {}, None
+    geo = (schema.metadata or {}).get(b"geo")
+    if geo:
+        geo = json.loads(geo)
+        primary = geo.get("primary_column")
+        for column, meta in geo.get("columns", {}).items():
+            geometry[column] = {
+                "crs": crs_name(meta.get("crs")),
+                "geometry_types": meta.get("geometry_types", []),
+            }
+
+    column_bytes = {}
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        for j in range(row_group.num_columns):
+            chunk = row_group.column(j)
+            name = chunk.path_in_schema.split(".")[0]     # nested columns: count under the top-level name
+            column_bytes[name] = column_bytes.get(name, 0) + chunk.total_uncompressed_size
+
+    return DatasetInfo(
+        name=path.stem,
+        path=str(path),
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        version=version,
+        num_rows=metadata.num_rows,
+        num_row_groups=metadata.num_row_groups,
+        columns=[(f.name, str(f.type)) for f in schema],
+        geometry=geometry,
+        primary_geometry=primary,
+        column_bytes=column_bytes,
+    )
+
+
+class DatasetCatalog:
+    """
+    Catalog of the parquet files of a folder, built from their footers only.
+    An entry is re-read when the file's mtime or size changes, and rebuilt only if the footer hash changed too
+    (a file that is just touched keeps its entry and its version).
+    Files whose footer can't be read (truncated, corrupt, still being written) are left out of the entries and
+    listed in `unreadable` with the reason, until they change.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = Path(folder)
+        self.entries: Dict[str, DatasetInfo] = {}
+        self.unreadable: Dict[str, Tuple[int, int, str]] = {}     # name -> (mtime_ns, size, reason)
+        self.lock = threading.Lock()
+
+    def refresh(self) -> Dict[str, DatasetInfo]:
+        """Syncs the catalog with the folder: a scandir plus a stat per file when nothing changed."""
+        with self.lock:
+            seen = set()
+            with os.scandir(self.folder) as it:
+                for entry in it:
+                    if not entry.name.endswith(".parquet") or not entry.is_file():
+                        continue
+                    name = entry.name[: -len(".parquet")]
+                    seen.add(name)
+                    stat = entry.stat()
+                    cached = self.entries.get(name)
+                    if cached and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+                        continue
+
+                    failed = self.unreadable.get(name)
+                    if failed and failed[:2] == (stat.st_mtime_ns, stat.st_size):
+                        continue
+
+                    path = Path(entry.path)
+                    try:
+                        version = footer_version(path)
+                        if cached and cached.version == version:
+                            cached.mtime_ns, cached.size = stat.st_mtime_ns, stat.st_size
+                        else:
+                            self.entries[name] = read_info(path, stat, version)
+                        self.unreadable.pop(name, None)
+                    except (OSError, ValueError) as e:      # pyarrow's ArrowInvalid is a ValueError
+                        self.entries.pop(name, None)
+                        self.unreadable[name] = (stat.st_mtime_ns, stat.st_size, str(e))
+
+            for name in set(self.entries) - seen:   # deleted files
+                del self.entries[name]
+            for name in set(self.unreadable) - seen:
+                del self.unreadable[name]
+
+            return dict(self.entries)
+
+    def list(self) -> List[DatasetInfo]:
+        return sorted(self.refresh().values(), key=lambda info: info.name)
+
+    def errors(self) -> Dict[str, str]:
+        """Reason why each unreadable file of the last refresh was left out, by dataset name."""
+        with self.lock:
+            return {name: reason for name, (_, _, reason) in sorted(self.unreadable.items())}
+
+    def get(self, name: str) -> Optional[DatasetInfo]:
+        return self.refresh().get(Path(name).stem)
@@ -0,0 +1,320 @@
+"""
+Memoization of python_repl_tool cells, used by the REPL pool.
+
+A cell is cacheable when it only reads the loaded datasets (and builtins / modules it imports itself), and has no
+effect besides its output: no file or network I/O, no clock or random numbers, no imports outside PURE_MODULES.
+Its result then depends on its code and on the dataset versions only, and answering it from the cache skips
+nothing the user would miss. The key is the hash of the code's AST, so formatting and comments don't matter,
+plus the version and read options of every dataset it references.
+"""
+
+# Standard library
+import ast
+import builtins
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+
+DEFAULT_BUDGET = int(os.environ.get("REPL_CACHE_BYTES", 256 * 1024 ** 2))
+
+BUILTINS = frozenset(dir(builtins))
+# DataFrame methods modifying the frame they are called on, besides the inplace=True ones
+MUTATING_METHODS = frozenset({"insert", "update", "pop"})
+
+# modules a cacheable cell may import: computations only (their I/O and random functions are caught below)
+PURE_MODULES = frozenset({
+    "pandas", "numpy", "geopandas", "shapely", "pyproj", "scipy", "matplotlib", "seaborn", "folium",
+    "math", "statistics", "collections", "itertools", "functools", "operator", "re", "json", "string",
+    "textwrap", "decimal", "fractions", "datetime", "typing", "dataclasses",
+})
+# calls whose effect or result is not determined by the code and the datasets
+EFFECT_BUILTINS = frozenset({"open", "input", "exec", "eval", "compile", "__import__", "breakpoint", "id", "hash",
+                             "globals", "locals", "vars"})
+IO_METHODS = frozenset({
+    "to_csv", "to_parquet", "to_excel", "to_json", "to_pickle", "to_file", "to_feather", "to_sql", "to_hdf",
+    "to_stata", "to_orc", "to_clipboard", "savefig", "save", "write", "write_text", "write_bytes", "writelines",
+    "read_csv", "read_parquet", "read_file", "read_excel", "read_json", "read_pickle", "read_feather", "read_sql",
+    "read_table", "read_html", "read_text", "read_bytes", "imread", "imsave", "loadtxt", "savetxt", "load", "tofile",
+    "fromfile",
+})
+NONDETERMINISTIC = frozenset({"random", "now", "today", "utcnow"})     # np.random.*, pd.Timestamp.now()...
+
+
+@dataclass
+class Cell:
+    code: str
+    normalized: Optional[str]       # AST dump, None if the code doesn't parse
+    reads: Set[str] = field(default_factory=set)     # names read before the cell defines them
+    writes: Set[str] = field(default_factory=set)    # names bound or modified in place by the cell
+    effects: Set[str] = field(default_factory=set)   # I/O, random or clock calls and impure imports, e.g. "to_csv"
+
+    def cacheable(self, datasets: Set[str], dirty: Set[str]) -> bool:
+        """
+        True if the cell has no effects and only reads datasets that are still as loaded (not re-bound or modified
+        by the session).
+        """
+        if self.normalized is None or self.effects:
+            return False
+        free = self.reads - BUILTINS
+        return free <= datasets and not (free & dirty)
+
+
+def call_path(func: ast.AST) -> List[str]:
+    """["np", "random", "rand"] for np.random.rand, ["to_csv"] for df.head().to_csv."""
+    parts = []
+    while isinstance(func, ast.Attribute):
+        parts.append(func.attr)
+        func = func.value
+    if isinstance(func, ast.Name):
+        parts.append(func.id)
+    return parts[::-1]
+
+
+def root_name(node: ast.AST) -> Optional[str]:
+    """`df` for df, df["x"], df.loc[...], df.geometry.crs..."""
+    while isinstance(node, (ast.Attribute, ast.Subscript)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+class _Names(ast.NodeVisitor):
+    """Names read and written by one top-level statement, ignoring the names local to functions and comprehensions."""
+
+    def __init__(self):
+        self.reads: Set[str] = set()
+        self.writes: Set[str] = set()
+        self.effects: Set[str] = set()
+        self.scopes = []
+
+    def _local(self, name: str) -> bool:
+        return any(name in scope for scope in self.scopes)
+
+    def visit_Name(self, node: ast.Name):
+        if isinstance(node.ctx, ast.Load):
+            if not self._local(node.id):
+                self.reads.add(node.id)
+        elif not self.scopes:
+            self.writes.add(node.id)
+
+    def _visit_targets(self, targets):
+        for target in targets:
+            name = root_name(target)
+            if name and not isinstance(target, ast.Name) and not self._local(name):
+                self.writes.add(name)       # df["x"] = ..., df.loc[...] = ...: modifies df in place
+                self.reads.add(name)
+
+    def visit_Assign(self, node: ast.Assign):
+        self._visit_targets(node.targets)
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node: ast.AugAssign):
+        self._visit_targets([node.target])
+        if isinstance(node.target, ast.Name) and not self._local(node.target.id):
+            self.reads.add(node.target.id)
+        self.generic_visit(node)
+
+    def visit_Delete(self, node: ast.Delete):
+        self._visit_targets(node.targets)
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call):
+        path = call_path(node.func)
+        if path and (path[-1] in IO_METHODS or NONDETERMINISTIC & set(path)
+                     or (len(path) == 1 and path[0] in EFFECT_BUILTINS and not self._local(path[0]))
+                     or (path[-1] == "sample" and not any(k.arg == "random_state" for k in node.keywords))):
+            self.effects.add(".".join(path))
+        if isinstance(node.func, ast.Attribute):
+            inplace = any(k.arg == "inplace" and not (isinstance(k.value, ast.Constant) and not k.value.value)
+                          for k in node.keywords)
+            name = root_name(node.func.value)
+            if name and (inplace or node.func.attr in MUTATING_METHODS) and not self._local(name):
+                self.writes.add(name)
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        if not self.scopes:
+            for alias in node.names:
+                self.writes.add(alias.asname or alias.name.split(".")[0])
+        modules = [node.module or ""] if isinstance(node, ast.ImportFrom) else [alias.name for alias in node.names]
+        for module in modules:
+            parts = module.split(".")
+            if parts[0] not in PURE_MODULES or NONDETERMINISTIC & set(parts) or getattr(node, "level", 0):
+                self.effects.add(f"import {module}")
+        if isinstance(node, ast.ImportFrom):    # from numpy.random import rand, from pandas import read_csv
+            for alias in node.names:
+                if alias.name in IO_METHODS or alias.name in NONDETERMINISTIC:
+                    self.effects.add(f"import {alias.name}")
+
+    visit_ImportFrom = visit_Import
+
+    def _visit_function(self, node, args: ast.arguments, body):
+        if not self.scopes and hasattr(node, "name"):
+            self.writes.add(node.name)
+        for default in args.defaults + [d for d in args.kw_defaults if d is not None]:
+            self.visit(default)
+        for decorator in getattr(node, "decorator_list", []):
+            self.visit(decorator)
+        local = {a.arg for a in args.posonlyargs + args.args + args.kwonlyargs}
+        local |= {a.arg for a in (args.vararg, args.kwarg) if a is not None}
+        body = body if isinstance(body, list) else [body]
+        local |= {n.id for stmt in body for n in ast.walk(stmt) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+        self.scopes.append(local)
+        for stmt in body:
+            self.visit(stmt)
+        self.scopes.pop()
+
+    def visit_FunctionDef(self, node):
+        self._visit_function(node, node.args, node.body)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node: ast.Lambda):
+        self._visit_function(node, node.args, node.body)
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        if not self.scopes:
+            self.writes.add(node.name)
+        self.generic_visit(node)
+
+    def _visit_comprehension(self, node):
+        local = {n.id for gen in node.generators for n in ast.walk(gen.target) if isinstance(n, ast.Name)}
+        self.visit(node.generators[0].iter)     # evaluated in the enclosing scope
+        self.scopes.append(local)
+        for i, gen in enumerate(node.generators):
+            if i:
+                self.visit(gen.iter)
+            for condition in gen.ifs:
+                self.visit(condition)
+        for child in ("elt", "key", "value"):
+            if hasattr(node, child):
+                self.visit(getattr(node, child))
+        self.scopes.pop()
+
+    visit_ListComp = visit_SetComp = visit_GeneratorExp = visit_DictComp = _visit_comprehension
+
+
+def analyze(code: str) -> Cell:
+    """Reads and writes of a cell, statement by statement: a name defined by an earlier statement is not a read."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return Cell(code=code, normalized=None)
+
+    reads, writes, effects = set(), set(), set()
+    for stmt in tree.body:
+        names = _Names()
+        names.visit(stmt)
+        reads |= names.reads - writes
+        writes |= names.writes
+        effects |= names.effects
+    return Cell(code=code, normalized=ast.dump(tree), reads=reads, writes=writes, effects=effects)
+
+
+@dataclass
+class SessionCells:
+    """
+    What the pool tracks per session to replay cells safely. A replayed cell did not run in the worker:
+    it is kept pending, and run there only before a later cell that reads a name it writes.
+    """
+    pending: List[Cell] = field(default_factory=list)
+    dirty: Set[str] = field(default_factory=set)         # datasets re-bound or modified by the session's cells
+    bound: Dict[str, Any] = field(default_factory=dict)  # dataset name -> version bound in the worker
+
+    def reset(self):
+        """The session's worker was lost: a fresh one binds the datasets as loaded (pending cells can still run)."""
+        self.dirty.clear()
+        self.bound.clear()
+
+    def sync(self, versions: Dict[str, Any]):
+        """A dataset loaded again with another version or read is bound afresh by the worker: clean again."""
+        for name, version in versions.items():
+            if self.bound.get(name) != version:
+                self.bound[name] = version
+                self.dirty.discard(name)
+        for name in set(self.bound) - set(versions):     # unloaded: the worker removes the variable
+            del self.bound[name]
+            self.dirty.discard(name)
+
+    def replayed(self, cell: Cell):
+        self.pending.append(cell)
+        self.dirty |= cell.writes & set(self.bound)
+
+    def executed(self, cell: Cell):
+        self.dirty |= cell.writes & set(self.bound)
+
+    def take(self, cell: Cell) -> List[Cell]:
+        """Pending cells to run before `cell`, in order: up to the last one writing a name `cell` reads."""
+        needed = [i for i, pending in enumerate(self.pending) if pending.writes & cell.reads]
+        if cell.normalized is None or not needed:
+            return []
+        todo, self.pending = self.pending[: needed[-1] + 1], self.pending[needed[-1] + 1:]
+        return todo
+
+
+class CellCache:
+    """Results of cacheable cells ({"stdout", "image", "html"}), LRU under a byte budget, shared by all sessions."""
+
+    def __init__(self, budget: int = DEFAULT_BUDGET):
+        self.budget = budget
+        self.entries = OrderedDict()    # key -> (result, bytes), least recently used first
+        self.lock = threading.Lock()
+        self.bytes_resident = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(cell: Cell, versions: Dict[str, Any]) -> str:
+        """`versions`: dataset name -> anything identifying the file version and read options."""
+        used = sorted((name, repr(versions[name])) for name in cell.reads if name in versions)
+        return hashlib.sha256(repr((cell.normalized, used)).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[0])
+
+    def put(self, key: str, result: dict):
+        size = sum(len(result.get(k) or b"") for k in ("stdout", "image", "html"))
+        if size > self.budget:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.bytes_resident -= self.entries.pop(key)[1]
+            self.entries[key] = (dict(result), size)
+            self.bytes_resident += size
+            while self.bytes_resident > self.budget:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes_resident -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes_resident = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes_resident": self.bytes_resident,
+                "budget": self.budget,
+            }
+
+
+# shared by every session of the process
+cell_cache = CellCache()
@@ -0,0 +1,148 @@
+"""
+What a chat frontend shows of a supervisor graph streamed with stream_mode=["messages", "custom"] and
+subgraphs=True. In subgraph mode a chunk is attributed to the innermost node that produced it, under the namespace
+of the subgraphs it runs in, e.g. for the graph built by router.with_fast_path:
+    ("supervisor:<id>", "supervisor:<id>")      node "agent"    the supervisor's answer
+    ("supervisor:<id>", "analyst_agent:<id>")   node "agent"    the analyst working for the supervisor
+    ("supervisor:<id>", "analyst_agent:<id>")   node "tools"    the analyst's tool outputs
+    ("analyst_agent:<id>",)                     node "agent"    the analyst answering on the fast path
+    ()                                          node "catalog"  a catalog listing answered by the router
+so who speaks is decided from the namespace, not from the node name alone.
+"""
+
+# Standard library
+import time
+from typing import Any, Awaitable, Callable, Optional, Sequence, Tuple
+# LangChain and LangGraph
+from langchain_core.messages import AIMessage, ToolMessage
+
+
+# streamed text is sent to the UI at most every FLUSH_SECONDS, or as soon as FLUSH_CHARS are buffered
+FLUSH_SECONDS = 0.1
+FLUSH_CHARS = 500
+
+SUPERVISOR_NAME = "supervisor"
+ANALYST_NAME = "analyst_agent"
+
+
+class CoalescedMessage:
+    """
+    One UI message (a chainlit Message, or anything with async stream_token/send) fed chunk by chunk, but flushed
+    to the websocket in batches: a long answer costs a few dozen updates instead of one new message per token chunk.
+    With replace=True every push replaces the content (progress lines), and only the latest one is flushed.
+    """
+
+    def __init__(self, message: Any, replace: bool = False):
+        self.message = message
+        self.replace = replace
+        self.buffer = ""
+        self.last_flush = 0.0
+
+    async def push(self, text: str):
+        self.buffer = text if self.replace else self.buffer + text
+        if time.monotonic() - self.last_flush >= FLUSH_SECONDS or len(self.buffer) >= FLUSH_CHARS:
+            await self.flush()
+
+    async def flush(self):
+        if self.buffer:
+            await self.message.stream_token(self.buffer, is_sequence=self.replace)
+            self.buffer = ""
+        self.last_flush = time.monotonic()
+
+    async def close(self):
+        await self.flush()
+        await self.message.send()      # finalizes the streamed message
+
+
+def chunk_text(chunk: AIMessage) -> str:
+    """Text of a streamed chunk: a string (OpenAI) or a list of content blocks (Anthropic)."""
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(block.get("text", "") for block in chunk.content
+                   if isinstance(block, dict) and block.get("type", "text") == "text")
+
+
+def subgraph_name(part: str) -> str:
+    """Node name of a namespace part ("analyst_agent:<task id>")."""
+    return part.split(":", 1)[0]
+
+
+def speaker(namespace: Sequence[str], node: str, supervisor: str = SUPERVISOR_NAME,
+            analyst: str = ANALYST_NAME) -> Optional[str]:
+    """Who addresses the user with an AI chunk: "supervisor", "analyst" (fast path only), or None (inner work)."""
+    if not namespace:
+        return supervisor if node == "catalog" else None
+    if node != "agent":
+        return None
+    if subgraph_name(namespace[-1]) == supervisor:
+        return supervisor
+    if len(namespace) == 1 and subgraph_name(namespace[0]) == analyst:
+        return "analyst"
+    return None
+
+
+def is_analyst_tool_output(namespace: Sequence[str], node: str, analyst: str = ANALYST_NAME) -> bool:
+    """A tool output of the analyst, on either path (handoff messages excluded)."""
+    return node == "tools" and bool(namespace) and subgraph_name(namespace[-1]) == analyst
+
+
+class TurnStream:
+    """
+    Renders one chat turn from the graph stream: the speaking agent's text in one coalesced message per node turn,
+    the streaming tools' progress in one message updated in place, and the artifacts of the analyst's tool calls
+    (once per tool call). `new_message(author)` creates a UI message, `show_artifacts(tool_message)` displays the
+    figures and maps of a tool call.
+    """
+
+    def __init__(self, new_message: Callable[[str], Any],
+                 show_artifacts: Optional[Callable[[ToolMessage], Awaitable[None]]] = None,
+                 supervisor: str = SUPERVISOR_NAME, analyst: str = ANALYST_NAME):
+        self.new_message = new_message
+        self.show_artifacts = show_artifacts
+        self.supervisor = supervisor
+        self.analyst = analyst
+        self.progress: Optional[CoalescedMessage] = None
+        self.answer: Optional[CoalescedMessage] = None
+        self.turn: Optional[Tuple] = None       # (namespace, step) of the message being streamed
+        self.shown = set()          # tool calls whose artifacts were already displayed
+        self.route: Optional[str] = None        # where the pre-router sent the message
+        self.tokens_saved = 0       # by the history compaction, over the model calls of this turn
+
+    async def feed(self, namespace: Tuple[str, ...], mode: str, payload: Any):
+        if mode == "custom":
+            if "route" in payload:
+                self.route = payload["route"]
+            elif "compaction" in payload:
+                self.tokens_saved += payload["compaction"]["tokens_before"] - payload["compaction"]["tokens_after"]
+            elif "progress" in payload:
+                if self.progress is None:
+                    self.progress = CoalescedMessage(self.new_message("tool"), replace=True)
+                await self.progress.push(payload["progress"])
+            return
+
+        chunk, metadata = payload
+        node = metadata["langgraph_node"]
+        if isinstance(chunk, AIMessage) and chunk.content:
+            author = speaker(namespace, node, self.supervisor, self.analyst)
+            if author is None:
+                return
+            # one message per node turn: a new step (e.g. reporting after a handoff back) opens a new one
+            chunk_turn = (tuple(namespace), metadata.get("langgraph_step"))
+            if chunk_turn != self.turn:
+                if self.answer is not None:
+                    await self.answer.close()
+                self.answer, self.turn = CoalescedMessage(self.new_message(author)), chunk_turn
+            await self.answer.push(chunk_text(chunk))
+
+        elif isinstance(chunk, ToolMessage) and is_analyst_tool_output(namespace, node, self.analyst):
+            # artifacts are looked up by the tool call that produced them: a message shows its own figure or map
+            # (never the newest file of a folder), and only once even if the message is streamed again
+            if chunk.artifact and chunk.tool_call_id not in self.shown and self.show_artifacts is not None:
+                self.shown.add(chunk.tool_call_id)
+                await self.show_artifacts(chunk)
+
+    async def close(self):
+        """What is still buffered, and the final state of the streamed messages."""
+        for stream in (self.answer, self.progress):
+            if stream is not None:
+                await stream.close()
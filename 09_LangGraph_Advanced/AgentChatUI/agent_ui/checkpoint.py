@@ -0,0 +1,451 @@
+"""
+Persistent checkpointer for the chat graphs, on a single SQLite file: a conversation survives restarts of the app,
+and resuming it reads the latest checkpoint of its thread with a few primary-key lookups.
+
+Storage is kept compact:
+    - checkpoints are written as deltas: each superstep stores only the channels that changed (new_versions);
+    - lists (the message history) are stored item by item, content-addressed per thread, and the channel blob only
+      holds the 16-byte handles of its items, so a new turn writes its new messages and not the whole history again;
+    - msgpack payloads above COMPRESS_BYTES are zlib-compressed.
+Threads idle for more than CHECKPOINT_TTL_SECONDS are pruned, then the least recently used ones while the file holds
+more than CHECKPOINT_BYTES of payload.
+The chainlit apps compile their graphs with it. Graphs served by the LangGraph server (langgraph.json) are compiled
+without a checkpointer: the server persists their threads itself.
+"""
+
+# Standard library
+import asyncio
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+# LangChain and LangGraph
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (WRITES_IDX_MAP, BaseCheckpointSaver, ChannelVersions, Checkpoint,
+                                       CheckpointMetadata, CheckpointTuple, get_checkpoint_id, get_checkpoint_metadata)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+
+CHECKPOINT_DB = Path(os.environ.get("CHECKPOINT_DB", Path(tempfile.gettempdir()) / "agent_ui-checkpoints.sqlite"))
+CHECKPOINT_TTL = float(os.environ.get("CHECKPOINT_TTL_SECONDS", 7 * 24 * 3600))
+CHECKPOINT_BYTES = int(os.environ.get("CHECKPOINT_BYTES", 512 * 1024 ** 2))
+
+COMPRESS_BYTES = 1024       # smaller payloads are stored as they are
+COLLECT_SECONDS = 60        # pruning runs at most this often, after a write
+HANDLE_BYTES = 16
+BATCH = 500                 # bound parameters per IN (...) query
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    updated REAL NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS threads_updated ON threads (updated);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS items (
+    thread_id TEXT NOT NULL,
+    handle BLOB NOT NULL,
+    type TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (thread_id, handle)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+) WITHOUT ROWID;
+"""
+
+
+class CompactSerializer(JsonPlusSerializer):
+    """The default msgpack serializer, with large payloads zlib-compressed (type suffixed with +zlib)."""
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        typ, data = super().dumps_typed(obj)
+        if len(data) > COMPRESS_BYTES:
+            compressed = zlib.compress(data, 1)
+            if len(compressed) < len(data):
+                return f"{typ}+zlib", compressed
+        return typ, data
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        typ, payload = data
+        if typ.endswith("+zlib"):
+            typ, payload = typ[:-len("+zlib")], zlib.decompress(payload)
+        return super().loads_typed((typ, payload))
+
+
+def batches(values: Sequence, size: int = BATCH) -> Iterator[Sequence]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver):
+    """
+    Checkpoint saver on a SQLite file (see the module docstring for the storage layout). One connection, in WAL mode,
+    shared by the threads of the process behind a lock; the async methods run the sync ones in a worker thread,
+    so a write never blocks the event loop serving the chat sessions.
+    """
+
+    def __init__(self, path: Union[str, Path] = CHECKPOINT_DB, ttl: Optional[float] = CHECKPOINT_TTL,
+                 budget: Optional[int] = CHECKPOINT_BYTES, serde: Optional[JsonPlusSerializer] = None):
+        super().__init__(serde=serde or CompactSerializer())
+        self.path = Path(path)
+        self.ttl = ttl
+        self.budget = budget
+        self.conn: Optional[sqlite3.Connection] = None      # opened on first use
+        self.lock = threading.RLock()
+        self.collected = 0.0
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self.conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self.conn = conn
+        return self.conn
+
+    # ----------------------
+    # Values and list items
+    # ----------------------
+
+    def _dump_value(self, cur: sqlite3.Cursor, thread_id: str, value: Any) -> Tuple[str, bytes, int]:
+        """Serialized channel value, and the bytes it added to the file. Lists become the handles of their items."""
+        if not isinstance(value, list) or len(value) < 2:
+            typ, data = self.serde.dumps_typed(value)
+            return typ, data, len(data)
+        handles, added = [], 0
+        for item in value:
+            typ, data = self.serde.dumps_typed(item)
+            handle = hashlib.blake2b(typ.encode() + b"\0" + data, digest_size=HANDLE_BYTES).digest()
+            cur.execute("INSERT OR IGNORE INTO items VALUES (?, ?, ?, ?)", (thread_id, handle, typ, data))
+            added += len(data) if cur.rowcount > 0 else 0
+            handles.append(handle)
+        data = b"".join(handles)
+        return "handles", data, added + len(data)
+
+    def _load_values(self, thread_id: str, rows: List[Tuple[str, str, bytes]]) -> Dict[str, Any]:
+        """Channel values from (channel, type, blob) rows, with every list item fetched in the same few queries."""
+        wanted = {blob[i:i + HANDLE_BYTES] for _, typ, blob in rows if typ == "handles"
+                  for i in range(0, len(blob), HANDLE_BYTES)}
+        items = {}
+        for batch in batches(list(wanted)):
+            query = f"SELECT handle, type, data FROM items WHERE thread_id = ? AND handle IN ({','.join('?' * len(batch))})"
+            for handle, typ, data in self.db.execute(query, (thread_id, *batch)):
+                items[handle] = self.serde.loads_typed((typ, data))
+        values = {}
+        for channel, typ, blob in rows:
+            if typ == "empty":
+                continue
+            if typ == "handles":
+                values[channel] = [items[blob[i:i + HANDLE_BYTES]] for i in range(0, len(blob), HANDLE_BYTES)]
+            else:
+                values[channel] = self.serde.loads_typed((typ, blob))
+        return values
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, row: tuple) -> CheckpointTuple:
+        checkpoint_id, parent_id, typ, data, metadata_type, metadata = row
+        checkpoint: Checkpoint = self.serde.loads_typed((typ, data))
+        versions = list(checkpoint["channel_versions"].items())
+        rows = []
+        for batch in batches(versions):
+            query = ("SELECT channel, type, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? "
+                     f"AND (channel, version) IN (VALUES {','.join(['(?, ?)'] * len(batch))})")
+            params = [value for channel, version in batch for value in (channel, str(version))]
+            rows.extend(self.db.execute(query, (thread_id, checkpoint_ns, *params)))
+        writes = self.db.execute(
+            "SELECT task_id, channel, type, blob FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND checkpoint_id = ? ORDER BY task_path, task_id, idx", (thread_id, checkpoint_ns, checkpoint_id))
+
+        def config(id: str) -> RunnableConfig:
+            return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": id}}
+
+        return CheckpointTuple(
+            config=config(checkpoint_id),
+            checkpoint={**checkpoint, "channel_values": self._load_values(thread_id, rows)},
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((typ, blob)))
+                            for task_id, channel, typ, blob in writes],
+            parent_config=config(parent_id) if parent_id else None,
+        )
+
+    # ----------------------
+    # Checkpointer interface
+    # ----------------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata"
+        with self.lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self.db.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+            else:   # latest: checkpoint ids are time-ordered
+                row = self.db.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, checkpoint_ns)).fetchone()
+            return self._tuple(thread_id, checkpoint_ns, row) if row else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        where, params = [], []
+        if config:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata "
+                 f"FROM checkpoints {'WHERE ' + ' AND '.join(where) if where else ''} "
+                 "ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC")
+        with self.lock:
+            rows = self.db.execute(query, params).fetchall()
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self.serde.loads_typed((row[4], row[5]))
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            with self.lock:
+                checkpoint_tuple = self._tuple(thread_id, checkpoint_ns, tuple(row))
+            yield checkpoint_tuple
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint = checkpoint.copy()
+        values = checkpoint.pop("channel_values")
+        with self.lock:
+            cur = self.db.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                added = 0
+                # only the channels updated by this superstep: the others are found at their older versions
+                for channel, version in new_versions.items():
+                    if channel in values:
+                        typ, blob, size = self._dump_value(cur, thread_id, values[channel])
+                    else:
+                        typ, blob, size = "empty", b"", 0
+                    cur.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)",
+                                (thread_id, checkpoint_ns, channel, str(version), typ, blob))
+                    added += size
+                typ, data = self.serde.dumps_typed(checkpoint)
+                metadata_type, metadata_data = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+                cur.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                             typ, data, metadata_type, metadata_data))
+                self._touch(cur, thread_id, added + len(data) + len(metadata_data))
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            if time.monotonic() - self.collected > COLLECT_SECONDS:
+                self._collect(keep=thread_id)
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                 "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self.lock:
+            cur = self.db.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                added = 0
+                for idx, (channel, value) in enumerate(writes):
+                    idx = WRITES_IDX_MAP.get(channel, idx)
+                    typ, blob = self.serde.dumps_typed(value)
+                    # special writes (errors, interrupts...) replace the previous one, regular writes are kept once
+                    cur.execute(f"INSERT OR {'IGNORE' if idx >= 0 else 'REPLACE'} INTO writes "
+                                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, typ, blob, task_path))
+                    added += len(blob) if cur.rowcount > 0 else 0
+                self._touch(cur, thread_id, added)
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.lock:
+            cur = self.db.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete(cur, thread_id)
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        """Removes the checkpoints of threads ("delete"), or all but the latest of each namespace ("keep_latest")."""
+        if strategy not in ("keep_latest", "delete"):
+            raise ValueError(f"Unknown pruning strategy: {strategy}")
+        with self.lock:
+            cur = self.db.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                for thread_id in thread_ids:
+                    if strategy == "delete":
+                        self._delete(cur, thread_id)
+                    else:
+                        self._keep_latest(cur, thread_id)
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+
+    # ----------------------
+    # Pruning
+    # ----------------------
+
+    def collect(self):
+        """Removes the threads idle for longer than the ttl, then the least recently used ones while over budget."""
+        with self.lock:
+            self._collect()
+
+    def _collect(self, keep: Optional[str] = None):
+        self.collected = time.monotonic()
+        cur = self.db.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            if self.ttl is not None:
+                expired = cur.execute("SELECT thread_id FROM threads WHERE updated < ?",
+                                      (time.time() - self.ttl,)).fetchall()
+                for (thread_id,) in expired:
+                    if thread_id != keep:
+                        self._delete(cur, thread_id)
+            if self.budget is not None:
+                total = cur.execute("SELECT COALESCE(SUM(bytes), 0) FROM threads").fetchone()[0]
+                # the thread just written is never evicted
+                oldest = cur.execute("SELECT thread_id, bytes FROM threads WHERE thread_id IS NOT ? ORDER BY updated",
+                                     (keep,)).fetchall() if total > self.budget else []
+                for thread_id, size in oldest:
+                    if total <= self.budget:
+                        break
+                    self._delete(cur, thread_id)
+                    total -= size
+            cur.execute("COMMIT")
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+
+    def _touch(self, cur: sqlite3.Cursor, thread_id: str, added: int):
+        cur.execute("INSERT INTO threads VALUES (?, ?, ?) ON CONFLICT (thread_id) "
+                    "DO UPDATE SET updated = excluded.updated, bytes = bytes + excluded.bytes",
+                    (thread_id, time.time(), added))
+
+    def _delete(self, cur: sqlite3.Cursor, thread_id: str):
+        for table in ("checkpoints", "blobs", "items", "writes", "threads"):
+            cur.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def _keep_latest(self, cur: sqlite3.Cursor, thread_id: str):
+        latest = cur.execute("SELECT checkpoint_ns, MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ? "
+                             "GROUP BY checkpoint_ns", (thread_id,)).fetchall()
+        for checkpoint_ns, checkpoint_id in latest:
+            typ, data = cur.execute("SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                                    "AND checkpoint_id = ?", (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+            versions = {(channel, str(version))
+                        for channel, version in self.serde.loads_typed((typ, data))["channel_versions"].items()}
+            for table in ("checkpoints", "writes"):
+                cur.execute(f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id != ?",
+                            (thread_id, checkpoint_ns, checkpoint_id))
+            stale = [key for key in cur.execute("SELECT channel, version FROM blobs WHERE thread_id = ? "
+                                                "AND checkpoint_ns = ?", (thread_id, checkpoint_ns))
+                     if key not in versions]
+            cur.executemany("DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                            [(thread_id, checkpoint_ns, *key) for key in stale])
+        # list items no longer referenced by any remaining blob
+        used = {blob[i:i + HANDLE_BYTES]
+                for (blob,) in cur.execute("SELECT blob FROM blobs WHERE thread_id = ? AND type = 'handles'", (thread_id,))
+                for i in range(0, len(blob), HANDLE_BYTES)}
+        unused = [(thread_id, handle) for (handle,) in
+                  cur.execute("SELECT handle FROM items WHERE thread_id = ?", (thread_id,)) if handle not in used]
+        cur.executemany("DELETE FROM items WHERE thread_id = ? AND handle = ?", unused)
+        size = sum(cur.execute(f"SELECT COALESCE(SUM({expr}), 0) FROM {table} WHERE thread_id = ?",
+                               (thread_id,)).fetchone()[0]
+                   for table, expr in (("checkpoints", "LENGTH(checkpoint) + LENGTH(metadata)"),
+                                       ("blobs", "LENGTH(blob)"), ("items", "LENGTH(data)"), ("writes", "LENGTH(blob)")))
+        cur.execute("UPDATE threads SET bytes = ? WHERE thread_id = ?", (size, thread_id))
+
+    # ----------------------
+    # Async interface: the sync methods, in a worker thread
+    # ----------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None
+                    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        await asyncio.to_thread(self.prune, thread_ids, strategy=strategy)
+
+
+# shared by every session of the process
+checkpointer = SqliteCheckpointSaver()
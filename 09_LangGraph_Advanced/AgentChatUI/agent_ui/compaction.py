@@ -0,0 +1,118 @@
+"""
+Token-aware compaction of the history sent to the models. The supervisors run with output_mode="full_history", so
+every tool output of the analyst (code listings, previews, stdout) stays in the messages and is sent again to both
+models on every later turn. Before each model call, a pre_model_hook compacts what the model sees: the last turns
+are kept verbatim, and older tool outputs and tool-call arguments are collapsed into one-line summaries that name
+the tool and its call id, oldest first, until the history fits the token budget. The state itself is untouched:
+checkpoints and the frontends keep the full messages.
+"""
+
+# Standard library
+import os
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+# LangChain and LangGraph
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.config import get_stream_writer
+
+
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", 6000))
+HISTORY_KEEP_TURNS = int(os.environ.get("HISTORY_KEEP_TURNS", 2))      # user turns always kept verbatim
+SUMMARY_CHARS = 160         # kept from the start of a collapsed tool output
+ARGUMENT_CHARS = 200        # longer tool-call arguments (code...) are elided in old messages
+
+
+def clip(text: str, chars: int) -> str:
+    return text if len(text) <= chars else text[:chars].rstrip() + "…"
+
+
+def message_text(message: AnyMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return " ".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in message.content)
+
+
+def collapse_tool_message(message: ToolMessage, tokens: int) -> ToolMessage:
+    first_line = message_text(message).strip().split("\n", 1)[0]
+    summary = (f"[earlier output of {message.name or 'a tool'} (call {message.tool_call_id}), ~{tokens} tokens, "
+               f"compacted] {clip(first_line, SUMMARY_CHARS)}")
+    return message.model_copy(update={"content": summary})
+
+
+def shorten_arguments(args: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: f"<{len(value)} characters elided>" if isinstance(value, str) and len(value) > ARGUMENT_CHARS
+            else value for key, value in args.items()}
+
+
+def collapse_tool_calls(message: AIMessage) -> AIMessage:
+    """An old AI message with its long tool-call arguments (the code of a REPL cell...) elided."""
+    content = message.content
+    if isinstance(content, list):   # anthropic: tool_use blocks repeat the arguments
+        content = [{**block, "input": shorten_arguments(block["input"])}
+                   if isinstance(block, dict) and block.get("type") == "tool_use" and isinstance(block.get("input"), dict)
+                   else block for block in content]
+    tool_calls = [{**call, "args": shorten_arguments(call["args"])} for call in message.tool_calls]
+    return message.model_copy(update={"content": content, "tool_calls": tool_calls})
+
+
+class HistoryCompactor:
+    """
+    Keeps the messages from the last `keep_turns` user messages on verbatim, and collapses older tool outputs and
+    tool-call arguments, oldest first, while the history is over `budget` tokens (approximate count). Recent turns
+    are never compacted, even if they alone exceed the budget. Counts the tokens saved.
+    """
+
+    def __init__(self, budget: int = HISTORY_TOKEN_BUDGET, keep_turns: int = HISTORY_KEEP_TURNS):
+        self.budget = budget
+        self.keep_turns = keep_turns
+        self.calls = 0
+        self.tokens_saved = 0
+        self.lock = threading.Lock()
+
+    def compact(self, messages: List[AnyMessage]) -> Tuple[List[AnyMessage], int, int]:
+        """The compacted messages, and the history size in tokens before and after."""
+        counts = [count_tokens_approximately([message]) for message in messages]
+        before = total = sum(counts)
+        if total <= self.budget:
+            return messages, before, before
+
+        human = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+        # from the keep_turns-th last user message on, messages are kept verbatim
+        recent = human[max(len(human) - self.keep_turns, 0)] if self.keep_turns and human else len(messages)
+        compacted = list(messages)
+        for i in range(recent):
+            if total <= self.budget:
+                break
+            message = messages[i]
+            if isinstance(message, ToolMessage):
+                compacted[i] = collapse_tool_message(message, counts[i])
+            elif isinstance(message, AIMessage) and message.tool_calls:
+                compacted[i] = collapse_tool_calls(message)
+            else:
+                continue
+            new_count = count_tokens_approximately([compacted[i]])
+            total -= counts[i] - new_count
+        return compacted, before, total
+
+    def hook(self, agent: str) -> Callable[[dict], dict]:
+        """pre_model_hook for an agent: the compacted history goes to the model, the state keeps the full one."""
+
+        def compact_history(state: dict) -> dict:
+            messages, before, after = self.compact(state["messages"])
+            with self.lock:
+                self.calls += 1
+                self.tokens_saved += before - after
+            if after < before:
+                get_stream_writer()({"compaction": {"agent": agent, "tokens_before": before, "tokens_after": after}})
+            return {"llm_input_messages": messages}
+
+        return compact_history
+
+    def stats(self) -> str:
+        with self.lock:
+            return f"{self.tokens_saved} tokens saved over {self.calls} model calls"
+
+
+# shared by every session of the process
+history_compactor = HistoryCompactor()
@@ -0,0 +1,204 @@
+# Standard library
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+# Third-party libraries
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from agent_ui.loader import read_dataset
+
+
+DEFAULT_BUDGET = int(os.environ.get("DATASET_CACHE_BYTES", 2 * 1024 ** 3))
+GEOMETRY_BYTES = 100        # shapely object and GEOS header of a geometry, its coordinates apart
+PANDAS_3 = int(pd.__version__.split(".")[0]) >= 3
+
+
+def copy_on_write() -> bool:
+    """Whether pandas copies a shared column on its first write: always from pandas 3, if enabled before."""
+    return PANDAS_3 or pd.get_option("mode.copy_on_write") is True
+
+
+def shared_copy(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    A copy of a shared frame that the caller may modify. With copy-on-write, a shallow copy sharing the column
+    buffers: a write copies the touched column in the writer only. Without it, a deep copy.
+    """
+    return df.copy(deep=not copy_on_write())
+
+
+def geometry_bytes(series: gpd.GeoSeries) -> int:
+    """Memory held by shapely geometries: a header each, plus 8 bytes per coordinate value (2 or 3 per point)."""
+    geoms = np.asarray(series.array, dtype=object)
+    present = ~shapely.is_missing(geoms)
+    values = shapely.get_num_coordinates(geoms) * np.where(shapely.has_z(geoms), 3, 2)
+    return 8 * len(geoms) + GEOMETRY_BYTES * int(present.sum()) + 8 * int(values.sum())
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    """Memory held by a frame (strings and geometries included)."""
+    size = 0
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series, gpd.GeoSeries):
+            size += geometry_bytes(series)
+        else:
+            size += int(series.memory_usage(deep=True, index=False))
+    return size + int(df.index.memory_usage())
+
+
+class PendingLoad:
+    """A read in progress: sessions asking for the same key meanwhile wait for it and share its frame (or error)."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.frame: Optional[pd.DataFrame] = None
+        self.error: Optional[Exception] = None
+
+
+class DatasetCache:
+    """
+    Process-wide, read-only cache of loaded datasets, shared by every session (chainlit users, AgentChatUI threads).
+    Keyed by file path, mtime and read options: a modified file is never served stale.
+    Callers get copies of the cached frame (see shared_copy): a session modifying its frame never affects the others,
+    and with copy-on-write ten sessions on the same dataset hold one copy of the data.
+    When the resident size exceeds `budget` bytes, the least recently used frames are evicted.
+    Copies of the data held elsewhere (the REPL pool's shared-memory exports) are charged to the same budget.
+    """
+
+    def __init__(self, budget: int = DEFAULT_BUDGET):
+        self.budget = budget
+        self.entries = OrderedDict()    # key -> (frame, bytes), least recently used first
+        self.loading: Dict[tuple, PendingLoad] = {}      # one read at a time per key
+        self.lock = threading.Lock()
+        self.bytes_resident = 0
+        self.bytes_external = 0     # charged by the holders of other copies, see charge/refund
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(path: Path, columns: Optional[List[str]], filters: Optional[Sequence], limit: Optional[int]) -> tuple:
+        stat = path.stat()
+        return (
+            str(path.resolve()), stat.st_mtime_ns, stat.st_size,
+            tuple(columns) if columns is not None else None, json.dumps(filters, default=str) if filters else None, limit,
+        )
+
+    def _get(self, key: tuple):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return shared_copy(entry[0])
+
+    def load(self, path: Union[str, Path],
+             columns: Optional[List[str]] = None,
+             filters: Optional[Sequence] = None,
+             limit: Optional[int] = None) -> Union[pd.DataFrame, gpd.GeoDataFrame]:
+        """Same arguments as read_dataset: returns the cached frame if any, otherwise reads and caches it."""
+        path = Path(path)
+        key = self.make_key(path, columns, filters, limit)
+
+        df = self._get(key)
+        if df is not None:
+            return df
+
+        with self.lock:
+            pending = self.loading.get(key)
+            reader = pending is None
+            if reader:
+                pending = self.loading[key] = PendingLoad()
+        if not reader:
+            # loaded by another session while we were waiting: its frame, even if too large to be cached
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            if pending.frame is None:      # the reader was interrupted: read it ourselves
+                return self.load(path, columns=columns, filters=filters, limit=limit)
+            with self.lock:
+                self.hits += 1
+            return shared_copy(pending.frame)
+
+        try:
+            df = self._get(key)    # cached by a reader that finished since the lookup above
+            if df is None:
+                df = read_dataset(path, columns=columns, filters=filters, limit=limit)
+                self._put(key, df)
+                with self.lock:
+                    self.misses += 1
+            pending.frame = df
+            return shared_copy(df)
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self.lock:
+                self.loading.pop(key, None)
+            pending.done.set()
+
+    def _put(self, key: tuple, df: pd.DataFrame):
+        size = frame_bytes(df)
+        if size > self.budget:      # would evict everything else: serve it uncached
+            return
+        with self.lock:
+            # older versions of the same file will never be requested again
+            for old in [k for k in self.entries if k[0] == key[0] and k[1:3] != key[1:3]]:
+                self._evict(old)
+            self.entries[key] = (df, size)
+            self.bytes_resident += size
+            self._trim()
+
+    def _trim(self):
+        while self.entries and self.bytes_resident + self.bytes_external > self.budget:
+            self._evict(next(iter(self.entries)))
+
+    @property
+    def bytes_free(self) -> int:
+        with self.lock:
+            return self.budget - self.bytes_resident - self.bytes_external
+
+    def charge(self, size: int):
+        """Counts `size` bytes held outside the cache against the budget, evicting cached frames if needed."""
+        with self.lock:
+            self.bytes_external += size
+            self._trim()
+
+    def refund(self, size: int):
+        with self.lock:
+            self.bytes_external -= size
+
+    def _evict(self, key: tuple):
+        _, size = self.entries.pop(key)
+        self.bytes_resident -= size
+        self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes_resident = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes_resident": self.bytes_resident,
+                "bytes_external": self.bytes_external,
+                "budget": self.budget,
+            }
+
+
+# shared by every session of the process
+dataset_cache = DatasetCache()
@@ -0,0 +1,103 @@
+"""
+Local fake LLM provider enforcing requests/tokens limits, to exercise the scheduler without any API call.
+
+    python -m agent_ui.fake_provider
+"""
+
+# Standard library
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+# LangChain
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import ConfigDict
+
+from agent_ui.scheduler import LLMScheduler
+
+
+class FakeRateLimitError(Exception):
+    """Same shape as the providers' RateLimitError: a 429 status code."""
+    status_code = 429
+
+
+class FakeProvider:
+    """Sliding-window limits: at most `rpm` requests and `tpm` tokens per `period` seconds."""
+
+    def __init__(self, rpm: int, tpm: int, period: float = 60.0, latency: float = 0.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.period = period
+        self.latency = latency
+        self.calls = deque()    # (timestamp, tokens)
+        self.lock = threading.Lock()
+        self.served = 0
+        self.rejected = 0
+
+    def request(self, tokens: int):
+        with self.lock:
+            now = time.monotonic()
+            while self.calls and now - self.calls[0][0] > self.period:
+                self.calls.popleft()
+            used = sum(t for _, t in self.calls)
+            if len(self.calls) + 1 > self.rpm or used + tokens > self.tpm:
+                self.rejected += 1
+                raise FakeRateLimitError("Rate limit reached")
+            self.calls.append((now, tokens))
+            self.served += 1
+        time.sleep(self.latency)
+
+
+class FakeProviderChatModel(BaseChatModel):
+    """Chat model answering from a FakeProvider; every call costs `tokens_per_call` tokens."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    provider: Any
+    tokens_per_call: int = 100
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-provider"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self.provider.request(self.tokens_per_call)
+        message = AIMessage(
+            content="ok",
+            usage_metadata={"input_tokens": self.tokens_per_call, "output_tokens": 0,
+                            "total_tokens": self.tokens_per_call},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def run_load(model: BaseChatModel, requests: int, workers: int) -> int:
+    """Fires `requests` calls from `workers` threads and returns how many failed."""
+    def call(i):
+        try:
+            model.invoke(f"request {i}")
+            return 0
+        except FakeRateLimitError:
+            return 1
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(call, range(requests)))
+
+
+if __name__ == "__main__":
+    limits = {"fake": {"rpm": 20, "tpm": 1500}}     # per second here (period=1)
+
+    provider = FakeProvider(rpm=20, tpm=1500, period=1.0, latency=0.01)
+    failures = run_load(FakeProviderChatModel(provider=provider), requests=100, workers=16)
+    print(f"without scheduler: {failures} rate-limit errors out of 100 requests")
+
+    provider = FakeProvider(rpm=20, tpm=1500, period=1.0, latency=0.01)
+    scheduler = LLMScheduler(limits=limits, period=1.0, backoff_base=0.1, backoff_cap=1.0)
+    model = FakeProviderChatModel(provider=provider, **scheduler.client_kwargs("fake"))
+    start = time.monotonic()
+    failures = run_load(model, requests=100, workers=16)
+    print(f"with scheduler: {failures} rate-limit errors out of 100 requests ({time.monotonic() - start:.1f}s)")
+    print(scheduler.metrics())
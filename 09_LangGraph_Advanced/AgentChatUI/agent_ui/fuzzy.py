@@ -0,0 +1,109 @@
+# Standard library
+import unicodedata
+from typing import List, Optional, Sequence, Tuple
+# Third-party libraries
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+from agent_ui.handles import DatasetHandle, DatasetStore, dataset_store
+from agent_ui.tool_cache import ToolCache
+
+
+BLOCKING_MIN_CHOICES = 5000     # below this, scoring every choice is already fast
+CANDIDATES_PER_QUERY = 1000     # choices sharing the most trigrams with a query, scored with the real scorer
+
+
+def normalize(text: str) -> str:
+    """Lowercase, no accents, punctuation as spaces: 'Torre dell’Orologio' -> 'torre dell orologio'."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return default_process(text)
+
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyIndex:
+    """
+    Fuzzy lookup over the distinct values of one column, built once:
+    normalized choices, and a trigram inverted index used to pre-select candidates on large columns.
+    """
+
+    def __init__(self, values: pd.Series, scorer=fuzz.token_sort_ratio):
+        self.scorer = scorer
+        names = values.dropna().astype(str).str.strip()
+        names = names[names != ""].unique()
+        normalized = pd.Series([normalize(name) for name in names])
+        first = ~normalized.duplicated()        # one display name per normalized form
+        self.names: List[str] = list(names[first.to_numpy()])
+        self.choices: List[str] = list(normalized[first])
+
+        self.postings = None
+        if len(self.choices) >= BLOCKING_MIN_CHOICES:
+            postings = {}
+            for i, choice in enumerate(self.choices):
+                for gram in trigrams(choice):
+                    postings.setdefault(gram, []).append(i)
+            self.postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.choices)
+
+    def candidates(self, query: str) -> Optional[np.ndarray]:
+        """Indices of the choices sharing the most trigrams with the query, None to score them all."""
+        if self.postings is None:
+            return None
+        lists = [self.postings[g] for g in trigrams(query) if g in self.postings]
+        if not lists:
+            return np.empty(0, dtype=np.int32)
+        counts = np.bincount(np.concatenate(lists), minlength=len(self.choices))
+        hits = np.flatnonzero(counts)
+        if len(hits) <= CANDIDATES_PER_QUERY:
+            return hits
+        return hits[np.argpartition(counts[hits], -CANDIDATES_PER_QUERY)[-CANDIDATES_PER_QUERY:]]
+
+    def match(self, queries: Sequence[str], threshold: float = 0) -> List[Tuple[Optional[str], float]]:
+        """Best (name, score) of every query, in one cdist call; (None, best score) below `threshold`."""
+        if not self.choices:
+            return [(None, 0.0)] * len(queries)
+        normalized = [normalize(q) for q in queries]
+
+        blocks = [self.candidates(q) for q in normalized]
+        if any(block is None for block in blocks):
+            pool = np.arange(len(self.choices))
+        else:
+            pool = np.unique(np.concatenate(blocks)) if blocks else np.empty(0, dtype=np.int64)
+
+        results = [(None, 0.0)] * len(queries)
+        if len(pool):
+            scores = process.cdist(normalized, [self.choices[i] for i in pool], scorer=self.scorer,
+                                   processor=None, workers=-1)
+            best = scores.argmax(axis=1)
+            results = [(self.names[pool[b]], float(scores[row, b])) for row, b in enumerate(best)]
+
+        for row, (name, score) in enumerate(results):
+            if score < threshold and self.postings is not None:
+                # blocking can miss heavily reordered or misspelled names: full scan for these only
+                found = process.extractOne(normalized[row], self.choices, scorer=self.scorer, processor=None)
+                if found is not None and found[1] > score:
+                    name, score = self.names[found[2]], float(found[1])
+            results[row] = (name, score) if score >= threshold else (None, score)
+        return results
+
+
+# (dataset version and read options, column) -> index; dropped with the least recently used datasets
+fuzzy_indexes = ToolCache(maxsize=32)
+
+
+def get_index(handle: DatasetHandle, column: str, store: DatasetStore = dataset_store) -> FuzzyIndex:
+    """The index of a loaded dataset's column, built on first use."""
+    key = (store.key(handle), column)
+    found, index = fuzzy_indexes.get(key)
+    if not found:
+        index = FuzzyIndex(store.resolve(handle)[column])
+        fuzzy_indexes.put(key, index)
+    return index
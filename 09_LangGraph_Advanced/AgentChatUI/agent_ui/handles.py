@@ -0,0 +1,121 @@
+# Standard library
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from typing_extensions import TypedDict
+# Third-party libraries
+import pandas as pd
+import geopandas as gpd
+
+from agent_ui.catalog import footer_version
+from agent_ui.dataset_cache import DatasetCache, dataset_cache
+
+
+class StaleHandleError(ValueError):
+    """The file behind a handle changed since the dataset was loaded: the handle no longer describes its content."""
+
+
+class DatasetHandle(TypedDict):
+    """
+    What graph state keeps of a loaded dataset: a few plain, JSON-friendly fields, whatever the dataset size.
+    The frame itself lives in the DatasetStore and is resolved from (source, read options) when a tool needs it.
+    """
+    name: str
+    source: str                     # parquet file path
+    version: Optional[str]          # catalog version (footer hash) at load time
+    columns: Optional[List[str]]    # read options: the handle is a projection of the file
+    filters: Optional[list]
+    limit: Optional[int]
+    kind: str                       # DataFrame or GeoDataFrame
+    shape: Tuple[int, int]
+
+
+class DatasetStore:
+    """
+    Out-of-band store of the frames behind the handles in graph state.
+    Checkpointers, full_history handoffs and state snapshots only carry handles; tools call `resolve`.
+    Frames are held by the process-wide DatasetCache: resolving is a cache hit (shallow copy) in the common case,
+    and a re-read of the same projection if the frame was evicted in the meantime.
+    A handle carrying a catalog version only resolves while the file still has that version.
+    """
+
+    def __init__(self, cache: DatasetCache = dataset_cache):
+        self.cache = cache
+        self.versions: Dict[str, Tuple[int, int, str]] = {}     # source -> (mtime_ns, size, version)
+        self.lock = threading.Lock()
+
+    def open(self, name: str, path: Union[str, Path],
+             columns: Optional[List[str]] = None,
+             filters: Optional[Sequence] = None,
+             limit: Optional[int] = None,
+             version: Optional[str] = None) -> Tuple[DatasetHandle, Union[pd.DataFrame, gpd.GeoDataFrame]]:
+        """Loads a dataset and returns its handle (for the state) along with the frame."""
+        df = self.cache.load(path, columns=columns, filters=filters, limit=limit)
+        handle = DatasetHandle(
+            name=name,
+            source=str(path),
+            version=version,
+            columns=list(columns) if columns is not None else None,
+            filters=json.loads(json.dumps(filters)) if filters else None,     # tuples -> lists, as after a checkpoint
+            limit=limit,
+            kind="GeoDataFrame" if isinstance(df, gpd.GeoDataFrame) else "DataFrame",
+            shape=tuple(df.shape),
+        )
+        return handle, df
+
+    def key(self, handle: DatasetHandle) -> tuple:
+        """Identifies the file version and read options behind a handle: the key of anything derived from its frame."""
+        return self.cache.make_key(Path(handle["source"]), handle["columns"], handle["filters"], handle["limit"])
+
+    def current_version(self, source: str) -> str:
+        """Catalog version of a file, hashed again only when its mtime or size changed (like the catalog does)."""
+        stat = os.stat(source)
+        with self.lock:
+            known = self.versions.get(source)
+        if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size):
+            return known[2]
+        version = footer_version(Path(source))
+        with self.lock:
+            self.versions[source] = (stat.st_mtime_ns, stat.st_size, version)
+        return version
+
+    def check(self, handle: DatasetHandle):
+        """Raises StaleHandleError if the file changed since the handle was created (handles without a version pass)."""
+        if handle.get("version") and self.current_version(handle["source"]) != handle["version"]:
+            raise StaleHandleError(f"Dataset '{handle['name']}' changed on disk since it was loaded: "
+                                   f"load it again to use the new version.")
+
+    def resolve(self, handle: DatasetHandle) -> Union[pd.DataFrame, gpd.GeoDataFrame]:
+        self.check(handle)
+        return self.cache.load(handle["source"], columns=handle["columns"], filters=handle["filters"],
+                               limit=handle["limit"])
+
+    def resolve_all(self, handles: Dict[str, DatasetHandle]) -> Dict[str, Union[pd.DataFrame, gpd.GeoDataFrame]]:
+        return {name: self.resolve(handle) for name, handle in (handles or {}).items()}
+
+
+def merge_handles(existing: Optional[Dict[str, DatasetHandle]] = None,
+                  new: Optional[Dict[str, Optional[DatasetHandle]]] = None) -> Dict[str, DatasetHandle]:
+    """
+    Reducer of state['loaded']: a handle replaces the one of the same name (dataset loaded again, e.g. with
+    other read options), and None removes it (dataset unloaded).
+    """
+    merged = dict(existing or {})
+    for name, handle in (new or {}).items():
+        if handle is None:
+            merged.pop(name, None)
+        else:
+            merged[name] = handle
+    return merged
+
+
+def describe_handle(handle: DatasetHandle) -> str:
+    """One line, for list_inmemory_datasets (no frame needed)."""
+    rows, cols = handle["shape"]
+    return f"- {handle['name']}: {handle['kind']} (shape=({rows}, {cols}))"
+
+
+# shared by every session of the process
+dataset_store = DatasetStore()
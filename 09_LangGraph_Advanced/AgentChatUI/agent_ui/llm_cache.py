@@ -0,0 +1,257 @@
+# Standard library
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List, Optional, Sequence
+# LangChain
+from langchain_core.caches import BaseCache
+from langchain_core.embeddings import Embeddings
+from langchain_core.globals import get_llm_cache, set_llm_cache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+
+MODES = ("record", "replay", "passthrough")
+DEFAULT_CACHE_PATH = ".llm_cache.sqlite3"
+
+
+class LLMCacheMiss(KeyError):
+    """Raised in replay mode when a request (or an embedded text) was never recorded: replay never calls the provider."""
+
+
+def serialize_generations(generations: Sequence[Generation]) -> str:
+    items = []
+    for generation in generations:
+        if isinstance(generation, ChatGeneration):
+            # the message id belongs to the recording run: drop it so every replay gets a fresh one
+            message = generation.message.model_copy(update={"id": None})
+            items.append({"message": message_to_dict(message), "generation_info": generation.generation_info})
+        else:
+            items.append({"text": generation.text, "generation_info": generation.generation_info})
+    return json.dumps(items)
+
+
+def deserialize_generations(payload: str) -> list:
+    generations = []
+    for item in json.loads(payload):
+        if "message" in item:
+            message = messages_from_dict([item["message"]])[0]
+            generations.append(ChatGeneration(message=message, generation_info=item["generation_info"]))
+        else:
+            generations.append(Generation(text=item["text"], generation_info=item["generation_info"]))
+    return generations
+
+
+# run-specific fields of the messages in a prompt: a replayed answer carries different ones than the recorded answer
+VOLATILE_FIELDS = ("id", "usage_metadata", "response_metadata")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    The serialized messages of a chat prompt without their run-specific fields, so a conversation replayed from the
+    cache hashes like the recorded one: the AI messages of earlier answers come back with their own usage and ids.
+    Text prompts (completion models) are returned as they are.
+    """
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt
+    if not isinstance(messages, list) or not all(isinstance(m, dict) and "kwargs" in m for m in messages):
+        return prompt
+    for message in messages:
+        for name in VOLATILE_FIELDS:
+            message["kwargs"].pop(name, None)
+    return json.dumps(messages, sort_keys=True)
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    Persistent LLM response cache used through LangChain's global cache hook.
+
+    LangChain calls lookup/update with the serialized messages (`prompt`) and the serialized
+    model parameters (`llm_string`: model name, temperature, bound tools...), so the key covers
+    model, parameters, messages and tools.
+    Responses are stored as complete messages, tool calls included: when the model is streamed
+    (e.g. LangGraph stream_mode="messages") LangChain aggregates the chunks before updating the cache,
+    and a replayed response is emitted as one message.
+    LangChain consults the cache only on the invoke/generate path, which graph nodes use even when the graph is
+    streamed. A direct `model.stream()` / `model.astream()` call on a streaming model bypasses it and always calls
+    the provider, in replay mode too: invoke the model (or stream the graph) where replay must stay offline.
+    Embeddings go through LangChain's embeddings interface, not the LLM cache hook: wrap them with
+    cached_embeddings() to cache them in the same database.
+
+    Modes:
+        - record: answer from the cache, call the provider (and store the answer) on a miss.
+        - replay: answer only from the cache, raise LLMCacheMiss on a miss: no network at all.
+        - passthrough: the cache is neither read nor written.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, mode: str = "record"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}', expected one of {MODES}")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, llm_string TEXT, response TEXT, created REAL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings_cache (key TEXT PRIMARY KEY, model TEXT, vector BLOB, created REAL)"
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[list]:
+        if self.mode == "passthrough":
+            return None
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT response FROM llm_cache WHERE key = ?", (self.make_key(normalize_prompt(prompt), llm_string),)
+            ).fetchone()
+
+        if row is not None:
+            self.hits += 1
+            return deserialize_generations(row[0])
+
+        self.misses += 1
+        if self.mode == "replay":
+            raise LLMCacheMiss(f"No recorded response for this request in '{self.path}' (replay mode)")
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        if self.mode != "record":
+            return
+
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, llm_string, response, created) VALUES (?, ?, ?, ?)",
+                (self.make_key(normalize_prompt(prompt), llm_string), llm_string, serialize_generations(return_val),
+                 time.time()),
+            )
+            self.connection.commit()
+
+    def lookup_vectors(self, texts: Sequence[str], model: str) -> List[Optional[List[float]]]:
+        """Recorded embeddings of `texts` (None where missing); raises LLMCacheMiss on a miss in replay mode."""
+        if self.mode == "passthrough":
+            return [None] * len(texts)
+
+        keys = [self.make_key(text, model) for text in texts]
+        with self.lock:
+            found = {}
+            for start in range(0, len(keys), 500):      # under SQLite's limit of bound parameters
+                batch = keys[start:start + 500]
+                found.update(self.connection.execute(
+                    f"SELECT key, vector FROM embeddings_cache WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall())
+        vectors = [array("d", found[key]).tolist() if key in found else None for key in keys]
+
+        missing = vectors.count(None)
+        self.hits += len(texts) - missing
+        self.misses += missing
+        if missing and self.mode == "replay":
+            raise LLMCacheMiss(f"{missing} texts were never embedded with '{model}' in '{self.path}' (replay mode)")
+        return vectors
+
+    def update_vectors(self, texts: Sequence[str], model: str, vectors: Sequence[List[float]]) -> None:
+        if self.mode != "record":
+            return
+
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings_cache (key, model, vector, created) VALUES (?, ?, ?, ?)",
+                [(self.make_key(text, model), model, array("d", vector).tobytes(), now)
+                 for text, vector in zip(texts, vectors)],
+            )
+            self.connection.commit()
+
+    def clear(self, **kwargs) -> None:
+        with self.lock:
+            self.connection.execute("DELETE FROM llm_cache")
+            self.connection.execute("DELETE FROM embeddings_cache")
+            self.connection.commit()
+
+    def stats(self) -> dict:
+        with self.lock:
+            size = self.connection.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            vectors = self.connection.execute("SELECT COUNT(*) FROM embeddings_cache").fetchone()[0]
+        return {"mode": self.mode, "hits": self.hits, "misses": self.misses, "entries": size, "vectors": vectors}
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings client answering from the SQLite cache: only the texts never embedded with `model` reach the
+    wrapped client (none in replay mode). Keyed by model and text, stored next to the LLM responses.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: SQLiteLLMCache, model: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.lookup_vectors(texts, self.model)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self.embeddings.embed_documents([texts[i] for i in missing])
+            self.cache.update_vectors([texts[i] for i in missing], self.model, computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.lookup_vectors(texts, self.model)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = await self.embeddings.aembed_documents([texts[i] for i in missing])
+            self.cache.update_vectors([texts[i] for i in missing], self.model, computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+def enable_llm_cache(path: Optional[str] = None, mode: Optional[str] = None) -> Optional[SQLiteLLMCache]:
+    """
+    Installs the SQLite cache as LangChain's global LLM cache, for every chat model of the process.
+    Call it once at startup, after loading the .env file.
+
+    `mode` and `path` default to the LLM_CACHE_MODE and LLM_CACHE_PATH environment variables.
+    Without a mode (or with "passthrough") nothing is installed and models call the provider as usual.
+    """
+    mode = mode or os.environ.get("LLM_CACHE_MODE", "passthrough")
+    if mode == "passthrough":
+        return None
+
+    cache = SQLiteLLMCache(path=path or os.environ.get("LLM_CACHE_PATH", DEFAULT_CACHE_PATH), mode=mode)
+    set_llm_cache(cache)
+    return cache
+
+
+def cached_embeddings(embeddings: Embeddings, model: str) -> Embeddings:
+    """
+    The embeddings client behind the cache installed by enable_llm_cache (record or replay it like the chat models),
+    or unchanged when no cache is installed. Call it after enable_llm_cache.
+    """
+    cache = get_llm_cache()
+    if not isinstance(cache, SQLiteLLMCache):
+        return embeddings
+    return CachedEmbeddings(embeddings, cache, model)
@@ -0,0 +1,124 @@
+# Standard library
+import json
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence, Union
+# Third-party libraries
+import pandas as pd
+import geopandas as gpd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+# full reads estimated above this size are refused by the load_dataset tools: stream or subset instead
+MAX_LOAD_BYTES = int(os.environ.get("MAX_LOAD_BYTES", 2 * 1024 ** 3))
+
+
+def geo_metadata(schema) -> Optional[dict]:
+    """GeoParquet metadata of an arrow schema, None for plain parquet."""
+    geo = (schema.metadata or {}).get(b"geo")
+    return json.loads(geo) if geo else None
+
+
+def to_expression(filters: Optional[Sequence]):
+    """
+    Row filters in pyarrow/pandas DNF format, e.g. [("quartiere", "==", "Navile"), ("anno", ">=", 2020)]
+    (a list of lists of tuples means OR of ANDs).
+    """
+    if not filters:
+        return None
+    if isinstance(filters[0][0], (list, tuple)):
+        return pq.filters_to_expression([[tuple(f) for f in group] for group in filters])
+    return pq.filters_to_expression([tuple(f) for f in filters])
+
+
+def read_dataset(path: Union[str, Path],
+                 columns: Optional[List[str]] = None,
+                 filters: Optional[Sequence] = None,
+                 limit: Optional[int] = None) -> Union[pd.DataFrame, gpd.GeoDataFrame]:
+    """
+    Reads a parquet file once, as a GeoDataFrame if its footer has GeoParquet metadata, else as a DataFrame.
+
+    Column projection and row filters are pushed down to pyarrow: only the requested columns are decoded,
+    and row groups whose statistics can't match the filters are skipped. With `limit`, the scan stops
+    as soon as enough rows are collected.
+    The primary geometry column is always read for spatial datasets, so they stay spatial.
+    """
+    dataset = ds.dataset(str(path), format="parquet")
+    geo = geo_metadata(dataset.schema)
+
+    if columns is not None:
+        columns = list(dict.fromkeys(columns))     # dedup, keep order
+        if geo and geo["primary_column"] not in columns:
+            columns.append(geo["primary_column"])
+        missing = [c for c in columns if c not in dataset.schema.names]
+        if missing:
+            raise KeyError(f"Columns not found: {missing}. Available columns: {dataset.schema.names}")
+
+    expression = to_expression(filters)
+    if limit is not None:
+        table = dataset.head(limit, columns=columns, filter=expression)
+    else:
+        table = dataset.to_table(columns=columns, filter=expression)
+
+    df = table.to_pandas()
+    if not geo:
+        return df
+
+    # decode the WKB geometry columns of the table we already have (no second read)
+    gdf = decode_geometries(df, geo)
+    if gdf is None:
+        # native GeoArrow encodings: let geopandas decode them
+        gdf = gpd.read_parquet(path, columns=columns, filters=expression)
+        return gdf if limit is None else gdf.head(limit)
+    return gdf
+
+
+def decode_geometries(df: pd.DataFrame, geo: dict) -> Optional[gpd.GeoDataFrame]:
+    """Turns the WKB columns listed in GeoParquet metadata into geometries. None if an encoding is not WKB."""
+    geometry_columns = {}
+    for column, meta in geo["columns"].items():
+        if column not in df.columns:
+            continue
+        if meta.get("encoding", "WKB").upper() != "WKB":
+            return None
+        geometry_columns[column] = gpd.GeoSeries.from_wkb(df[column], index=df.index, crs=meta.get("crs", "OGC:CRS84"))
+
+    for column, series in geometry_columns.items():
+        df[column] = series
+    return gpd.GeoDataFrame(df, geometry=geo["primary_column"])
+
+
+def frame_to_table(df: Union[pd.DataFrame, gpd.GeoDataFrame]) -> pa.Table:
+    """
+    Inverse of read_dataset's decoding: geometry columns become WKB, described by GeoParquet-style "geo" metadata,
+    so geo_metadata() and decode_geometries() work on the result.
+    """
+    if not isinstance(df, gpd.GeoDataFrame):
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+    geometry_names = [c for c in df.columns if isinstance(df[c].dtype, gpd.array.GeometryDtype)]
+    table = pa.Table.from_pandas(pd.DataFrame(df.drop(columns=geometry_names)), preserve_index=False)
+    columns = {}
+    for name in geometry_names:
+        series = df[name]
+        position = df.columns.get_loc(name)
+        table = table.add_column(position, name, pa.array(series.to_wkb(), type=pa.binary()))
+        columns[name] = {"encoding": "WKB", "geometry_types": [],
+                         "crs": series.crs.to_json_dict() if series.crs else None}
+
+    geo = {"version": "1.0.0", "primary_column": df.geometry.name, "columns": columns}
+    return table.replace_schema_metadata({**(table.schema.metadata or {}), b"geo": json.dumps(geo).encode()})
+
+
+def describe_read(columns: Optional[List[str]], filters: Optional[Sequence], limit: Optional[int]) -> str:
+    """Human readable summary of a partial read, for tool messages."""
+    parts = []
+    if columns:
+        parts.append(f"columns {columns}")
+    if filters:
+        parts.append(f"filtered by {filters}")
+    if limit is not None:
+        parts.append(f"first {limit} rows")
+    return f" ({', '.join(parts)})" if parts else ""
@@ -0,0 +1,94 @@
+"""
+Compact export of the folium maps made in the REPL. Before a map is rendered to HTML, the GeoJSON layers embedded
+in it are simplified for the zoom levels it will be viewed at, and their coordinates rounded to the same precision:
+full-resolution boundaries become a fraction of their size without any visible difference on screen.
+"""
+
+# Standard library
+import json
+import math
+import os
+from typing import Iterator, List
+# Third-party libraries
+import numpy as np
+import folium
+import shapely
+
+
+# zoom levels beyond the initial one that stay free of visible simplification
+DETAIL_ZOOMS = int(os.environ.get("MAP_DETAIL_ZOOMS", 3))
+DEFAULT_ZOOM = 10       # maps opened with fit_bounds only
+GEOMETRY_TYPES = frozenset({"Point", "MultiPoint", "LineString", "MultiLineString", "Polygon", "MultiPolygon",
+                            "GeometryCollection"})
+
+
+def pixel_degrees(zoom: float, latitude: float) -> float:
+    """Size of a screen pixel in degrees at a web mercator zoom level (on the latitude axis, the smaller one)."""
+    return 360 / (256 * 2 ** zoom) * max(math.cos(math.radians(latitude)), 0.01)
+
+
+def geojson_layers(element) -> Iterator[folium.GeoJson]:
+    """GeoJson layers with embedded data in an element tree (Choropleth and others nest them)."""
+    for child in element._children.values():
+        if isinstance(child, folium.GeoJson) and isinstance(child.data, dict) and child.embed:
+            yield child
+        yield from geojson_layers(child)
+
+
+def simplify(geoms: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Polygon coverages (administrative areas...) are simplified with shared edges simplified once, so neighbours
+    keep touching without gaps or overlaps. Anything else is simplified geometry by geometry, keeping it valid.
+    """
+    polygonal = shapely.get_type_id(geoms)
+    if len(geoms) > 1 and np.isin(polygonal, (3, 6)).all():
+        try:
+            if shapely.coverage_is_valid(geoms):
+                return shapely.coverage_simplify(geoms, tolerance)
+        except (AttributeError, shapely.errors.GEOSException):      # GEOS < 3.12
+            pass
+    simplified = shapely.simplify(geoms, tolerance, preserve_topology=True)
+    # tiny features would vanish: keep them as they are
+    return np.where(shapely.is_empty(simplified), geoms, simplified)
+
+
+def compact_features(features: List[dict], zoom: float):
+    """Simplifies and quantizes the geometries of GeoJSON features in place."""
+    present = [i for i, feature in enumerate(features) if feature.get("geometry")]
+    if not present:
+        return
+    geoms = shapely.from_geojson([json.dumps(features[i]["geometry"]) for i in present])
+    xmin, ymin, xmax, ymax = shapely.total_bounds(geoms)
+    if not np.isfinite([ymin, ymax]).all():
+        return
+
+    tolerance = pixel_degrees(zoom + DETAIL_ZOOMS, (ymin + ymax) / 2)
+    decimals = max(0, math.ceil(-math.log10(tolerance / 2)))    # rounding error under half a pixel
+    geoms = shapely.transform(simplify(geoms, tolerance), lambda coords: np.round(coords, decimals))
+    for i, geometry in zip(present, shapely.to_geojson(geoms)):
+        features[i]["geometry"] = json.loads(geometry)
+
+
+def compact_geojson(data: dict, zoom: float):
+    """
+    Compacts a GeoJson layer's data in place, whatever folium kept of what it was given: a FeatureCollection,
+    a single Feature, or a bare geometry (folium only wraps them in a FeatureCollection when the layer is styled).
+    """
+    kind = data.get("type")
+    if kind == "FeatureCollection":
+        compact_features(data.get("features", []), zoom)
+    elif kind == "Feature":
+        compact_features([data], zoom)
+    elif kind in GEOMETRY_TYPES:
+        feature = {"geometry": dict(data)}
+        compact_features([feature], zoom)
+        data.clear()
+        data.update(feature["geometry"])
+
+
+def export_map(m: folium.Map) -> str:
+    """Standalone HTML of a map, with its embedded layers compacted (the map object is modified)."""
+    zoom = m.options.get("zoom") or DEFAULT_ZOOM
+    for layer in geojson_layers(m):
+        compact_geojson(layer.data, zoom)
+    return m.get_root().render()
@@ -0,0 +1,162 @@
+"""
+Dataset profiles: per-column statistics computed once per dataset version (and read options) with Arrow compute,
+so describe_dataset answers what the model would otherwise ask the REPL (describe(), isnull().sum(), value_counts()...).
+"""
+
+# Standard library
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple, Union
+# Third-party libraries
+import pandas as pd
+import geopandas as gpd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from agent_ui.handles import DatasetHandle, DatasetStore, dataset_store
+from agent_ui.tool_cache import ToolCache
+
+
+TOP_VALUES = 3
+MAX_VALUE_LEN = 40      # longer values are cut in profiles and previews
+PREVIEW_ROWS = 3
+
+
+@dataclass
+class ColumnProfile:
+    name: str
+    dtype: str
+    nulls: int
+    distinct: Optional[int] = None
+    min: Any = None
+    max: Any = None
+    mean: Optional[float] = None
+    top: List[Tuple[Any, int]] = field(default_factory=list)    # most frequent values and their counts
+    # geometry columns only
+    geometry_types: List[Tuple[str, int]] = field(default_factory=list)
+    bounds: Optional[Tuple[float, float, float, float]] = None
+    crs: Optional[str] = None
+
+    def render(self, num_rows: int) -> str:
+        """One line for the model."""
+        parts = [f"nulls {self.nulls / num_rows:.1%}" if num_rows else "nulls 0"]
+        if self.geometry_types:
+            parts.append("types " + ", ".join(f"{t} {n}" for t, n in self.geometry_types))
+            if self.bounds is not None:
+                parts.append("bounds (" + ", ".join(f"{b:.5g}" for b in self.bounds) + ")")
+            parts.append(f"crs {self.crs}")
+        if self.distinct is not None:
+            parts.append(f"{self.distinct} distinct")
+        if self.min is not None:
+            parts.append(f"range {fmt(self.min)} .. {fmt(self.max)}")
+        if self.mean is not None:
+            parts.append(f"mean {self.mean:.5g}")
+        if self.top:
+            parts.append("top " + ", ".join(f"{fmt(value)} ({count})" for value, count in self.top))
+        return f"- {self.name} ({self.dtype}): " + "; ".join(parts)
+
+
+@dataclass
+class DatasetProfile:
+    kind: str
+    num_rows: int
+    columns: List[ColumnProfile]
+    preview: str
+    geometry: Optional[str] = None      # active geometry column
+
+    def render(self, max_columns: int = 50) -> str:
+        lines = [f"{self.kind} | {self.num_rows} rows x {len(self.columns)} columns"]
+        if self.kind == "GeoDataFrame":
+            lines.append(f"Active geometry column: '{self.geometry}'" if self.geometry else "No active geometry column set!")
+        lines += ["---", "Columns:"]
+        lines += [column.render(self.num_rows) for column in self.columns[:max_columns]]
+        if len(self.columns) > max_columns:
+            lines.append(f"...and {len(self.columns) - max_columns} more columns")
+        lines += ["", f"Preview (first {PREVIEW_ROWS} rows):", self.preview]
+        return "\n".join(lines)
+
+
+def fmt(value) -> str:
+    """Short display of a value: strings quoted and cut, floats with 6 significant digits."""
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    if isinstance(value, str):
+        return repr(value if len(value) <= MAX_VALUE_LEN else value[:MAX_VALUE_LEN - 3] + "...")
+    return str(value)
+
+
+def to_arrow(series: pd.Series) -> pa.ChunkedArray:
+    """Zero-copy for numeric and Arrow-backed columns; mixed object columns are profiled as strings."""
+    try:
+        return pa.chunked_array([pa.array(series, from_pandas=True)])
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return pa.chunked_array([pa.array(series.astype(str).where(series.notna()), from_pandas=True)])
+
+
+def profile_column(name: str, series: pd.Series) -> ColumnProfile:
+    array = to_arrow(series)
+    kind = array.type
+    profile = ColumnProfile(name=name, dtype=str(series.dtype), nulls=array.null_count)
+    valid = len(array) - array.null_count
+    if pa.types.is_dictionary(kind):
+        array = array.cast(kind.value_type)
+        kind = kind.value_type
+    if not valid or pa.types.is_nested(kind):
+        return profile
+
+    profile.distinct = pc.count_distinct(array, mode="only_valid").as_py()
+    if pa.types.is_integer(kind) or pa.types.is_floating(kind) or pa.types.is_decimal(kind) or pa.types.is_temporal(kind):
+        bounds = pc.min_max(array)
+        profile.min, profile.max = bounds["min"].as_py(), bounds["max"].as_py()
+        if not pa.types.is_temporal(kind):
+            profile.mean = pc.mean(array).as_py()
+
+    # most frequent values, unless every value is unique (ids, names) or the column is binary
+    if profile.distinct < valid and not pa.types.is_binary(kind) and not pa.types.is_large_binary(kind):
+        counts = pc.value_counts(array.drop_null() if array.null_count else array)
+        order = pc.select_k_unstable(counts.field("counts"), TOP_VALUES, sort_keys=[("dummy", "descending")])
+        profile.top = sorted(((counts.field("values")[i].as_py(), counts.field("counts")[i].as_py())
+                              for i in order.to_pylist()), key=lambda vc: -vc[1])
+    return profile
+
+
+def profile_geometry(name: str, geometry: gpd.GeoSeries) -> ColumnProfile:
+    missing = geometry.isna() | geometry.is_empty
+    types = geometry[~missing].geom_type.value_counts()
+    return ColumnProfile(
+        name=name, dtype="geometry", nulls=int(missing.sum()),
+        geometry_types=[(str(t), int(n)) for t, n in types.items()],
+        bounds=tuple(float(b) for b in geometry.total_bounds) if len(types) else None,
+        crs=geometry.crs.to_string() if geometry.crs is not None else None,
+    )
+
+
+def profile_frame(df: Union[pd.DataFrame, gpd.GeoDataFrame]) -> DatasetProfile:
+    geo_columns = [c for c in df.columns if df[c].dtype == "geometry"]
+    columns = [profile_geometry(c, df[c]) if c in geo_columns else profile_column(str(c), df[c]) for c in df.columns]
+
+    preview = df.head(PREVIEW_ROWS)
+    preview = pd.DataFrame({c: preview[c].to_wkt() if c in geo_columns else preview[c] for c in preview.columns})
+    geometry = None
+    if isinstance(df, gpd.GeoDataFrame):
+        try:
+            geometry = df.geometry.name
+        except AttributeError:     # the active geometry column was dropped
+            geometry = None
+    return DatasetProfile(
+        kind=type(df).__name__, num_rows=len(df), columns=columns, geometry=geometry,
+        preview=preview.to_string(index=False, max_colwidth=MAX_VALUE_LEN),
+    )
+
+
+# (dataset version and read options) -> DatasetProfile: a few KB each
+profiles = ToolCache(maxsize=256)
+
+
+def get_profile(handle: DatasetHandle, store: DatasetStore = dataset_store) -> DatasetProfile:
+    """The profile of a loaded dataset, computed on first use."""
+    key = store.key(handle)
+    found, profile = profiles.get(key)
+    if not found:
+        profile = profile_frame(store.resolve(handle))
+        profiles.put(key, profile)
+    return profile
@@ -0,0 +1,353 @@
+"""
+Pool of pre-warmed REPL worker processes for the python_repl_tool, one per chat session.
+
+- sessions don't share variables, and a CPU-heavy cell only blocks its own session: cells run in parallel on all cores;
+- loaded datasets are written once as Arrow IPC files in shared memory (/dev/shm), and memory-mapped by the workers;
+  the files count against the DatasetCache budget, and those no session uses are removed first when over it;
+- every cell runs under a CPU-time limit, every worker under a memory limit, and a stuck worker is killed and replaced.
+
+Limits are read from REPL_CPU_SECONDS, REPL_MEMORY_BYTES, REPL_WARM_WORKERS and REPL_MAX_WORKERS.
+"""
+
+# Standard library
+import atexit
+import hashlib
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+# Third-party libraries
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from agent_ui.cell_cache import CellCache, SessionCells, analyze, cell_cache
+from agent_ui.dataset_cache import DatasetCache
+from agent_ui.handles import DatasetHandle, DatasetStore, StaleHandleError, dataset_store
+from agent_ui.loader import frame_to_table
+from agent_ui.repl_worker import serve, spill_dir
+
+
+SHARED_DIR = Path("/dev/shm") if os.path.isdir("/dev/shm") else Path(tempfile.gettempdir())
+
+CPU_LIMIT = float(os.environ.get("REPL_CPU_SECONDS", 60))
+MEMORY_LIMIT = int(os.environ.get("REPL_MEMORY_BYTES", 4 * 1024 ** 3))
+WARM_WORKERS = int(os.environ.get("REPL_WARM_WORKERS", 2))
+MAX_WORKERS = int(os.environ.get("REPL_MAX_WORKERS", max(4, 2 * (os.cpu_count() or 1))))
+
+
+class WorkerLost(Exception):
+    """The worker died or was killed (timeout, hard limit): its session variables are gone."""
+
+
+def get_context():
+    """
+    forkserver where available: workers are forked from a server that already imported repl_worker
+    (pandas, geopandas, matplotlib, folium), so they start warm in milliseconds. Elsewhere, spawn.
+    """
+    if "forkserver" in mp.get_all_start_methods():
+        ctx = mp.get_context("forkserver")
+        ctx.set_forkserver_preload(["agent_ui.repl_worker"])
+        return ctx
+    return mp.get_context("spawn")
+
+
+class REPLWorker:
+    """Parent-side handle of a worker process."""
+
+    def __init__(self, ctx, memory_limit: Optional[int]):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=serve, args=(child, memory_limit), daemon=True)
+        self.process.start()
+        child.close()
+        self.lock = threading.Lock()    # one cell at a time (parallel tool calls of the same session queue here)
+        self.last_used = time.monotonic()
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def run(self, code: str, datasets: Dict[str, str], cpu_limit: Optional[float], timeout: float) -> dict:
+        with self.lock:
+            self.last_used = time.monotonic()
+            try:
+                self.conn.send(("run", code, datasets, cpu_limit))
+                if not self.conn.poll(timeout):
+                    self.kill()
+                    raise WorkerLost(f"the cell did not finish within {timeout:.0f}s")
+                return self.conn.recv()
+            except (EOFError, OSError) as e:
+                self.kill()
+                raise WorkerLost(f"the worker process died ({e!r})") from e
+
+    def stop(self):
+        try:
+            self.conn.send(("stop",))
+            self.process.join(timeout=1)
+        except (OSError, ValueError):
+            pass
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=1)
+        self.conn.close()
+        shutil.rmtree(spill_dir(self.process.pid), ignore_errors=True)     # left behind by a killed worker
+
+
+class REPLPool:
+    """
+    Assigns a worker to each session id (the graph's thread_id), keeping `warm` started workers ready.
+    At `max_workers`, the least recently used session loses its worker (its variables; datasets are re-mapped
+    on its next cell). Sessions idle for more than `idle_ttl` seconds are released too.
+    """
+
+    def __init__(self,
+                 warm: int = WARM_WORKERS,
+                 max_workers: int = MAX_WORKERS,
+                 cpu_limit: Optional[float] = CPU_LIMIT,
+                 memory_limit: Optional[int] = MEMORY_LIMIT,
+                 idle_ttl: float = 1800,
+                 store: DatasetStore = dataset_store,
+                 cache: Optional[CellCache] = cell_cache):
+        self.warm = warm
+        self.max_workers = max_workers
+        self.cpu_limit = cpu_limit
+        self.memory_limit = memory_limit
+        self.idle_ttl = idle_ttl
+        self.store = store
+        self.cache = cache              # None disables cell memoization
+        self.cells: Dict[str, SessionCells] = {}
+        self.ctx = None                 # created on first use: importing the module starts nothing
+        self.idle: List[REPLWorker] = []
+        self.sessions = OrderedDict()   # session id -> worker, least recently used first
+        self.exported = OrderedDict()   # export file -> (dataset cache key, bytes), least recently used first
+        self.held: Dict[str, Set[str]] = {}      # session id -> export files its worker has mapped
+        self.lock = threading.Lock()
+        self.replenishing = False
+        atexit.register(self.shutdown)
+
+    @property
+    def timeout(self) -> float:
+        """Wall-clock limit of a cell: catches cells blocked outside the interpreter, where SIGXCPU can't reach."""
+        return 2 * self.cpu_limit + 10 if self.cpu_limit else 600
+
+    def start(self):
+        """Starts the warm workers in the background (the first forkserver start imports the heavy libraries)."""
+        with self.lock:
+            if self.replenishing:
+                return
+            self.replenishing = True
+        threading.Thread(target=self._replenish, daemon=True).start()
+
+    def _replenish(self):
+        try:
+            with self.lock:
+                if self.ctx is None:
+                    self.ctx = get_context()
+                missing = min(self.warm - len(self.idle), self.max_workers - len(self.sessions) - len(self.idle))
+            for _ in range(max(missing, 0)):
+                worker = REPLWorker(self.ctx, self.memory_limit)
+                with self.lock:
+                    self.idle.append(worker)
+        finally:
+            self.replenishing = False
+
+    def worker(self, session_id: str) -> REPLWorker:
+        """The session's worker, assigning a warm one on its first cell."""
+        stale = []
+        with self.lock:
+            if self.ctx is None:
+                self.ctx = get_context()
+            now = time.monotonic()
+            for sid, worker in list(self.sessions.items()):
+                if sid != session_id and now - worker.last_used > self.idle_ttl:
+                    stale.append(self.sessions.pop(sid))
+                    self.cells.pop(sid, None)
+                    self.held.pop(sid, None)
+
+            worker = self.sessions.get(session_id)
+            if worker is not None and worker.alive:
+                self.sessions.move_to_end(session_id)
+            else:
+                lost = self.sessions.pop(session_id, None) is not None
+                while self.sessions and len(self.sessions) >= self.max_workers:
+                    sid, old = self.sessions.popitem(last=False)
+                    stale.append(old)
+                    self.cells.pop(sid, None)
+                    self.held.pop(sid, None)
+                if lost and session_id in self.cells:
+                    self.cells[session_id].reset()
+                while self.idle and not self.idle[-1].alive:
+                    self.idle.pop()
+                worker = self.idle.pop() if self.idle else None
+                if worker is not None:
+                    self.sessions[session_id] = worker
+
+        for old in stale:
+            old.stop()
+
+        if worker is None:
+            # no warm worker left: start one outside the lock, the other sessions keep running
+            worker = REPLWorker(self.ctx, self.memory_limit)
+            with self.lock:
+                current = self.sessions.get(session_id)
+                if current is not None and current.alive:     # assigned concurrently by a parallel tool call
+                    worker, extra = current, worker
+                else:
+                    self.sessions[session_id] = worker
+                    extra = None
+            if extra is not None:
+                extra.stop()
+
+        if len(self.idle) < self.warm:
+            self.start()
+        return worker
+
+    def export(self, handle: DatasetHandle, session_id: Optional[str] = None) -> str:
+        """
+        Writes the dataset behind a handle as an Arrow IPC file in shared memory, once per file version and read.
+        The file is held for `session_id` until its next cell or its release.
+        """
+        self.store.check(handle)
+        path = Path(handle["source"])
+        key = DatasetCache.make_key(path, handle["columns"], handle["filters"], handle["limit"])
+        target = str(SHARED_DIR / f"agent_ui-{hashlib.sha1(repr(key).encode()).hexdigest()}.arrow")
+        with self.lock:
+            if session_id is not None:
+                self.held.setdefault(session_id, set()).add(target)
+            if target in self.exported and os.path.exists(target):
+                self.exported.move_to_end(target)
+                return target
+
+        if not os.path.exists(target):
+            table = frame_to_table(self.store.resolve(handle))
+            tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with pa.OSFile(tmp, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp, target)    # atomic: workers never map a partial file
+        size = os.path.getsize(target)
+
+        with self.lock:
+            if target in self.exported:     # written concurrently for another session
+                self.exported.move_to_end(target)
+                return target
+            # older versions of the same file: workers that mapped them keep their pages until they unmap
+            for old, (old_key, _) in list(self.exported.items()):
+                if old_key[0] == key[0] and old_key[1:3] != key[1:3]:
+                    self._remove(old)
+            self._make_room(size)
+            self.exported[target] = (key, size)
+            self.store.cache.charge(size)   # evicts cached frames if the unused exports were not enough
+        return target
+
+    def _remove(self, path: str):
+        _, size = self.exported.pop(path)
+        _unlink(path)
+        self.store.cache.refund(size)
+
+    def _make_room(self, size: int = 0):
+        """Removes the exports no session holds, least recently used first, until `size` more bytes fit the budget."""
+        held = set().union(*self.held.values())
+        for path in [p for p in self.exported if p not in held]:
+            if self.store.cache.bytes_free >= size:
+                break
+            self._remove(path)
+
+    def run(self, session_id: str, code: str, loaded: Optional[Dict[str, DatasetHandle]] = None) -> dict:
+        """
+        Runs a cell in the session's worker: {"stdout", "error", "image" (PNG/SVG bytes), "image_format",
+        "html" (folium map)},
+        plus the session variables the worker "spilled" to disk after the cell or "restored" before it.
+        A cell reading only datasets is replayed from the cell cache when it already ran on the same dataset versions.
+        """
+        loaded = loaded or {}
+        versions = {name: DatasetCache.make_key(Path(h["source"]), h["columns"], h["filters"], h["limit"])
+                    for name, h in loaded.items()}
+        cell = analyze(code)
+        with self.lock:
+            history = self.cells.setdefault(session_id, SessionCells())
+            history.sync(versions)
+            cacheable = self.cache is not None and cell.cacheable(set(versions), history.dirty)
+
+        key = self.cache.make_key(cell, versions) if cacheable else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                with self.lock:
+                    history.replayed(cell)
+                return {**cached, "cached": True}
+
+        try:
+            datasets = {name: self.export(handle, session_id) for name, handle in loaded.items()}
+        except StaleHandleError as e:
+            return {"stdout": "", "error": str(e), "image": None, "html": None}
+        with self.lock:
+            # the worker unmaps the datasets that are not loaded anymore on this cell
+            self.held[session_id] = set(datasets.values())
+            self._make_room()
+        worker = self.worker(session_id)
+        with self.lock:
+            replay = history.take(cell)
+        try:
+            for i, pending in enumerate(replay):    # variables the cell needs from previously replayed cells
+                replayed = worker.run(pending.code, datasets, self.cpu_limit, self.timeout)
+                if replayed["error"] is not None:
+                    # what the failed cell should have defined is missing: running this cell would only fail further
+                    with self.lock:
+                        history.pending[:0] = replay[i + 1:]
+                    return {"stdout": replayed["stdout"], "image": None, "html": None,
+                            "error": f"An earlier cell, answered from the cache, failed when it was run again to "
+                                     f"define the variables this cell reads. Earlier cell:\n{pending.code}\n"
+                                     f"Error:\n{replayed['error']}"}
+            result = worker.run(code, datasets, self.cpu_limit, self.timeout)
+        except WorkerLost as e:
+            self.release(session_id)
+            return {"stdout": "", "error": f"{e}. The Python session was restarted: variables from previous "
+                                           f"cells are lost, loaded datasets are still available.",
+                    "image": None, "html": None}
+
+        with self.lock:
+            history.executed(cell)
+        if key is not None and result["error"] is None:
+            # what the worker spilled or restored is about this session's memory, not the cell's result
+            self.cache.put(key, {k: v for k, v in result.items() if k not in ("spilled", "restored")})
+        return result
+
+    def release(self, session_id: str):
+        """Stops the session's worker (chat ended)."""
+        with self.lock:
+            worker = self.sessions.pop(session_id, None)
+            self.cells.pop(session_id, None)
+            self.held.pop(session_id, None)
+            self._make_room()
+        if worker is not None:
+            worker.stop()
+
+    def shutdown(self):
+        with self.lock:
+            workers = self.idle + list(self.sessions.values())
+            self.idle, self.sessions = [], OrderedDict()
+            exported, self.exported = self.exported, OrderedDict()
+            self.held.clear()
+        for worker in workers:
+            worker.stop()
+        for path, (_, size) in exported.items():
+            _unlink(path)
+            self.store.cache.refund(size)
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+# shared by every session of the process
+repl_pool = REPLPool()
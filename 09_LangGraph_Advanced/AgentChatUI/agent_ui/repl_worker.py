@@ -0,0 +1,318 @@
+"""
+Worker side of the REPL pool (see repl_pool.py): one process per session, running the python_repl_tool cells.
+The heavy libraries are imported at module level, and this module is preloaded by the forkserver,
+so a new worker is forked with everything already imported.
+
+The frames a session creates are accounted for: above REPL_SESSION_BYTES, the least recently used ones are spilled
+to parquet files (in REPL_SPILL_DIR, default the temp folder) and read back by the next cell that uses them.
+"""
+
+# Standard library
+import io
+import os
+import shutil
+import signal
+import tempfile
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+# Third-party libraries
+import matplotlib
+matplotlib.use("Agg")   # no display in workers
+import matplotlib.pyplot as plt
+import pandas as pd
+import geopandas as gpd
+import folium
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from agent_ui.cell_cache import Cell, analyze
+from agent_ui.dataset_cache import frame_bytes, shared_copy
+from agent_ui.loader import decode_geometries, geo_metadata
+from agent_ui.maps import export_map
+
+try:
+    import resource
+except ImportError:     # no rlimits on Windows: only the pool's wall-clock timeout applies
+    resource = None
+
+
+SESSION_BUDGET = int(os.environ.get("REPL_SESSION_BYTES", 1024 ** 3))
+SPILL_DIR = Path(os.environ.get("REPL_SPILL_DIR", tempfile.gettempdir()))
+
+
+FIGURE_FORMAT = os.environ.get("REPL_FIGURE_FORMAT", "png")     # png or svg
+FIGURE_DPI = float(os.environ.get("REPL_FIGURE_DPI", 100))
+FIGURE_MAX_PIXELS = int(os.environ.get("REPL_FIGURE_MAX_PIXELS", 2000))   # longest side of a rendered figure
+
+
+def spill_dir(pid: int) -> Path:
+    """Spill folder of a worker: the pool removes it when the worker is stopped or killed."""
+    return SPILL_DIR / f"agent_ui-spill-{pid}"
+
+
+class CellTimeout(Exception):
+    pass
+
+
+def _on_cpu_limit(signum, frame):
+    raise CellTimeout("CPU time limit exceeded")
+
+
+def limit_cpu(seconds: Optional[float]):
+    """RLIMIT_CPU is cumulative for the process: the soft limit is set to what was used so far plus `seconds`."""
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if seconds is None:
+        soft = hard
+    else:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime + seconds) + 1
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def limit_memory(nbytes: Optional[int]):
+    """RLIMIT_DATA counts private memory only, so the memory-mapped datasets don't count against it."""
+    if resource is None or not nbytes:
+        return
+    limit = getattr(resource, "RLIMIT_DATA", resource.RLIMIT_AS)
+    _, hard = resource.getrlimit(limit)
+    if hard != resource.RLIM_INFINITY:
+        nbytes = min(nbytes, hard)
+    resource.setrlimit(limit, (nbytes, hard))
+
+
+def map_dataset(path: str):
+    """Maps an Arrow IPC file written by the pool: column buffers are shared pages, not copies."""
+    table = ipc.open_file(pa.memory_map(path)).read_all()
+    df = table.to_pandas(split_blocks=True)     # one block per column, so numeric columns can stay zero-copy
+    geo = geo_metadata(table.schema)
+    return decode_geometries(df, geo) if geo else df
+
+
+def render_figure(fmt: str = FIGURE_FORMAT, dpi: float = FIGURE_DPI,
+                  max_pixels: int = FIGURE_MAX_PIXELS) -> Optional[bytes]:
+    """
+    Encoded bytes of the current figure, if the cell drew one. The resolution is capped so that the longest side
+    stays under `max_pixels`, whatever figsize or dpi the cell asked for. All figures are closed, even when
+    rendering fails, so nothing survives the cell in pyplot's registry and the next cell starts clean.
+    """
+    if not plt.get_fignums():
+        return None
+    try:
+        figure = plt.gcf()
+        longest = max(figure.get_size_inches().max(), 1e-3)
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format=fmt, dpi=min(dpi, max_pixels / longest), bbox_inches="tight")
+        return buffer.getvalue()
+    finally:
+        plt.close("all")
+
+
+class FrameRegistry:
+    """
+    Memory accounting of the frames bound in a session namespace, with least-recently-used spilling to parquet.
+    A spilled variable is removed from the namespace and read back before a cell referencing it runs
+    (names are found in the cell's code, so a frame reached only through globals() or a container stays spilled).
+    Frames bound to several names are accounted and spilled once.
+    """
+
+    def __init__(self, namespace: dict, budget: int = SESSION_BUDGET, folder: Optional[Path] = None):
+        self.namespace = namespace
+        self.budget = budget
+        self.folder = folder or spill_dir(os.getpid())
+        self.sizes = {}         # id(frame) -> bytes, recomputed when a cell writes one of its names
+        self.last_used = {}     # variable name -> clock of the last cell referencing it
+        self.spilled = {}       # variable name -> parquet file (shared by aliases)
+        self.shared: Set[str] = set()   # datasets still as mapped: their pages are shared, not the session's
+        self.clock = 0
+
+    def frames(self) -> Dict[str, pd.DataFrame]:
+        return {name: value for name, value in self.namespace.items()
+                if isinstance(value, pd.DataFrame) and not name.startswith("_")}
+
+    def forget(self, name: str):
+        """The variable is re-bound from outside (dataset loaded again or unloaded)."""
+        path = self.spilled.pop(name, None)
+        if path is not None and path not in self.spilled.values():
+            _unlink(path)
+
+    def restore(self, cell: Cell) -> List[str]:
+        """Reads back the spilled frames the cell references, before it runs."""
+        paths = {self.spilled[name] for name in (cell.reads | cell.writes) if name in self.spilled}
+        restored = []
+        for path in paths:
+            frame = gpd.read_parquet(path) if geo_metadata(pq.read_schema(path)) else pd.read_parquet(path)
+            names = [name for name, p in self.spilled.items() if p == path]
+            for name in names:
+                self.namespace[name] = frame
+                del self.spilled[name]
+            restored += names
+            _unlink(path)
+        return sorted(restored)
+
+    def account(self, cell: Cell) -> List[str]:
+        """After a cell: updates sizes and recency, and spills frames until the session fits its budget."""
+        self.clock += 1
+        for name in cell.reads | cell.writes:
+            self.last_used[name] = self.clock
+        for name in [n for n in self.spilled if n in self.namespace]:     # re-bound by the cell
+            self.forget(name)
+        self.shared -= cell.writes
+
+        frames = self.frames()
+        by_id = {}
+        for name, frame in frames.items():
+            by_id.setdefault(id(frame), []).append(name)
+        for frame_id in set(self.sizes) - set(by_id):
+            del self.sizes[frame_id]
+        for frame_id, names in by_id.items():
+            if frame_id not in self.sizes or set(names) & cell.writes:
+                self.sizes[frame_id] = 0 if set(names) <= self.shared else frame_bytes(frames[names[0]])
+
+        total = sum(self.sizes.values())
+        # least recently used first; the frames of the cell that just ran are kept
+        candidates = sorted((max(self.last_used.get(n, 0) for n in names), frame_id)
+                            for frame_id, names in by_id.items()
+                            if self.sizes[frame_id] and not set(names) & (cell.reads | cell.writes))
+        spilled = []
+        for _, frame_id in candidates:
+            if total <= self.budget:
+                break
+            names = by_id[frame_id]
+            if self._spill(names, frames[names[0]]):
+                total -= self.sizes.pop(frame_id)
+                spilled += names
+        return sorted(spilled)
+
+    def _spill(self, names: List[str], frame: pd.DataFrame) -> bool:
+        self.folder.mkdir(parents=True, exist_ok=True)
+        path = str(self.folder / f"{names[0]}-{self.clock}.parquet")
+        try:
+            frame.to_parquet(path)
+        except Exception:       # e.g. object columns mixing types: the frame stays in memory
+            _unlink(path)
+            return False
+        for name in names:
+            del self.namespace[name]
+            self.spilled[name] = path
+        return True
+
+    def cleanup(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class Session:
+    """Namespace of one chat session, living across cells like the old PythonREPL globals."""
+
+    def __init__(self, budget: int = SESSION_BUDGET):
+        self.namespace = {"__name__": "__main__"}
+        self.mapped = {}        # arrow file -> read-only frame
+        self.injected = {}      # variable name -> arrow file
+        self.frames = FrameRegistry(self.namespace, budget)
+
+    def inject(self, datasets: Dict[str, str]):
+        """Binds the loaded datasets as variables. Only new or changed datasets are (re)bound, unloaded ones removed."""
+        for name, path in datasets.items():
+            if self.injected.get(name) == path:
+                continue
+            if path not in self.mapped:
+                self.mapped[path] = map_dataset(path)
+            # with copy-on-write, a shallow copy: the cell's writes copy the touched columns, never the mapping
+            self.namespace[name] = shared_copy(self.mapped[path])
+            self.injected[name] = path
+            self.frames.forget(name)
+            self.frames.shared.add(name)
+
+        for name in set(self.injected) - set(datasets):
+            del self.injected[name]
+            self.namespace.pop(name, None)
+            self.frames.forget(name)
+            self.frames.shared.discard(name)
+
+        for path in set(self.mapped) - set(self.injected.values()):
+            del self.mapped[path]
+
+    def run(self, code: str, cpu_limit: Optional[float]) -> dict:
+        cell = analyze(code)
+        restored = self.frames.restore(cell)
+        before = {name: id(value) for name, value in self.namespace.items()}
+        stdout = io.StringIO()
+        error = None
+
+        image = None
+        html = None
+
+        limit_cpu(cpu_limit)
+        try:
+            with redirect_stdout(stdout), redirect_stderr(stdout):
+                exec(compile(code, "<cell>", "exec"), self.namespace)
+        except MemoryError:
+            error = "MemoryError: the cell exceeded the worker memory limit"
+        except BaseException as e:
+            error = repr(e)
+        # rendering the figure and exporting the map count against the cell's CPU limit too
+        try:
+            try:
+                image = render_figure()
+            except BaseException as e:
+                error = error or f"Could not render the figure: {e!r}"
+
+            # maps created or re-bound by this cell, exported with simplified and quantized layers
+            maps = [value for name, value in self.namespace.items()
+                    if isinstance(value, folium.Map) and before.get(name) != id(value)]
+            if maps:
+                try:
+                    html = export_map(maps[-1])
+                except BaseException as e:
+                    error = error or f"Could not export the map: {e!r}"
+        finally:
+            limit_cpu(None)
+
+        return {
+            "stdout": stdout.getvalue(),
+            "error": error,
+            "image": image,
+            "image_format": FIGURE_FORMAT if image is not None else None,
+            "html": html,
+            "restored": restored,
+            "spilled": self.frames.account(cell),
+        }
+
+
+def serve(conn, memory_limit: Optional[int] = None):
+    """Worker main loop: ("run", code, datasets, cpu_limit) -> result dict, until ("stop",) or the pipe closes."""
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    limit_memory(memory_limit)
+    session = Session()
+
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, KeyboardInterrupt):
+                break
+            if message[0] == "stop":
+                break
+
+            _, code, datasets, cpu_limit = message
+            try:
+                session.inject(datasets)
+            except Exception as e:
+                conn.send({"stdout": "", "error": f"Could not map the loaded datasets: {e!r}", "image": None, "html": None})
+                continue
+            conn.send(session.run(code, cpu_limit))
+    finally:
+        session.frames.cleanup()
@@ -0,0 +1,255 @@
+"""
+Fast path in front of the supervisor. A full turn goes supervisor LLM -> handoff -> analyst -> handoff back ->
+supervisor LLM, so even "list the datasets" pays for two supervisor calls on top of the analyst's work. The
+pre-router classifies the user message locally, with rules first and then a nearest-example classifier on hashed
+character n-grams:
+    - catalog listings (available / loaded datasets) are answered directly, without any LLM call;
+    - unambiguous analysis requests go straight to the analyst, skipping both supervisor calls;
+    - anything else (greetings, questions about the assistant, unclear requests) goes to the supervisor as before.
+"""
+
+# Standard library
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+# LangChain and LangGraph
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.config import get_stream_writer
+from langgraph.graph import END, START, StateGraph
+from agent_ui.catalog import DatasetCatalog
+from agent_ui.handles import describe_handle
+
+
+# the classifier routes away from the supervisor only above this similarity, and this far ahead of the runner-up
+ROUTER_THRESHOLD = float(os.environ.get("ROUTER_THRESHOLD", 0.5))
+ROUTER_MARGIN = float(os.environ.get("ROUTER_MARGIN", 0.1))
+ROUTER_ENABLED = os.environ.get("ROUTER_ENABLED", "1") != "0"
+
+LIST_LOADABLE, LIST_LOADED, ANALYST, SUPERVISOR = "list_loadable", "list_loaded", "analyst", "supervisor"
+
+# LLM calls a route skips, compared with the supervisor path: two supervisor calls, and for a catalog answer
+# the analyst's tool call and answer too
+HOPS_SAVED = {LIST_LOADABLE: 4, LIST_LOADED: 4, ANALYST: 2, SUPERVISOR: 0}
+
+DIMENSIONS = 2 ** 18
+
+EXAMPLES = {
+    LIST_LOADABLE: [
+        "list the datasets",
+        "which datasets are available",
+        "what data do you have",
+        "show me the available files",
+        "what datasets can I load",
+        "list all parquet files",
+        "what data is there",
+    ],
+    LIST_LOADED: [
+        "which datasets are loaded",
+        "what is in memory",
+        "list the loaded datasets",
+        "show the datasets in memory",
+        "what have you loaded so far",
+    ],
+    ANALYST: [
+        "load the dataset",
+        "plot the number of points per district",
+        "count the rows of the dataset",
+        "make a map of the neighbourhoods",
+        "how many trees are there in each quarter",
+        "describe the columns of the dataset",
+        "compute the average value by category",
+        "find the nearest bus stops to the station",
+        "which points fall within 500 meters",
+        "run a sql query on the file",
+        "filter the rows where the value is above 10",
+        "show the top 10 rows by population",
+        "create a bar chart of the totals",
+        "join the two datasets on the district",
+    ],
+    SUPERVISOR: [
+        "hi",
+        "hello there",
+        "thanks",
+        "thank you, that is all",
+        "what can you do",
+        "who are you",
+        "how does this work",
+        "help",
+        "why",
+        "can you explain that",
+        "what do you think",
+        "good morning",
+    ],
+}
+
+# unambiguous phrasings, matched before the classifier: a few words at most between the key words
+FEW_WORDS = r"(?:\s+[\w']+){0,3}\s+"
+CATALOG_RULES = [
+    (LIST_LOADED, re.compile(rf"^(please\s+)?(list|show|which|what){FEW_WORDS}(datasets?|files?|data){FEW_WORDS}"
+                             rf"(loaded|in\s+memory)$")),
+    (LIST_LOADED, re.compile(rf"^(what|which){FEW_WORDS}(loaded|in\s+memory)$")),
+    (LIST_LOADABLE, re.compile(rf"^(please\s+)?(list|show){FEW_WORDS}(datasets?|files?)$")),
+    (LIST_LOADABLE, re.compile(rf"^(what|which){FEW_WORDS}(datasets?|files?|data){FEW_WORDS}"
+                               rf"(available|loadable|there|have|load)$")),
+]
+ANALYSIS_VERBS = re.compile(r"\b(load|plot|map|chart|count|average|mean|sum|describe|query|sql|filter|join|nearest|"
+                            r"within|compute|aggregate|group|top|histogram)\b")
+# what an analysis verb must apply to for the request to be unambiguous ("describe yourself", "count me in" are not)
+DATA_OBJECTS = re.compile(r"\b(datasets?|data|columns?|rows?|files?|tables?|parquet|records|features)\b")
+# a listing names datasets or files only: asking about their contents is a question for an agent
+CONTENT_WORDS = re.compile(r"\b(columns?|rows?|records|features|values?|fields?)\b")
+# "what datasets can I load" asks for the listing, it does not load anything
+LISTING_LOAD = re.compile(r"\b(can|could|may|to)(\s+(i|we|you))?\s+load$")
+CATALOG_WORDS = 6       # longer messages ask for more than a listing
+
+
+def normalize(text: str) -> str:
+    return " ".join(re.findall(r"[\w']+", text.lower()))
+
+
+def may_be_listing(normalized: str) -> bool:
+    """Short, and without analysis verbs or words about the data's contents: the message can be a catalog listing."""
+    return (len(normalized.split()) <= CATALOG_WORDS and not CONTENT_WORDS.search(normalized)
+            and not ANALYSIS_VERBS.search(LISTING_LOAD.sub("", normalized)))
+
+
+def embed(text: str) -> Dict[int, float]:
+    """Unit-norm sparse vector of hashed words and character trigrams: cheap, deterministic, typo tolerant."""
+    text = normalize(text)
+    words = text.split()
+    padded = f" {text} "
+    features = Counter(f"w:{word}" for word in words)
+    features.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    vector = Counter()
+    for feature, count in features.items():
+        vector[zlib.crc32(feature.encode()) % DIMENSIONS] += count
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {k: v / norm for k, v in vector.items()}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+@dataclass
+class Route:
+    target: str         # list_loadable, list_loaded, analyst or supervisor
+    reason: str         # rule, dataset, classifier or fallback
+    score: float = 1.0
+
+    @property
+    def hops_saved(self) -> int:
+        return HOPS_SAVED[self.target]
+
+
+class PreRouter:
+    """
+    Rules, then the nearest labelled example: a route away from the supervisor is taken only when the best label
+    beats `threshold` and the runner-up by `margin`. Keeps counts of the routes taken and of the LLM calls saved.
+    """
+
+    def __init__(self, examples: Dict[str, List[str]] = EXAMPLES, threshold: float = ROUTER_THRESHOLD,
+                 margin: float = ROUTER_MARGIN, dataset_names: Optional[Callable[[], Iterable[str]]] = None):
+        self.examples = [(label, embed(text)) for label, texts in examples.items() for text in texts]
+        self.threshold = threshold
+        self.margin = margin
+        self.dataset_names = dataset_names
+        self.routes = Counter()
+        self.hops_saved = 0
+        self.lock = threading.Lock()
+
+    def classify(self, text: str) -> Route:
+        normalized = normalize(text)
+        if not normalized:
+            return Route(SUPERVISOR, "fallback", 0.0)
+        if may_be_listing(normalized):
+            for target, pattern in CATALOG_RULES:
+                if pattern.match(normalized):
+                    return Route(target, "rule")
+        # an analysis verb applied to data, or to a dataset of the catalog: a request for the analyst
+        if ANALYSIS_VERBS.search(normalized):
+            if DATA_OBJECTS.search(normalized):
+                return Route(ANALYST, "rule")
+            words = set(normalized.split())
+            if self.dataset_names is not None and any(name.lower() in words for name in self.dataset_names()):
+                return Route(ANALYST, "dataset")
+
+        vector = embed(text)
+        best: Dict[str, float] = {}
+        for label, example in self.examples:
+            best[label] = max(best.get(label, 0.0), cosine(vector, example))
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+        (label, score), runner_up = ranked[0], ranked[1][1] if len(ranked) > 1 else 0.0
+        if label == SUPERVISOR or score < self.threshold or score - runner_up < self.margin:
+            return Route(SUPERVISOR, "fallback", score)
+        if label in (LIST_LOADABLE, LIST_LOADED) and not may_be_listing(normalized):
+            # "list the datasets and plot the biggest one": the analyst has the listing tools too
+            if ANALYSIS_VERBS.search(LISTING_LOAD.sub("", normalized)):
+                return Route(ANALYST, "classifier", score)
+            return Route(SUPERVISOR, "fallback", score)
+        return Route(label, "classifier", score)
+
+    def route(self, text: str) -> Route:
+        route = self.classify(text)
+        with self.lock:
+            self.routes[route.target] += 1
+            self.hops_saved += route.hops_saved
+        return route
+
+    def stats(self) -> str:
+        with self.lock:
+            routes = ", ".join(f"{target}={count}" for target, count in sorted(self.routes.items()))
+            return f"{sum(self.routes.values())} messages routed ({routes}), {self.hops_saved} LLM calls saved"
+
+
+def last_human_text(state) -> str:
+    for message in reversed(state["messages"]):
+        if isinstance(message, HumanMessage):
+            return message.content if isinstance(message.content, str) else ""
+    return ""
+
+
+def with_fast_path(supervisor, analyst, state_schema, catalog: DatasetCatalog,
+                   router: Optional[PreRouter] = None) -> StateGraph:
+    """
+    Graph builder with the pre-router in front of the compiled supervisor: START routes to `catalog` (direct answer),
+    to the analyst agent (a node named like the agent, so the frontends see its tool messages as before), or to
+    `supervisor`. The route is also sent on the custom stream as {"route": ..., "hops_saved": ...}.
+    Returned uncompiled, so the caller compiles it with its checkpointer.
+    """
+    router = router or PreRouter(dataset_names=lambda: [info.name for info in catalog.list()])
+
+    def route(state) -> str:
+        decision = router.route(last_human_text(state)) if ROUTER_ENABLED else Route(SUPERVISOR, "disabled", 0.0)
+        get_stream_writer()({"route": decision.target, "reason": decision.reason, "hops_saved": decision.hops_saved})
+        if decision.target in (LIST_LOADABLE, LIST_LOADED):
+            return "catalog"
+        return analyst.name if decision.target == ANALYST else "supervisor"
+
+    def answer_catalog(state):
+        # the rules are cheap: deciding again here avoids storing the route in the state
+        if router.classify(last_human_text(state)).target == LIST_LOADED:
+            loaded = state.get("loaded") or {}
+            content = ("Datasets in memory:\n" + "\n".join(describe_handle(handle) for handle in loaded.values())
+                       if loaded else "No datasets are loaded yet.")
+        else:
+            datasets = catalog.list()
+            content = ("Datasets available to load:\n" + "\n".join(f"- {info.summary()}" for info in datasets)
+                       if datasets else "No parquet datasets found.")
+        return {"messages": [AIMessage(content=content, name="supervisor")]}
+
+    builder = StateGraph(state_schema)
+    builder.add_node("catalog", answer_catalog)
+    builder.add_node(analyst.name, analyst)
+    builder.add_node("supervisor", supervisor)
+    builder.add_conditional_edges(START, route, ["catalog", analyst.name, "supervisor"])
+    for node in ("catalog", analyst.name, "supervisor"):
+        builder.add_edge(node, END)
+    return builder
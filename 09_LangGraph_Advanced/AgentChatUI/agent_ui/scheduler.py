@@ -0,0 +1,388 @@
+# Standard library
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+# LangChain
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from langchain_core.rate_limiters import BaseRateLimiter
+
+
+# lower value = served first
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+# requests and tokens per minute, per model (override with the LLM_RATE_LIMITS env variable, same format)
+DEFAULT_LIMITS = {
+    "gpt-4o": {"rpm": 500, "tpm": 30_000},
+    "gpt-4o-mini": {"rpm": 500, "tpm": 200_000},
+    "gpt-3.5-turbo": {"rpm": 500, "tpm": 200_000},
+    "claude-sonnet-4-0": {"rpm": 50, "tpm": 30_000},
+    "text-embedding-3-small": {"rpm": 3_000, "tpm": 1_000_000},
+    "text-embedding-ada-002": {"rpm": 3_000, "tpm": 1_000_000},
+}
+FALLBACK_LIMITS = {"rpm": 60, "tpm": 30_000}
+
+POLL_INTERVAL = 0.01    # seconds between two checks of a waiting request
+BURST = 0.1             # share of the limit that can be spent at once, the rest is spread over the period
+
+# run id of the chat model call starting in this context: UsageCallback sets it in on_chat_model_start, before
+# LangChain looks the request up in the LLM cache and acquires the rate limiter, so a grant is matched with its call
+current_run: ContextVar[Optional[UUID]] = ContextVar("current_run", default=None)
+
+
+def model_key(model: str) -> str:
+    """'openai:gpt-4o' and 'gpt-4o' share the same limits."""
+    return model.split(":", 1)[-1]
+
+
+class TokenBucket:
+    """
+    Token bucket for a limit of `limit` per `period` seconds: holds at most `burst` of the limit
+    and refills the rest continuously, so no sliding window of `period` seconds goes above the limit.
+    Small limits (under 1 / burst) still hold one whole unit, so a single request can go through: a window may
+    then hold up to one unit more than the limit.
+    The level can go negative (debt) when the actual usage is only known after the request.
+    """
+
+    def __init__(self, limit: float, period: float = 60.0, burst: float = BURST):
+        if limit <= 0 or period <= 0 or not 0 < burst < 1:
+            raise ValueError(f"Invalid rate limit: {limit} per {period} s with a burst of {burst}")
+        self.capacity = max(1.0, limit * burst)
+        # from the limit itself: never zero, even when the capacity was rounded up to the whole limit
+        self.rate = limit * (1 - burst) / period
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def debit(self, amount: float):
+        self.level -= amount
+
+
+class ModelLane:
+    """Buckets, cooldown, waiting queue and metrics of one model, shared by all its clients."""
+
+    def __init__(self, rpm: float, tpm: float, period: float = 60.0):
+        self.requests = TokenBucket(rpm, period)
+        self.tokens = TokenBucket(tpm, period)
+        self.cooldown_until = 0.0
+        self.failures = 0       # consecutive rate-limit errors, drives the backoff
+        self.avg_tokens = 0.0   # running average of tokens per request, reserved when the usage isn't known upfront
+        self.waiters = []       # heap of (priority, ticket)
+        self.reservations: Dict[UUID, float] = {}      # tokens reserved for each granted chat call, by run id
+        self.lock = threading.Lock()
+        self.metrics = {
+            "rate_limited": 0,
+            "tokens_used": 0,
+            "lanes": {name: {"queued": 0, "granted": 0, "wait_total": 0.0, "wait_max": 0.0} for name in PRIORITIES},
+        }
+
+    def try_grant(self, entry: tuple, tokens: float, run_id: Optional[UUID] = None) -> Optional[float]:
+        """
+        Grants the request if it is first in line and the buckets allow it, and keeps what was reserved for `run_id`.
+        Returns None when granted, otherwise how long it is worth sleeping before retrying.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            if self.waiters[0] != entry:
+                return POLL_INTERVAL
+            if now < self.cooldown_until:
+                return self.cooldown_until - now
+            if self.requests.level < 1:
+                return (1 - self.requests.level) / self.requests.rate
+            needed = min(tokens or self.avg_tokens, self.tokens.capacity)
+            if self.tokens.level < needed:
+                return (needed - self.tokens.level) / self.tokens.rate + POLL_INTERVAL
+
+            heapq.heappop(self.waiters)
+            reserved = tokens or self.avg_tokens
+            self.requests.debit(1)
+            self.tokens.debit(reserved)
+            if run_id is not None:
+                self.reservations[run_id] = reserved
+            return None
+
+    def enqueue(self, priority: str, ticket: int) -> tuple:
+        entry = (PRIORITIES[priority], ticket)
+        with self.lock:
+            heapq.heappush(self.waiters, entry)
+            self.metrics["lanes"][priority]["queued"] += 1
+        return entry
+
+    def leave(self, entry: tuple, priority: str, waited: float, granted: bool):
+        with self.lock:
+            if not granted and entry in self.waiters:
+                self.waiters.remove(entry)
+                heapq.heapify(self.waiters)
+            lane = self.metrics["lanes"][priority]
+            lane["queued"] -= 1
+            if granted:
+                lane["granted"] += 1
+                lane["wait_total"] += waited
+                lane["wait_max"] = max(lane["wait_max"], waited)
+
+    def record_usage(self, tokens: int, reserved: float):
+        """Settles a request: `reserved` was debited when it was granted, the difference is debited now."""
+        with self.lock:
+            self.tokens.debit(tokens - reserved)
+            self.avg_tokens = tokens if not self.avg_tokens else 0.8 * self.avg_tokens + 0.2 * tokens
+            self.metrics["tokens_used"] += tokens
+            self.failures = 0
+
+    def settle(self, run_id: UUID, tokens: int) -> bool:
+        """
+        Settles the chat call `run_id` against what its grant reserved. A call without a reservation never went
+        through the rate limiter (an LLM cache hit): it used no provider tokens and is not counted.
+        """
+        with self.lock:
+            reserved = self.reservations.pop(run_id, None)
+        if reserved is None:
+            return False
+        self.record_usage(tokens, reserved)
+        return True
+
+    def release(self, run_id: UUID):
+        """Forgets the reservation of a failed call: its tokens stay debited, the request did reach the provider."""
+        with self.lock:
+            self.reservations.pop(run_id, None)
+
+    def record_rate_limit(self, retry_after: Optional[float], base: float, cap: float):
+        """Jittered exponential backoff for every lane of the model, so retries don't come back as a burst."""
+        with self.lock:
+            self.failures += 1
+            self.metrics["rate_limited"] += 1
+            delay = random.uniform(0, min(cap, base * 2 ** self.failures))
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            self.cooldown_until = max(self.cooldown_until, time.monotonic() + delay)
+
+
+class SchedulerRateLimiter(BaseRateLimiter):
+    """LangChain rate limiter for one (model, priority) lane: pass it as `rate_limiter=` to a chat model."""
+
+    def __init__(self, scheduler: "LLMScheduler", model: str, priority: str):
+        self.scheduler = scheduler
+        self.model = model
+        self.priority = priority
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        return self.scheduler.acquire(self.model, self.priority, blocking=blocking, run_id=current_run.get())
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        return await self.scheduler.aacquire(self.model, self.priority, blocking=blocking, run_id=current_run.get())
+
+
+class UsageCallback(BaseCallbackHandler):
+    """
+    Feeds actual token usage and rate-limit errors of a chat model back to the scheduler. Each call is settled against
+    the tokens its own grant reserved; calls answered by the LLM cache were never granted and are skipped.
+    """
+
+    # called in the caller's context (not in an executor), so current_run is seen by the rate limiter
+    run_inline = True
+
+    def __init__(self, scheduler: "LLMScheduler", model: str):
+        self.scheduler = scheduler
+        self.model = model
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        current_run.set(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        current_run.set(run_id)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    tokens += usage.get("total_tokens", 0)
+        if not tokens and response.llm_output:
+            tokens = (response.llm_output.get("token_usage") or {}).get("total_tokens", 0)
+        self.scheduler.lane(self.model).settle(run_id, tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self.scheduler.lane(self.model).release(run_id)
+        if is_rate_limit_error(error):
+            self.scheduler.lane(self.model).record_rate_limit(
+                retry_after(error), self.scheduler.backoff_base, self.scheduler.backoff_cap
+            )
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """429s from openai/anthropic (RateLimitError) or anything exposing status_code == 429."""
+    return getattr(error, "status_code", None) == 429 or "RateLimit" in type(error).__name__
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ScheduledEmbeddings(Embeddings):
+    """Wraps an embeddings client so its requests go through the scheduler too."""
+
+    def __init__(self, embeddings: Embeddings, scheduler: "LLMScheduler", model: str, priority: str = "batch"):
+        self.embeddings = embeddings
+        self.scheduler = scheduler
+        self.model = model
+        self.priority = priority
+
+    @staticmethod
+    def estimate_tokens(texts: List[str]) -> int:
+        return sum(len(text) for text in texts) // 4 + 1     # ~4 characters per token
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        tokens = self.estimate_tokens(texts)
+        self.scheduler.acquire(self.model, self.priority, tokens=tokens)
+        vectors = self.embeddings.embed_documents(texts)
+        self.record_usage(tokens)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        tokens = self.estimate_tokens([text])
+        self.scheduler.acquire(self.model, self.priority, tokens=tokens)
+        vector = self.embeddings.embed_query(text)
+        self.record_usage(tokens)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        tokens = self.estimate_tokens(texts)
+        await self.scheduler.aacquire(self.model, self.priority, tokens=tokens)
+        vectors = await self.embeddings.aembed_documents(texts)
+        self.record_usage(tokens)
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        tokens = self.estimate_tokens([text])
+        await self.scheduler.aacquire(self.model, self.priority, tokens=tokens)
+        vector = await self.embeddings.aembed_query(text)
+        self.record_usage(tokens)
+        return vector
+
+    def record_usage(self, tokens: int):
+        # embeddings APIs don't report usage through LangChain: the estimate reserved is what is counted
+        self.scheduler.lane(self.model).record_usage(tokens, reserved=tokens)
+
+
+class LLMScheduler:
+    """
+    Process-wide scheduler for LLM and embeddings requests.
+    Every model has a request bucket (rpm) and a token bucket (tpm) shared by all of its clients;
+    waiting requests are served by priority lane (interactive before batch), then in arrival order.
+    A rate-limit error puts the whole model in a jittered exponential backoff.
+
+    Usage:
+        model = ChatOpenAI(model="gpt-4o", **scheduler.client_kwargs("gpt-4o"))
+        embeddings = scheduler.embeddings(OpenAIEmbeddings(), "text-embedding-3-small")
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None, period: float = 60.0,
+                 backoff_base: float = 1.0, backoff_cap: float = 60.0):
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.period = period        # the limits are per period seconds (60: rpm/tpm)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.lanes: Dict[str, ModelLane] = {}
+        self.tickets = itertools.count()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "LLMScheduler":
+        return cls(limits=json.loads(os.environ.get("LLM_RATE_LIMITS", "{}")))
+
+    def lane(self, model: str) -> ModelLane:
+        key = model_key(model)
+        with self.lock:
+            if key not in self.lanes:
+                limits = self.limits.get(key, FALLBACK_LIMITS)
+                self.lanes[key] = ModelLane(limits["rpm"], limits["tpm"], self.period)
+            return self.lanes[key]
+
+    def acquire(self, model: str, priority: str = "interactive", tokens: float = 0, blocking: bool = True,
+                run_id: Optional[UUID] = None) -> bool:
+        lane = self.lane(model)
+        entry = lane.enqueue(priority, next(self.tickets))
+        start = time.monotonic()
+        granted = False
+        try:
+            while True:
+                wait = lane.try_grant(entry, tokens, run_id)
+                if wait is None:
+                    granted = True
+                    return True
+                if not blocking:
+                    return False
+                time.sleep(min(wait, POLL_INTERVAL * 10))
+        finally:
+            lane.leave(entry, priority, time.monotonic() - start, granted)
+
+    async def aacquire(self, model: str, priority: str = "interactive", tokens: float = 0, blocking: bool = True,
+                       run_id: Optional[UUID] = None) -> bool:
+        lane = self.lane(model)
+        entry = lane.enqueue(priority, next(self.tickets))
+        start = time.monotonic()
+        granted = False
+        try:
+            while True:
+                wait = lane.try_grant(entry, tokens, run_id)
+                if wait is None:
+                    granted = True
+                    return True
+                if not blocking:
+                    return False
+                await asyncio.sleep(min(wait, POLL_INTERVAL * 10))
+        finally:
+            lane.leave(entry, priority, time.monotonic() - start, granted)
+
+    def client_kwargs(self, model: str, priority: str = "interactive") -> Dict[str, Any]:
+        """Keyword arguments routing a ChatOpenAI / ChatAnthropic / init_chat_model client through the scheduler."""
+        return {
+            "rate_limiter": SchedulerRateLimiter(self, model, priority),
+            "callbacks": [UsageCallback(self, model)],
+        }
+
+    def embeddings(self, embeddings: Embeddings, model: str, priority: str = "batch") -> ScheduledEmbeddings:
+        return ScheduledEmbeddings(embeddings, self, model, priority)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, waits, rate-limit errors and token usage per model and lane."""
+        result = {}
+        for key, lane in list(self.lanes.items()):
+            with lane.lock:
+                lanes = {}
+                for name, stats in lane.metrics["lanes"].items():
+                    granted = stats["granted"]
+                    lanes[name] = {
+                        "queue_depth": stats["queued"],
+                        "granted": granted,
+                        "wait_mean": stats["wait_total"] / granted if granted else 0.0,
+                        "wait_max": stats["wait_max"],
+                    }
+                result[key] = {
+                    "rate_limited": lane.metrics["rate_limited"],
+                    "tokens_used": lane.metrics["tokens_used"],
+                    "lanes": lanes,
+                }
+        return result
+
+
+# the shared scheduler every client of the process routes through
+scheduler = LLMScheduler.from_env()
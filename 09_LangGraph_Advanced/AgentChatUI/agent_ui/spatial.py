@@ -0,0 +1,127 @@
+# Standard library
+from typing import Dict, Optional, Tuple
+# Third-party libraries
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from agent_ui.handles import DatasetHandle, DatasetStore, dataset_store
+from agent_ui.tool_cache import ToolCache
+
+
+METRIC_CRS = "EPSG:32632"   # UTM 32N: meters, covers Bologna
+
+
+class SpatialIndex:
+    """
+    Geometries of a GeoDataFrame projected once to METRIC_CRS, and their STRtree.
+    Positions returned by the queries are row positions of the original frame (use .iloc).
+    """
+
+    def __init__(self, gdf: gpd.GeoDataFrame, crs: str = METRIC_CRS):
+        if gdf.crs is None:
+            raise ValueError("The dataset has no CRS: it can't be projected to meters.")
+        self.frame = gdf
+        self.geoms = np.asarray(gdf.geometry.to_crs(crs).array)
+        self.tree = shapely.STRtree(self.geoms)
+        self.bounds = shapely.total_bounds(self.geoms)
+
+    def __len__(self) -> int:
+        return len(self.geoms)
+
+    def within_distance(self, target, distance: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions and distances (m) of the features within `distance` meters of `target`, closest first."""
+        positions = self.tree.query(target, predicate="dwithin", distance=distance)
+        distances = shapely.distance(self.geoms[positions], target)
+        order = np.argsort(distances, kind="stable")
+        return positions[order], distances[order]
+
+    def nearest(self, target, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The k features closest to `target`: dwithin queries with a growing radius, so only nearby features are measured."""
+        n = len(self.geoms)
+        if n == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        xmin, ymin, xmax, ymax = self.bounds
+        diagonal = float(np.hypot(xmax - xmin, ymax - ymin)) or 1.0
+        # beyond this radius every feature is included
+        farthest = shapely.distance(target, shapely.box(xmin, ymin, xmax, ymax)) + diagonal
+        # radius expected to hold ~k features if they were spread evenly
+        radius = max(diagonal * np.sqrt(min(k, n) / n), 1.0)
+        while True:
+            positions, distances = self.within_distance(target, radius)
+            if len(positions) >= min(k, n) or radius > farthest:
+                return positions[:k], distances[:k]
+            radius *= 4
+
+    def containing(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(point positions, feature positions) pairs of points falling within the features (polygons)."""
+        return self.tree.query(points, predicate="within")
+
+
+# (dataset version and read options) -> SpatialIndex
+spatial_indexes = ToolCache(maxsize=16)
+
+
+def get_spatial_index(handle: DatasetHandle, store: DatasetStore = dataset_store) -> SpatialIndex:
+    """The spatial index of a loaded GeoDataFrame, built on first use."""
+    key = store.key(handle)
+    found, index = spatial_indexes.get(key)
+    if not found:
+        if handle["kind"] != "GeoDataFrame":
+            raise ValueError(f"Dataset '{handle['name']}' has no geometries.")
+        index = SpatialIndex(store.resolve(handle))
+        spatial_indexes.put(key, index)
+    return index
+
+
+def resolve_target(loaded: Dict[str, DatasetHandle],
+                   lon: Optional[float] = None,
+                   lat: Optional[float] = None,
+                   target_dataset: Optional[str] = None,
+                   target_column: Optional[str] = None,
+                   target_value: Optional[str] = None):
+    """
+    The reference geometry of a spatial query, in METRIC_CRS: a lon/lat point (WGS84),
+    or the features of a loaded dataset whose `target_column` equals `target_value` (merged).
+    """
+    if lon is not None and lat is not None:
+        return gpd.GeoSeries([shapely.Point(lon, lat)], crs="EPSG:4326").to_crs(METRIC_CRS).iloc[0]
+
+    if not (target_dataset and target_column and target_value is not None):
+        raise ValueError("Give either lon and lat, or target_dataset, target_column and target_value.")
+    if target_dataset not in loaded:
+        raise ValueError(f"Dataset '{target_dataset}' is not loaded. Loaded datasets: {list(loaded)}")
+
+    index = get_spatial_index(loaded[target_dataset])
+    frame = index.frame
+    if target_column not in frame.columns:
+        raise ValueError(f"Column '{target_column}' not found in '{target_dataset}'.")
+    mask = (frame[target_column].astype(str) == str(target_value)).to_numpy()
+    if not mask.any():
+        raise ValueError(f"No feature with {target_column} == '{target_value}' in '{target_dataset}': "
+                         f"use fuzzy_match_name to find the exact value.")
+    return shapely.union_all(index.geoms[mask])
+
+
+def features_table(index: SpatialIndex, positions: np.ndarray, distances: np.ndarray) -> pd.DataFrame:
+    """Attributes of the selected features (geometries left out) with their distance in meters."""
+    frame = index.frame.iloc[positions]
+    table = pd.DataFrame(frame.drop(columns=frame.columns[frame.dtypes == "geometry"]))
+    table["distance_m"] = np.round(distances, 1)
+    return table.reset_index(drop=True)
+
+
+def count_within(points: SpatialIndex, polygons: SpatialIndex, label_column: str) -> pd.DataFrame:
+    """Number of points falling within each polygon, by the polygons' `label_column`, most populated first."""
+    if label_column not in polygons.frame.columns:
+        raise ValueError(f"Column '{label_column}' not found in the polygons dataset.")
+    point_positions, polygon_positions = polygons.containing(points.geoms)
+    counts = np.bincount(polygon_positions, minlength=len(polygons))
+    labels = polygons.frame[label_column].to_numpy()
+    table = pd.DataFrame({label_column: labels, "count": counts})
+    table = table.groupby(label_column, sort=False, dropna=False)["count"].sum().reset_index()
+    outside = len(points) - len(np.unique(point_positions))
+    if outside:
+        table.loc[len(table)] = ["(outside every polygon)", outside]
+    return table.sort_values("count", ascending=False, kind="stable").reset_index(drop=True)
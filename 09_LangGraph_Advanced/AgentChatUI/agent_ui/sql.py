@@ -0,0 +1,97 @@
+# Standard library
+import os
+import threading
+from typing import Optional, Tuple
+# Third-party libraries
+import duckdb
+import pandas as pd
+
+from agent_ui.catalog import DatasetCatalog
+
+
+MAX_ROWS = 500      # hard cap of the rows sent back to the model
+
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SQLEngine:
+    """
+    Read-only DuckDB engine over the parquet files of a catalog: every file is a view named after it
+    (pois.parquet -> pois), read directly from parquet with projection and filter pushdown, never loaded into pandas.
+    Geometry columns are left out of the views (they are WKB blobs without the spatial extension).
+
+    Only single SELECT statements are accepted, file access is restricted to the catalog folder,
+    and a query is interrupted after `timeout` seconds.
+    """
+
+    def __init__(self, catalog: DatasetCatalog, memory_limit: str = "1GB", timeout: float = 30):
+        self.catalog = catalog
+        self.timeout = timeout
+        self.views = {}     # view name -> catalog version
+        self.columns = {}   # view name -> its columns, for error messages
+        self.lock = threading.Lock()
+
+        folder = os.path.abspath(catalog.folder)
+        self.conn = duckdb.connect(":memory:")
+        self.conn.execute(f"SET memory_limit = '{memory_limit}'")
+        self.conn.execute(f"SET allowed_directories = ['{folder}{os.sep}']")
+        self.conn.execute("SET enable_external_access = false")     # can't be turned back on
+        self.conn.execute("SET lock_configuration = true")
+
+    def refresh(self):
+        """(Re)creates the views of new or changed files, drops those of deleted files."""
+        with self.lock:
+            infos = {info.name: info for info in self.catalog.list()}
+            for name, info in infos.items():
+                if self.views.get(name) == info.version:
+                    continue
+                exclude = f" EXCLUDE ({', '.join(quote(c) for c in info.geometry)})" if info.geometry else ""
+                path = os.path.abspath(info.path).replace("'", "''")
+                self.conn.execute(f"CREATE OR REPLACE VIEW {quote(name)} AS SELECT *{exclude} FROM read_parquet('{path}')")
+                self.views[name] = info.version
+                self.columns[name] = [c for c, _ in info.columns if c not in info.geometry]
+            for name in set(self.views) - set(infos):
+                self.conn.execute(f"DROP VIEW IF EXISTS {quote(name)}")
+                del self.views[name]
+                del self.columns[name]
+
+    def query(self, sql: str, max_rows: int = 50) -> Tuple[pd.DataFrame, bool]:
+        """Runs a SELECT and returns at most `max_rows` rows, plus whether the result was truncated."""
+        with self.lock:     # parsing uses the shared connection too
+            statements = self.conn.extract_statements(sql)
+        if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+            raise ValueError("Only a single SELECT query is allowed.")
+        max_rows = max(1, min(max_rows, MAX_ROWS))
+
+        self.refresh()
+        cursor = self.conn.cursor()     # one connection per query: tool calls run in parallel threads
+        timer = threading.Timer(self.timeout, cursor.interrupt)
+        timer.start()
+        try:
+            # the limit is pushed into the plan: only the returned rows are ever materialized
+            query = statements[0].query.strip().rstrip(";")
+            df = cursor.execute(f"SELECT * FROM (\n{query}\n) LIMIT {max_rows + 1}").fetch_df()
+        finally:
+            timer.cancel()
+            cursor.close()
+        return df.head(max_rows), len(df) > max_rows
+
+    def tables(self) -> str:
+        """
+        Views and their columns as of the last refresh, for error messages: no catalog access, so it can't fail
+        when the query failed because of the folder.
+        """
+        with self.lock:
+            return "\n".join(f"- {name}({', '.join(columns)})" for name, columns in sorted(self.columns.items()))
+
+
+def format_result(df: pd.DataFrame, truncated: bool, max_value_len: Optional[int] = 40) -> str:
+    """Result table as text for the model, long values cut."""
+    if df.empty:
+        return "Query returned no rows."
+    text = df.to_string(index=False, max_colwidth=max_value_len)
+    if truncated:
+        text += f"\n...(truncated to the first {len(df)} rows: aggregate or add a LIMIT)"
+    return text
@@ -0,0 +1,164 @@
+"""
+Out-of-core aggregations over parquet files: the file is scanned row group by row group and only small partial
+results are kept in memory (one row per group, or the k best rows), whatever the file size.
+"""
+
+# Standard library
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple, Union
+# Third-party libraries
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+# LangChain and LangGraph
+from langgraph.config import get_stream_writer
+
+from agent_ui.loader import geo_metadata, to_expression
+
+
+BATCH_SIZE = 64 * 1024
+MAX_GROUPS = 1_000_000      # a group-by with more groups than this is not an aggregation anymore
+
+AGGREGATIONS = ("count", "sum", "mean", "min", "max")
+# partial aggregations computed on each batch, and how partials of different batches combine
+PARTIALS = {
+    "count": [("count", "sum")],
+    "sum": [("sum", "sum")],
+    "mean": [("sum", "sum"), ("count", "sum")],
+    "min": [("min", "min")],
+    "max": [("max", "max")],
+}
+
+# (row groups done, row groups total, rows scanned so far)
+Progress = Callable[[int, int, int], None]
+
+
+def iter_batches(path: Union[str, Path],
+                 columns: Optional[List[str]] = None,
+                 filters: Optional[Sequence] = None,
+                 progress: Optional[Progress] = None,
+                 batch_size: int = BATCH_SIZE) -> Iterator[pa.RecordBatch]:
+    """
+    Record batches of a parquet file, one row group at a time. Row groups whose statistics can't match the filters
+    are skipped without being read; `progress` is called after each row group.
+    """
+    dataset = ds.dataset(str(path), format="parquet")
+    expression = to_expression(filters)
+    row_groups = [rg for fragment in dataset.get_fragments(filter=expression)
+                  for rg in fragment.split_by_row_group(expression)]
+
+    rows = 0
+    for i, row_group in enumerate(row_groups, 1):
+        scanner = ds.Scanner.from_fragment(row_group, schema=dataset.schema, columns=columns, filter=expression,
+                                           batch_size=batch_size, batch_readahead=1)
+        for batch in scanner.to_batches():
+            rows += batch.num_rows
+            yield batch
+        if progress is not None:
+            progress(i, len(row_groups), rows)
+
+
+def aggregate(path: Union[str, Path],
+              aggregations: Sequence[Tuple[str, str]],
+              group_by: Optional[List[str]] = None,
+              filters: Optional[Sequence] = None,
+              progress: Optional[Progress] = None) -> pa.Table:
+    """
+    Group-by aggregation in bounded memory. `aggregations` are (column, function) pairs with function in
+    count/sum/mean/min/max; ("*", "count") counts rows. Without `group_by`, a single row (e.g. a filtered count).
+    Result columns are named function_column ("count" for rows).
+    """
+    group_by = list(group_by or [])
+    for column, function in aggregations:
+        if function not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation '{function}'. Use one of {AGGREGATIONS}.")
+        if column == "*" and function != "count":
+            raise ValueError("'*' can only be counted.")
+
+    partials = []       # (column, partial function, combine function), deduplicated
+    for column, function in aggregations:
+        for spec in ([("*", "count_all", "sum")] if column == "*" else
+                     [(column, partial, combine) for partial, combine in PARTIALS[function]]):
+            if spec not in partials:
+                partials.append(spec)
+    batch_specs = [([] if column == "*" else column, partial) for column, partial, _ in partials]
+    names = ["count_all" if column == "*" else f"{column}_{partial}" for column, partial, _ in partials]
+    combine_specs = [(name, combine) for name, (_, _, combine) in zip(names, partials)]
+    renames = {f"{name}_{combine}": name for name, combine in combine_specs}
+
+    columns = list(dict.fromkeys(group_by + [column for column, _ in aggregations if column != "*"]))
+    state = None
+    for batch in iter_batches(path, columns=columns, filters=filters, progress=progress):
+        if batch.num_rows == 0:
+            continue
+        partial = pa.Table.from_batches([batch]).group_by(group_by).aggregate(batch_specs)
+        if state is None:
+            state = partial
+            continue
+        merged = pa.concat_tables([state, partial.select(state.column_names)]).group_by(group_by).aggregate(combine_specs)
+        state = merged.rename_columns([renames.get(name, name) for name in merged.column_names])
+        if state.num_rows > MAX_GROUPS:
+            raise ValueError(f"More than {MAX_GROUPS} groups: group by fewer or coarser columns.")
+
+    if state is None:   # nothing matched the filters: no groups, or a single row counting 0
+        rows = 0 if group_by else 1
+        return pa.table({**{key: pa.array([], type=pa.string()) for key in group_by},
+                         **{_result_name(c, f): pa.array([0 if f == "count" else None] * rows, type=pa.float64())
+                            for c, f in aggregations}})
+
+    result = {key: state[key] for key in group_by}
+    for column, function in aggregations:
+        if column == "*":
+            result[_result_name(column, function)] = state["count_all"]
+        elif function == "mean":
+            total, count = state[f"{column}_sum"], state[f"{column}_count"]
+            result[_result_name(column, function)] = pc.divide(pc.cast(total, pa.float64()), pc.cast(count, pa.float64()))
+        else:
+            result[_result_name(column, function)] = state[f"{column}_{function}"]
+    return pa.table(result).sort_by([(key, "ascending") for key in group_by]) if group_by else pa.table(result)
+
+
+def _result_name(column: str, function: str) -> str:
+    return "count" if column == "*" else f"{function}_{column}"
+
+
+def top_k(path: Union[str, Path],
+          order_by: str,
+          k: int = 10,
+          descending: bool = True,
+          columns: Optional[List[str]] = None,
+          filters: Optional[Sequence] = None,
+          progress: Optional[Progress] = None) -> pa.Table:
+    """The k rows with the largest (or smallest) `order_by`, keeping only k rows in memory. Geometries are left out."""
+    order = "descending" if descending else "ascending"
+    if columns is None:
+        dataset = ds.dataset(str(path), format="parquet")
+        geo = geo_metadata(dataset.schema) or {"columns": {}}
+        columns = [name for name in dataset.schema.names if name not in geo["columns"]]
+    columns = list(dict.fromkeys(list(columns) + [order_by]))
+
+    best = None
+    for batch in iter_batches(path, columns=columns, filters=filters, progress=progress):
+        table = pa.Table.from_batches([batch])
+        if best is not None:
+            table = pa.concat_tables([best, table])
+        best = table.take(pc.select_k_unstable(table, k, sort_keys=[(order_by, order)]))
+
+    if best is None:
+        return pa.table({name: pa.array([], type=pa.string()) for name in columns})
+    return best.sort_by([(order_by, order)])
+
+
+def stream_progress(label: str) -> Optional[Progress]:
+    """
+    Progress callback sending {"progress": ...} to the graph's "custom" stream, or None outside a graph run
+    (then the scan is just silent).
+    """
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return None
+
+    def progress(done: int, total: int, rows: int):
+        writer({"progress": f"{label}: row group {done}/{total} ({rows:,} rows scanned)"})
+    return progress
@@ -3,7 +3,14 @@ from langchain.chat_models import init_chat_model
 
 from agent_ui.state import DatasetState
 from agent_ui.analyst_agent import analyst_agent
+from agent_ui.tools import catalog
 import agent_ui.load_env 
+from agent_ui.llm_cache import enable_llm_cache
+from agent_ui.scheduler import scheduler
+from agent_ui.router import with_fast_path
+from agent_ui.compaction import history_compactor
+
+enable_llm_cache()   # set LLM_CACHE_MODE=record|replay to record/replay LLM responses
 
 supervisor_prompt = (
     "You are coordinating a data analyst \n\n"
@@ -11,14 +18,18 @@ supervisor_prompt = (
     "Do not do any work yourself.\n"
 )
 
-supervisor = (
+# catalog listings and unambiguous requests skip the supervisor LLM, see agent_ui.router
+supervisor = with_fast_path(
     create_supervisor(
-      model=init_chat_model("openai:gpt-3.5-turbo"),
+      model=init_chat_model("openai:gpt-3.5-turbo", **scheduler.client_kwargs("openai:gpt-3.5-turbo")),
       agents=[analyst_agent],
       prompt=supervisor_prompt,
+      pre_model_hook=history_compactor.hook("supervisor"),    # old tool outputs summarized for the model
       state_schema=DatasetState,
       add_handoff_back_messages=True,
       output_mode="full_history",
-    )
-    .compile()
-)
+    ).compile(name="supervisor"),
+    analyst_agent,
+    DatasetState,
+    catalog,
+).compile()     # served by the LangGraph server (langgraph.json), which brings its own persistence
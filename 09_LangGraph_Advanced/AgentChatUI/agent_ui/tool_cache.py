@@ -0,0 +1,160 @@
+# Standard library
+import dataclasses
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+# LangChain and LangGraph
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import tool
+from langgraph.types import Command
+
+
+# arguments injected by LangGraph at call time: never part of the cache key
+INJECTED_ARGS = ("state", "tool_call_id", "config", "store", "runtime")
+
+
+class ToolCache:
+    """
+    LRU cache with an optional time-to-live, shared by all the calls of one tool.
+    Thread safe, since ToolNode runs parallel tool calls in a thread pool.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()    # key -> (expiry, value), least recently used first
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable):
+        """Returns (True, value) on a hit, (False, None) on a miss."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:   # expired
+                del self.entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return False, None
+
+    def put(self, key: Hashable, value: Any):
+        expiry = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self.lock:
+            self.entries[key] = (expiry, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+        }
+
+
+# tool name -> its cache, so stats can be reported for every cached tool
+TOOL_CACHES: Dict[str, ToolCache] = {}
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit/miss stats of every tool declared with @cached_tool."""
+    return {name: cache.stats() for name, cache in TOOL_CACHES.items()}
+
+
+def make_key(signature: inspect.Signature, args: tuple, kwargs: dict, version: Optional[Callable]) -> str:
+    """
+    Normalized cache key: arguments bound by name (positional or keyword, defaults filled in),
+    minus the injected ones, plus the optional state version.
+    """
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    key = {name: value for name, value in bound.arguments.items() if name not in INJECTED_ARGS}
+    if version is not None:
+        key["__version__"] = version(**bound.arguments)
+    return json.dumps(key, sort_keys=True, default=repr)
+
+
+def rebind_tool_call_id(result: Any, tool_call_id: Optional[str]) -> Any:
+    """
+    A cached Command carries the ToolMessage of the call that produced it:
+    point it to the current tool call, or the model would see a dangling tool_call_id.
+    """
+    if tool_call_id is None or not isinstance(result, Command) or not isinstance(result.update, dict):
+        return result
+
+    messages = [
+        m.model_copy(update={"tool_call_id": tool_call_id}) if isinstance(m, ToolMessage) else m
+        for m in result.update.get("messages", [])
+    ]
+    return dataclasses.replace(result, update={**result.update, "messages": messages})
+
+
+def cached_tool(func: Optional[Callable] = None, *, maxsize: int = 128, ttl: Optional[float] = None,
+                version: Optional[Callable[..., Hashable]] = None, **tool_kwargs):
+    """
+    Drop-in replacement for @tool that memoizes the tool results.
+    Use it only for deterministic tools: the same arguments (and state version) must give the same result.
+
+    Args:
+        maxsize: max number of results kept (least recently used are evicted first).
+        ttl: seconds after which a result expires (None: never).
+        version: optional callable receiving the same arguments as the tool (injected state included),
+            returning a hashable version that becomes part of the key, e.g. the datasets currently loaded.
+        tool_kwargs: forwarded to @tool.
+
+    Example:
+        @cached_tool(maxsize=256, ttl=60)
+        def add(a: int, b: int): ...
+    """
+
+    def decorator(fn: Callable):
+        signature = inspect.signature(fn)
+        cache = ToolCache(maxsize=maxsize, ttl=ttl)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                key = make_key(signature, args, kwargs, version)
+                hit, result = cache.get(key)
+                if not hit:
+                    result = await fn(*args, **kwargs)
+                    cache.put(key, result)
+                return rebind_tool_call_id(result, kwargs.get("tool_call_id"))
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                key = make_key(signature, args, kwargs, version)
+                hit, result = cache.get(key)
+                if not hit:
+                    result = fn(*args, **kwargs)
+                    cache.put(key, result)
+                return rebind_tool_call_id(result, kwargs.get("tool_call_id"))
+
+        wrapper.cache = cache
+        cached = tool(**tool_kwargs)(wrapper) if tool_kwargs else tool(wrapper)
+        TOOL_CACHES[cached.name] = cache
+        return cached
+
+    # supports both @cached_tool and @cached_tool(...)
+    if func is not None:
+        return decorator(func)
+    return decorator
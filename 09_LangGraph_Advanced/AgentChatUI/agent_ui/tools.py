@@ -1,31 +1,35 @@
 # Standard library
 import os
 from pathlib import Path
-from typing import Union
+from typing import List, Optional
 from typing_extensions import Annotated
-# Third-party libraries
-import pandas as pd
-import geopandas as gpd
 # LangChain and LangGraph
 from langchain_core.messages import ToolMessage
 from langchain_core.tools import tool, InjectedToolCallId
 from langgraph.prebuilt import InjectedState
 from langgraph.types import Command
+from agent_ui.catalog import DatasetCatalog
+from agent_ui.loader import MAX_LOAD_BYTES, describe_read
+from agent_ui.handles import dataset_store, describe_handle
+from agent_ui.sql import MAX_ROWS, SQLEngine, format_result
+from agent_ui.streaming import aggregate, stream_progress, top_k
 # dataset class
 # ✅ Correct when agent_ui is installed as a package
 from agent_ui.state import DatasetState
 
 
-DATASET_FOLDER = "../LLM_data"
+DATASET_FOLDER = os.environ.get("DATASET_FOLDER", "../LLM_data")
+catalog = DatasetCatalog(DATASET_FOLDER)    # schemas and sizes read from the parquet footers only
 
 # ----------------------
 # Tool: list datasets
 # ----------------------
 @tool
 def list_loadable_datasets() -> str:
-    """Lists all available parquet datasets in the dataset folder."""
-    files = [f for f in os.listdir(DATASET_FOLDER) if f.endswith(".parquet")]
-    return "\n".join(files) if files else "No parquet datasets found."
+    """Lists all available parquet datasets in the dataset folder, with their size and type."""
+    lines = [info.summary() for info in catalog.list()]
+    lines += [f"{name}.parquet: unreadable, can't be loaded ({reason})" for name, reason in catalog.errors().items()]
+    return "\n".join(lines) if lines else "No parquet datasets found."
 
 @tool
 def list_inmemory_datasets(state: Annotated[DatasetState, InjectedState]) -> str:
@@ -33,20 +37,27 @@ def list_inmemory_datasets(state: Annotated[DatasetState, InjectedState]) -> str
     if not state["loaded"]:
         return "No loaded datasets in memory. Use list_loadable_datasets() to see available files."
     
-    lines = []
-    for name, df in state["loaded"].items():
-        dtype = "GeoDataFrame" if isinstance(df, gpd.GeoDataFrame) else "DataFrame"
-        lines.append(f"- {name}: {dtype} (shape={df.shape})")
-
-    return "\n".join(lines)
+    return "\n".join(describe_handle(handle) for handle in state["loaded"].values())
 
 # ----------------------
 # Tool: load datasets
 # ----------------------
 @tool
-def load_dataset(file_name: str, tool_call_id: Annotated[str, InjectedToolCallId]) -> Command:
+def load_dataset(file_name: str,
+                 tool_call_id: Annotated[str, InjectedToolCallId],
+                 columns: Optional[List[str]] = None,
+                 filters: Optional[List[list]] = None,
+                 limit: Optional[int] = None,
+) -> Command:
     """
-    Loads a Parquet dataset (optionally as GeoDataFrame) and updates state['loaded'][name].
+    Loads a Parquet dataset (as GeoDataFrame if it has geometries) and adds its handle to state['loaded'][name].
+
+    Only load what you need, it is much faster on large datasets:
+    - columns: list of columns to read (the geometry column is always included).
+    - filters: row filters as [column, operator, value] triples, ANDed together,
+      e.g. [["quartiere", "==", "Navile"], ["anno", ">=", 2020]]. Operators: ==, !=, <, <=, >, >=, in, not in.
+    - limit: max number of rows to read.
+    Loading a dataset again replaces it.
     """
     update = {}
 
@@ -58,19 +69,119 @@ def load_dataset(file_name: str, tool_call_id: Annotated[str, InjectedToolCallId
         return f"File '{file_name}' not found."
 
     try:
-        df = pd.read_parquet(path)
-        if "geometry" in df.columns:
-            try:
-                df = gpd.read_parquet(path)
-            except Exception as geo_err:
-                return f"Failed to load as GeoDataFrame: {geo_err}"
-        update[file_stem] = df
+        info = catalog.get(file_stem)
+        if info is None and file_stem in catalog.errors():
+            return f"Dataset '{file_stem}' can't be read: {catalog.errors()[file_stem]}"
+        if info is not None and limit is None and not filters and info.memory_estimate(columns) > MAX_LOAD_BYTES:
+            return (f"Dataset '{file_stem}' is too large to load (at least {info.memory_estimate(columns) / 1e9:.1f} "
+                    f"GB in memory). Load fewer columns, filtered rows or a limit, or use aggregate_dataset, "
+                    f"top_k_rows or sql_query, which don't load it.")
+
+        handle, df = dataset_store.open(file_stem, path, columns=columns, filters=filters, limit=limit,
+                                        version=info.version if info else None)
+        update[file_stem] = handle
     except Exception as e:
         return f"Error loading dataset: {e}"
 
     return Command(update={
         "loaded": update,   
         "messages": [
-            ToolMessage(f"Loaded dataset '{file_stem}' into memory.", tool_call_id=tool_call_id)
+            ToolMessage(f"Loaded dataset '{file_stem}'{describe_read(columns, filters, limit)} into memory "
+                        f"(shape={df.shape}).", tool_call_id=tool_call_id)
         ]
     })
+
+
+@tool
+def unload_dataset(name: str,
+                   state: Annotated[DatasetState, InjectedState],
+                   tool_call_id: Annotated[str, InjectedToolCallId],
+) -> Command:
+    """
+    Unloads a dataset: removes it from state['loaded'] and from the Python session (its variable is deleted).
+    Unload datasets you no longer need to free memory. To replace a dataset (e.g. with other columns or filters),
+    just load it again with `load_dataset`.
+    """
+    if name not in state.get("loaded", {}):
+        tool_err = f"Dataset '{name}' is not loaded. Loaded datasets: {list(state.get('loaded', {}))}"
+        return Command(update={"messages": [ToolMessage(tool_err, tool_call_id=tool_call_id)]})
+
+    return Command(update={
+        "loaded": {name: None},     # removed by the merge_handles reducer
+        "messages": [ToolMessage(f"Unloaded dataset '{name}'.", tool_call_id=tool_call_id)],
+    })
+
+
+# ----------------------
+# Tool: sql query
+# ----------------------
+sql_engine = SQLEngine(catalog)     # every parquet file is a view named after it
+
+@tool
+def sql_query(query: str, max_rows: int = 50) -> str:
+    """
+    Runs a SQL SELECT (DuckDB dialect) directly on the parquet files, without loading them.
+    Each file is a table named after it (pois.parquet -> pois). Geometry columns are not available in SQL.
+    Best for counts, aggregations, filters and joins on tabular columns, e.g.
+    SELECT quartiere, count(*) AS n FROM pois GROUP BY quartiere ORDER BY n DESC
+    Returns at most `max_rows` rows (max 500): aggregate in SQL rather than fetching raw rows.
+    """
+    try:
+        df, truncated = sql_engine.query(query, max_rows=max_rows)
+    except Exception as e:
+        return f"Query failed: {e}\nAvailable tables:\n{sql_engine.tables()}"
+    return format_result(df, truncated)
+
+
+# ----------------------
+# Tool: streaming aggregations
+# ----------------------
+def dataset_path(file_name: str) -> Path:
+    return Path(DATASET_FOLDER) / f"{Path(file_name).stem}.parquet"
+
+@tool
+def aggregate_dataset(file_name: str,
+                      aggregations: List[List[str]],
+                      group_by: Optional[List[str]] = None,
+                      filters: Optional[List[list]] = None,
+) -> str:
+    """
+    Aggregates a parquet dataset without loading it: the file is streamed row group by row group,
+    so it works on datasets of any size.
+    - aggregations: [column, function] pairs, function in count/sum/mean/min/max; ["*", "count"] counts rows.
+    - group_by: optional grouping columns, e.g. ["quartiere"].
+    - filters: optional row filters as [column, operator, value] triples, like in load_dataset.
+    Example: aggregations=[["*", "count"], ["value", "mean"]], group_by=["quartiere"], filters=[["anno", ">=", 2020]]
+    """
+    path = dataset_path(file_name)
+    if not path.exists():
+        return f"File '{path.name}' not found."
+    try:
+        table = aggregate(path, [tuple(a) for a in aggregations], group_by=group_by, filters=filters,
+                          progress=stream_progress(f"Aggregating {path.stem}"))
+    except Exception as e:
+        return f"Aggregation failed: {e}"
+    df = table.to_pandas()
+    return format_result(df.head(MAX_ROWS), len(df) > MAX_ROWS)
+
+@tool
+def top_k_rows(file_name: str,
+               order_by: str,
+               k: int = 10,
+               descending: bool = True,
+               columns: Optional[List[str]] = None,
+               filters: Optional[List[list]] = None,
+) -> str:
+    """
+    Returns the k rows of a parquet dataset with the largest (descending=True) or smallest `order_by` value,
+    streaming the file without loading it. `columns` selects the columns to show, `filters` works like in load_dataset.
+    """
+    path = dataset_path(file_name)
+    if not path.exists():
+        return f"File '{path.name}' not found."
+    try:
+        table = top_k(path, order_by, k=min(k, MAX_ROWS), descending=descending, columns=columns, filters=filters,
+                      progress=stream_progress(f"Scanning {path.stem}"))
+    except Exception as e:
+        return f"Top-k failed: {e}"
+    return format_result(table.to_pandas(), False)
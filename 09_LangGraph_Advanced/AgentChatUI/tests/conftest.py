@@ -0,0 +1,42 @@
+# Standard library
+import os
+# Third-party libraries
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import pytest
+from shapely.geometry import box
+
+# the modules reading keys at import time (load_env) must not prompt for them
+for key in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY", "LANGSMITH_API_KEY", "LANGSMITH_ENDPOINT", "LANGSMITH_PROJECT"):
+    os.environ.setdefault(key, "test")
+os.environ.setdefault("LANGSMITH_TRACING", "false")
+
+
+@pytest.fixture
+def dataset_folder(tmp_path):
+    """
+    A small LLM_data folder:
+        sales.parquet       plain table, 1000 rows in 4 row groups (category, value, amount)
+        trees.parquet       200 points around Bologna, in EPSG:4326
+        quarters.parquet    a 2 x 2 grid of polygons covering the points
+    """
+    rng = np.random.default_rng(0)
+    sales = pd.DataFrame({
+        "category": np.array(["a", "b", "c", "d"])[np.arange(1000) % 4],
+        "value": np.arange(1000),
+        "amount": rng.random(1000).round(3),
+    })
+    sales.to_parquet(tmp_path / "sales.parquet", row_group_size=250)
+
+    lon = 11.30 + rng.random(200) * 0.10
+    lat = 44.45 + rng.random(200) * 0.10
+    trees = gpd.GeoDataFrame({"tree_id": np.arange(200), "species": np.array(["oak", "pine"])[np.arange(200) % 2]},
+                             geometry=gpd.points_from_xy(lon, lat), crs="EPSG:4326")
+    trees.to_parquet(tmp_path / "trees.parquet")
+
+    cells = [box(11.30 + i * 0.05, 44.45 + j * 0.05, 11.35 + i * 0.05, 44.50 + j * 0.05)
+             for i in range(2) for j in range(2)]
+    quarters = gpd.GeoDataFrame({"quarter": ["sw", "nw", "se", "ne"]}, geometry=cells, crs="EPSG:4326")
+    quarters.to_parquet(tmp_path / "quarters.parquet")
+    return tmp_path
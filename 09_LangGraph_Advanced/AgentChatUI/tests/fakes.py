@@ -0,0 +1,79 @@
+"""Fake chat models and UI messages for the tests: scripted, no API call."""
+
+# Standard library
+from typing import Any, List, Optional
+# LangChain and LangGraph
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import tool
+
+
+class FakeSupervisorModel(BaseChatModel):
+    """Hands off to the analyst when the user mentions `handoff_word`, otherwise answers (or reports) itself."""
+
+    handoff_word: str = "trees"
+    analyst: str = "analyst_agent"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-supervisor"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "FakeSupervisorModel":
+        return self
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        last = messages[-1]
+        if isinstance(last, HumanMessage) and self.handoff_word in last.content:
+            message = AIMessage(content="", tool_calls=[
+                {"name": f"transfer_to_{self.analyst}", "args": {}, "id": f"handoff-{len(messages)}"}])
+        elif isinstance(last, HumanMessage):
+            message = AIMessage(content="Hello, I coordinate a data analyst.")
+        else:
+            message = AIMessage(content="The analyst counted 3 trees.")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class FakeAnalystModel(BaseChatModel):
+    """Calls the `count_trees` tool once, then answers with its output."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-analyst"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "FakeAnalystModel":
+        return self
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        last = messages[-1]
+        if isinstance(last, ToolMessage) and last.name == "count_trees":
+            message = AIMessage(content=f"There are {last.content} trees.")
+        else:
+            message = AIMessage(content="", tool_calls=[
+                {"name": "count_trees", "args": {}, "id": f"count-{len(messages)}"}])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+@tool(response_format="content_and_artifact")
+def count_trees():
+    """Counts the trees (and draws a figure)."""
+    return "3", {"figure": True}
+
+
+class StubMessage:
+    """Records what a UI message receives (chainlit's Message interface: stream_token, send)."""
+
+    def __init__(self, author: str):
+        self.author = author
+        self.content = ""
+        self.updates = 0
+        self.sent = False
+
+    async def stream_token(self, token: str, is_sequence: bool = False):
+        self.content = token if is_sequence else self.content + token
+        self.updates += 1
+
+    async def send(self):
+        self.sent = True
@@ -0,0 +1,35 @@
+# Standard library
+import json
+
+from agent_ui.artifacts import ArtifactStore
+
+
+def test_same_content_is_stored_once(tmp_path):
+    store = ArtifactStore(tmp_path)
+    first = store.put("call-1", "html", "<html>map</html>")
+    second = store.put("call-2", "html", "<html>map</html>")
+    assert first["path"] == second["path"]
+    assert store.bytes_stored == first["size"]
+    assert store.get("call-1") == [first] and store.get("call-2", "image") == []
+
+
+def test_index_is_rebuilt_from_checkpointed_refs(tmp_path):
+    ref = ArtifactStore(tmp_path).put("call-1", "image", b"\x89PNG...")
+    restarted = ArtifactStore(tmp_path)             # a new process: the index is empty, the file is still there
+    assert restarted.get("call-1") == []
+    checkpointed = json.loads(json.dumps({"image": ref}))
+    assert restarted.restore(list(checkpointed.values())) == [ref]
+    assert restarted.restore([ref]) == [ref]        # already indexed: counted once
+    assert restarted.get("call-1") == [ref] and restarted.bytes_stored == ref["size"]
+
+    restarted.clear()
+    assert ArtifactStore(tmp_path).restore([ref]) == []     # the file is gone
+
+
+def test_only_store_files_are_served(tmp_path):
+    store = ArtifactStore(tmp_path)
+    ref = store.put("call-1", "html", "<html>map</html>")
+    assert store.path_of(store.file_name(ref)) == tmp_path / store.file_name(ref)
+    (tmp_path / "notes.txt").write_text("private")
+    for name in ("notes.txt", "../notes.txt", "0" * 64 + ".html", store.file_name(ref) + "/.."):
+        assert store.path_of(name) is None
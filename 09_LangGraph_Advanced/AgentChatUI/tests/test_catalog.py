@@ -0,0 +1,95 @@
+# Standard library
+import os
+# Third-party libraries
+import pandas as pd
+import pytest
+
+from agent_ui import catalog
+from agent_ui.catalog import DatasetCatalog
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """Names of the files whose footer was parsed into a DatasetInfo."""
+    seen = []
+    read_info = catalog.read_info
+
+    def counting(path, stat, version):
+        seen.append(path.stem)
+        return read_info(path, stat, version)
+
+    monkeypatch.setattr(catalog, "read_info", counting)
+    return seen
+
+
+def test_entries_come_from_the_footers(dataset_folder):
+    entries = DatasetCatalog(str(dataset_folder)).refresh()
+    assert set(entries) == {"sales", "trees", "quarters"}
+
+    sales = entries["sales"]
+    assert (sales.kind, sales.num_rows, sales.num_row_groups) == ("DataFrame", 1000, 4)
+    assert [name for name, _ in sales.columns] == ["category", "value", "amount"]
+    assert sales.memory_estimate(["value"]) == sales.column_bytes["value"] < sales.memory_estimate()
+
+    trees = entries["trees"]
+    assert trees.kind == "GeoDataFrame" and trees.primary_geometry == "geometry"
+    assert trees.geometry["geometry"] == {"crs": "EPSG:4326", "geometry_types": ["Point"]}
+    assert "Point in EPSG:4326" in trees.summary()
+    # the geometry column is always part of a read
+    assert trees.memory_estimate(["tree_id"]) == trees.column_bytes["tree_id"] + trees.column_bytes["geometry"]
+
+
+def test_unchanged_files_are_not_read_again(dataset_folder, reads):
+    datasets = DatasetCatalog(str(dataset_folder))
+    datasets.refresh()
+    assert sorted(reads) == ["quarters", "sales", "trees"]
+    datasets.refresh()
+    assert len(reads) == 3
+
+
+def test_touched_file_keeps_its_entry(dataset_folder, reads):
+    datasets = DatasetCatalog(str(dataset_folder))
+    version = datasets.get("sales").version
+    path = dataset_folder / "sales.parquet"
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10 ** 9))
+
+    info = datasets.get("sales")
+    assert info.version == version and info.mtime_ns == path.stat().st_mtime_ns
+    assert reads.count("sales") == 1
+
+
+def test_rewritten_added_and_deleted_files(dataset_folder):
+    datasets = DatasetCatalog(str(dataset_folder))
+    version = datasets.get("sales").version
+
+    pd.DataFrame({"category": ["z"], "value": [1], "amount": [0.5]}).to_parquet(dataset_folder / "sales.parquet")
+    pd.DataFrame({"x": [1, 2]}).to_parquet(dataset_folder / "extra.parquet")
+    (dataset_folder / "quarters.parquet").unlink()
+    (dataset_folder / "notes.txt").write_text("not a dataset")
+
+    sales = datasets.get("sales.parquet")
+    assert sales.version != version and sales.num_rows == 1
+    assert [info.name for info in datasets.list()] == ["extra", "sales", "trees"]
+    assert datasets.get("quarters") is None
+
+
+def test_unreadable_files_are_left_out(dataset_folder, reads):
+    data = (dataset_folder / "sales.parquet").read_bytes()
+    (dataset_folder / "truncated.parquet").write_bytes(data[: len(data) // 2])
+    (dataset_folder / "tiny.parquet").write_bytes(b"PAR")
+    (dataset_folder / "corrupt.parquet").write_bytes(b"PAR1" + b"\xff" * 64 + (40).to_bytes(4, "little") + b"PAR1")
+
+    datasets = DatasetCatalog(str(dataset_folder))
+    assert [info.name for info in datasets.list()] == ["quarters", "sales", "trees"]
+    errors = datasets.errors()
+    assert set(errors) == {"truncated", "tiny", "corrupt"}
+    assert "too small" in errors["tiny"] and "magic" in errors["truncated"]
+    assert datasets.get("truncated") is None
+
+    # not retried until the file changes
+    read = len(reads)
+    datasets.refresh()
+    assert len(reads) == read
+    (dataset_folder / "truncated.parquet").write_bytes(data)
+    assert datasets.get("truncated").num_rows == 1000
+    assert set(datasets.errors()) == {"tiny", "corrupt"}
@@ -0,0 +1,90 @@
+# Third-party libraries
+import pytest
+
+from agent_ui.cell_cache import CellCache, analyze
+from agent_ui.repl_pool import REPLPool
+
+
+@pytest.mark.parametrize("code", [
+    "df.describe()",
+    "print(df.groupby('category')['value'].sum())",
+    "import numpy as np\nprint(np.log1p(df.value).mean())",
+    "df.sample(5, random_state=0)",
+    "import datetime\nprint(datetime.date(2024, 1, 1))",
+])
+def test_pure_cells_are_cacheable(code):
+    assert analyze(code).cacheable({"df"}, set())
+
+
+@pytest.mark.parametrize("code", [
+    "df.to_csv('out.csv')",
+    "import matplotlib.pyplot as plt\ndf.plot()\nplt.savefig('plot.png')",
+    "print(open('notes.txt').read())",
+    "import pandas as pd\nother = pd.read_csv('other.csv')",
+    "import numpy as np\nprint(np.random.rand(3))",
+    "import pandas as pd\nprint(pd.Timestamp.now())",
+    "df.sample(5)",
+    "import os\nprint(os.listdir('.'))",
+    "import requests\nrequests.get('https://example.com')",
+    "from random import random\nprint(random())",
+])
+def test_cells_with_effects_are_not_cacheable(code):
+    cell = analyze(code)
+    assert cell.effects
+    assert not cell.cacheable({"df"}, set())
+
+
+def test_names_read_and_written():
+    cell = analyze("df['total'] = df.value * 2\nsummary = df.total.sum()\nprint(summary)")
+    assert cell.reads == {"df", "print"}
+    assert cell.writes == {"df", "summary"}
+    assert not analyze("df.describe()").cacheable({"df"}, {"df"})     # df was modified by an earlier cell
+
+
+class StubWorker:
+    """Runs nothing: records the cells and fails the ones in `failing`."""
+
+    def __init__(self):
+        self.ran = []
+        self.failing = set()
+
+    def run(self, code, datasets, cpu_limit, timeout):
+        self.ran.append(code)
+        error = "NameError('boom')" if code in self.failing else None
+        return {"stdout": "", "error": error, "image": None, "html": None}
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = REPLPool(warm=0, cache=CellCache())
+    workers = {}
+    monkeypatch.setattr(pool, "worker", lambda session_id: workers.setdefault(session_id, StubWorker()))
+    pool.workers = workers
+    return pool
+
+
+def test_cached_cells_are_replayed_before_the_cells_reading_them(pool):
+    define = "x = sum(range(10))"
+    assert "cached" not in pool.run("a", define)
+    assert pool.run("b", define)["cached"]
+    pool.run("b", "print(x)")
+    assert pool.workers["b"].ran == [define, "print(x)"]
+
+
+def test_replay_errors_are_reported(pool):
+    define = "x = sum(range(10))"
+    pool.run("a", define)
+    pool.run("b", define)
+    pool.workers["b"] = StubWorker()
+    pool.workers["b"].failing.add(define)
+    result = pool.run("b", "print(x)")
+    assert "answered from the cache" in result["error"] and "boom" in result["error"]
+    assert pool.workers["b"].ran == [define]      # the cell reading x was not run
+
+
+def test_side_effects_run_every_time(pool):
+    code = "import pandas as pd\npd.DataFrame({'a': [1]}).to_csv('out.csv')"
+    pool.run("a", code)
+    result = pool.run("a", code)
+    assert "cached" not in result
+    assert pool.workers["a"].ran == [code, code]
@@ -0,0 +1,110 @@
+# Standard library
+import asyncio
+# LangChain and LangGraph
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.prebuilt import create_react_agent
+from langgraph_supervisor import create_supervisor
+
+from agent_ui.catalog import DatasetCatalog
+from agent_ui import chat_stream
+from agent_ui.chat_stream import CoalescedMessage, TurnStream, is_analyst_tool_output, speaker
+from agent_ui.router import with_fast_path
+from agent_ui.state import DatasetState
+from fakes import FakeAnalystModel, FakeSupervisorModel, StubMessage, count_trees
+
+
+def build_graph(folder):
+    analyst = create_react_agent(FakeAnalystModel(), tools=[count_trees], name="analyst_agent",
+                                 state_schema=DatasetState)
+    supervisor = create_supervisor(agents=[analyst], model=FakeSupervisorModel(), state_schema=DatasetState,
+                                   add_handoff_back_messages=True, output_mode="full_history")
+    return with_fast_path(supervisor.compile(name="supervisor"), analyst, DatasetState,
+                          DatasetCatalog(folder)).compile(checkpointer=InMemorySaver())
+
+
+async def render(graph, text: str):
+    """The messages and artifacts one turn shows, as the chainlit app streams it."""
+    messages, artifacts = [], []
+
+    def new_message(author):
+        messages.append(StubMessage(author))
+        return messages[-1]
+
+    async def show_artifacts(tool_message):
+        artifacts.append(tool_message.tool_call_id)
+
+    turn = TurnStream(new_message, show_artifacts)
+    async for namespace, mode, payload in graph.astream({"messages": [HumanMessage(content=text)]},
+                                                        stream_mode=["messages", "custom"], subgraphs=True,
+                                                        config={"configurable": {"thread_id": "t"}}):
+        await turn.feed(namespace, mode, payload)
+    await turn.close()
+    return turn, [(m.author, m.content) for m in messages if m.author != "tool"], artifacts
+
+
+def test_every_route_renders_a_message(dataset_folder):
+    graph = build_graph(dataset_folder)
+
+    turn, messages, artifacts = asyncio.run(render(graph, "hello there"))
+    assert turn.route == "supervisor"
+    assert messages == [("supervisor", "Hello, I coordinate a data analyst.")]
+
+    turn, messages, artifacts = asyncio.run(render(graph, "list the datasets"))
+    assert turn.route == "list_loadable"
+    assert len(messages) == 1 and messages[0][0] == "supervisor" and "sales.parquet" in messages[0][1]
+
+    turn, messages, artifacts = asyncio.run(render(graph, "plot the trees"))
+    assert turn.route == "analyst"
+    assert messages == [("analyst", "There are 3 trees.")]
+    assert len(artifacts) == 1
+
+    # through the supervisor: the analyst works silently, its figure is shown, the supervisor reports
+    turn, messages, artifacts = asyncio.run(render(graph, "I wonder about the trees"))
+    assert turn.route == "supervisor"
+    assert messages == [("supervisor", "The analyst counted 3 trees.")]
+    assert len(artifacts) == 1
+
+
+def test_speaker_from_namespace():
+    assert speaker(("supervisor:1", "supervisor:2"), "agent") == "supervisor"
+    assert speaker(("supervisor:1",), "agent") == "supervisor"        # supervisor graph streamed on its own
+    assert speaker(("supervisor:1", "analyst_agent:2"), "agent") is None
+    assert speaker(("analyst_agent:1",), "agent") == "analyst"
+    assert speaker(("supervisor:1",), "analyst_agent") is None       # handoff back messages
+    assert speaker((), "catalog") == "supervisor"
+    assert is_analyst_tool_output(("supervisor:1", "analyst_agent:2"), "tools")
+    assert is_analyst_tool_output(("analyst_agent:1",), "tools")
+    assert not is_analyst_tool_output(("supervisor:1", "supervisor:2"), "tools")
+
+
+def test_chunks_are_coalesced(monkeypatch):
+    # 3000 chunks of 4 characters over 3.6 s: one send every FLUSH_SECONDS instead of one per chunk
+    now = [1000.0]
+    monkeypatch.setattr(chat_stream.time, "monotonic", lambda: now[0])
+
+    async def stream():
+        message = StubMessage("supervisor")
+        coalesced = CoalescedMessage(message)
+        for i in range(1, 3001):
+            now[0] = 1000 + i * 0.0012
+            await coalesced.push("tok ")
+        await coalesced.close()
+        return message
+
+    message = asyncio.run(stream())
+    assert message.updates == 37
+    assert message.sent and message.content == "tok " * 3000
+
+
+def test_progress_lines_replace_each_other():
+    async def stream():
+        message = StubMessage("tool")
+        progress = CoalescedMessage(message, replace=True)
+        for i in range(100):
+            await progress.push(f"step {i}")
+        await progress.close()
+        return message
+
+    message = asyncio.run(stream())
+    assert message.content == "step 99" and message.updates <= 2 and message.sent
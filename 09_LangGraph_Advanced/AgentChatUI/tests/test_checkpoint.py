@@ -0,0 +1,126 @@
+# Standard library
+import asyncio
+import sqlite3
+from typing import Annotated, List
+from typing_extensions import TypedDict
+# Third-party libraries
+import pytest
+# LangChain and LangGraph
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+from langgraph.types import Command, interrupt
+
+from agent_ui.checkpoint import SqliteCheckpointSaver
+
+
+class State(TypedDict):
+    messages: Annotated[List[AnyMessage], add_messages]
+    approved: bool
+
+
+def build(checkpointer):
+    """A parent graph with a checkpointed subgraph that interrupts for an approval, then answers at length."""
+    def ask(state: State):
+        return {"approved": interrupt("approve?") == "yes"}
+
+    def answer(state: State):
+        text = state["messages"][-1].content
+        return {"messages": [AIMessage(content=f"{'approved' if state['approved'] else 'refused'}: {text} " * 100)]}
+
+    sub = StateGraph(State)
+    sub.add_node("ask", ask)
+    sub.add_node("answer", answer)
+    sub.add_edge(START, "ask")
+    sub.add_edge("ask", "answer")
+    sub.add_edge("answer", END)
+
+    parent = StateGraph(State)
+    parent.add_node("worker", sub.compile(checkpointer=True))
+    parent.add_edge(START, "worker")
+    parent.add_edge("worker", END)
+    return parent.compile(checkpointer=checkpointer)
+
+
+def snapshot(graph, config):
+    """What a frontend sees of a thread, message ids left out (they differ between runs)."""
+    state = graph.get_state(config, subgraphs=True)
+    subgraph = [task.state for task in state.tasks if task.state is not None]
+    return {
+        "messages": [(type(m).__name__, m.content) for m in state.values.get("messages", [])],
+        "approved": state.values.get("approved"),
+        "next": state.next,
+        "interrupts": [i.value for task in state.tasks for i in task.interrupts],
+        "subgraph": [(s.next, [(type(m).__name__, m.content) for m in s.values.get("messages", [])])
+                     for s in subgraph],
+    }
+
+
+def conversation(graph, thread_id="t1"):
+    config = {"configurable": {"thread_id": thread_id}}
+    seen = []
+    graph.invoke({"messages": [HumanMessage(content="first")]}, config)
+    seen.append(snapshot(graph, config))      # interrupted inside the subgraph
+    graph.invoke(Command(resume="yes"), config)
+    seen.append(snapshot(graph, config))
+    graph.invoke({"messages": [HumanMessage(content="second")]}, config)
+    graph.invoke(Command(resume="no"), config)
+    seen.append(snapshot(graph, config))
+    return config, seen
+
+
+@pytest.fixture
+def saver(tmp_path):
+    return SqliteCheckpointSaver(tmp_path / "checkpoints.sqlite", ttl=None, budget=None)
+
+
+def test_round_trip_matches_in_memory_saver(saver):
+    _, expected = conversation(build(InMemorySaver()))
+    assert expected[0]["interrupts"] == ["approve?"] and expected[0]["subgraph"]
+    _, seen = conversation(build(saver))
+    assert seen == expected
+
+    # a new saver on the same file: the conversation survives a restart
+    restarted = build(SqliteCheckpointSaver(saver.path, ttl=None, budget=None))
+    assert snapshot(restarted, {"configurable": {"thread_id": "t1"}}) == expected[-1]
+
+
+def test_prune_keeps_the_latest_state(saver):
+    graph = build(saver)
+    config, seen = conversation(graph)
+    assert len(list(graph.get_state_history(config))) > 1
+    saver.prune(["t1"], strategy="keep_latest")
+    assert len(list(graph.get_state_history(config))) == 1
+    assert snapshot(graph, config) == seen[-1]
+
+    graph.invoke({"messages": [HumanMessage(content="third")]}, config)     # the thread goes on after pruning
+    graph.invoke(Command(resume="yes"), config)
+    assert [content.split(":")[0] for kind, content in snapshot(graph, config)["messages"] if kind == "AIMessage"] \
+        == ["approved", "refused", "approved"]
+
+
+def test_delete_thread(saver):
+    graph = build(saver)
+    config, _ = conversation(graph)
+    conversation(graph, "t2")
+    asyncio.run(saver.adelete_thread("t1"))
+    assert graph.get_state(config).values == {}
+    assert snapshot(graph, {"configurable": {"thread_id": "t2"}})["messages"]
+    assert saver.db.execute("SELECT COUNT(*) FROM threads WHERE thread_id = 't1'").fetchone()[0] == 0
+
+
+def test_failed_delete_is_rolled_back(saver, monkeypatch):
+    graph = build(saver)
+    config, seen = conversation(graph)
+
+    def fail(cur, thread_id):
+        cur.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(saver, "_delete", fail)
+    with pytest.raises(sqlite3.OperationalError):
+        saver.delete_thread("t1")
+    monkeypatch.undo()
+    assert not saver.db.in_transaction
+    assert snapshot(graph, config) == seen[-1]
@@ -0,0 +1,89 @@
+# LangChain and LangGraph
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from agent_ui.compaction import HistoryCompactor
+
+
+def turn(i: int, output_chars: int = 4000):
+    """A user turn where the analyst runs a long cell and gets a long output."""
+    code = f"# cell {i}\n" + "df.groupby('category').value.sum()\n" * 20
+    return [
+        HumanMessage(content=f"question {i}", id=f"{i}-question"),
+        AIMessage(content="", tool_calls=[{"name": "python_repl", "args": {"code": code}, "id": f"call_{i}"}],
+                  id=f"{i}-call"),
+        ToolMessage(content=f"output {i}\n" + "x" * output_chars, name="python_repl", tool_call_id=f"call_{i}",
+                    id=f"{i}-output"),
+        AIMessage(content=f"answer {i}", id=f"{i}-answer"),
+    ]
+
+
+def history(turns: int):
+    return [message for i in range(turns) for message in turn(i)]
+
+
+def test_short_histories_are_untouched():
+    messages = history(2)
+    compacted, before, after = HistoryCompactor(budget=100_000).compact(messages)
+    assert compacted is messages and before == after == count_tokens_approximately(messages)
+
+
+def test_old_outputs_are_collapsed_oldest_first():
+    messages = history(5)
+    total = count_tokens_approximately(messages)
+    compactor = HistoryCompactor(budget=total - 1000, keep_turns=2)
+    compacted, before, after = compactor.compact(messages)
+    assert before == total and after <= compactor.budget
+    assert after == count_tokens_approximately(compacted)
+
+    # the first turn's call and output were enough: the next ones are left alone
+    assert compacted[2].content.startswith("[earlier output of python_repl (call call_0)")
+    assert compacted[2].content.endswith("compacted] output 0")
+    assert compacted[1].tool_calls[0]["args"]["code"].endswith("characters elided>")
+    assert compacted[4:] == messages[4:]
+    # ids and tool call ids stay, so every tool call keeps its output
+    assert [m.id for m in compacted] == [m.id for m in messages]
+    assert compacted[2].tool_call_id == compacted[1].tool_calls[0]["id"] == "call_0"
+    assert messages[2].content.startswith("output 0\nxxx")      # the state's messages are not modified
+
+
+def test_recent_turns_are_kept_even_over_budget():
+    messages = history(3)
+    compacted, _, after = HistoryCompactor(budget=10, keep_turns=2).compact(messages)
+    assert after > 10
+    assert compacted[8:] == messages[8:] and compacted[4:8] == messages[4:8]
+    assert "compacted" in compacted[2].content
+
+
+def test_anthropic_tool_use_blocks_are_elided():
+    code = "print('hello')\n" * 50
+    message = AIMessage(content=[{"type": "text", "text": "Let me run it."},
+                                 {"type": "tool_use", "id": "call_0", "name": "python_repl", "input": {"code": code}}],
+                        tool_calls=[{"name": "python_repl", "args": {"code": code}, "id": "call_0"}])
+    messages = [HumanMessage(content="old"), message,
+                ToolMessage(content="hello\n" * 50, name="python_repl", tool_call_id="call_0"),
+                HumanMessage(content="new")]
+    compacted, _, _ = HistoryCompactor(budget=50, keep_turns=1).compact(messages)
+    assert compacted[1].content[0] == {"type": "text", "text": "Let me run it."}
+    assert compacted[1].content[1]["input"] == {"code": f"<{len(code)} characters elided>"}
+
+
+def test_hook_reports_the_savings():
+    compactor = HistoryCompactor(budget=1000, keep_turns=1)
+    seen = []
+
+    def agent(state: MessagesState):
+        seen.append(compactor.hook("analyst")(state)["llm_input_messages"])
+        return {}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("agent", agent)
+    builder.add_edge(START, "agent")
+    builder.add_edge("agent", END)
+    events = list(builder.compile().stream({"messages": history(4)}, stream_mode="custom"))
+
+    assert len(events) == 1 and events[0]["compaction"]["agent"] == "analyst"
+    saved = events[0]["compaction"]["tokens_before"] - events[0]["compaction"]["tokens_after"]
+    assert saved > 0 and compactor.tokens_saved == saved and compactor.calls == 1
+    assert "compacted" in seen[0][2].content
@@ -0,0 +1,97 @@
+# Standard library
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+# Third-party libraries
+import numpy as np
+import geopandas as gpd
+import pytest
+import shapely
+
+import agent_ui.dataset_cache as dataset_cache_module
+from agent_ui.dataset_cache import GEOMETRY_BYTES, DatasetCache, frame_bytes, geometry_bytes
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """Counts the reads of the cache, each one slow enough for concurrent loads to wait for it."""
+    calls = []
+    read_dataset = dataset_cache_module.read_dataset
+
+    def slow_read(path, **kwargs):
+        calls.append(path)
+        time.sleep(0.2)
+        return read_dataset(path, **kwargs)
+
+    monkeypatch.setattr(dataset_cache_module, "read_dataset", slow_read)
+    return calls
+
+
+def load_concurrently(cache, path, sessions=4, **read):
+    barrier = threading.Barrier(sessions)
+
+    def load(_):
+        barrier.wait()
+        return cache.load(path, **read)
+
+    with ThreadPoolExecutor(sessions) as pool:
+        return list(pool.map(load, range(sessions)))
+
+
+def test_concurrent_loads_read_once(dataset_folder, reads):
+    cache = DatasetCache()
+    frames = load_concurrently(cache, dataset_folder / "sales.parquet")
+    assert len(reads) == 1
+    assert all(len(df) == 1000 for df in frames)
+    assert cache.stats()["entries"] == 1
+    assert not cache.loading
+
+
+def test_waiters_share_a_frame_too_large_to_cache(dataset_folder, reads):
+    cache = DatasetCache(budget=1)
+    frames = load_concurrently(cache, dataset_folder / "sales.parquet")
+    assert len(reads) == 1
+    assert all(len(df) == 1000 for df in frames)
+    assert cache.stats()["entries"] == 0
+    assert not cache.loading
+
+
+def test_failed_read_is_reported_and_forgotten(dataset_folder, reads):
+    cache = DatasetCache()
+    path = dataset_folder / "sales.parquet"
+    with pytest.raises(KeyError):
+        cache.load(path, columns=["missing"])
+    assert not cache.loading
+    assert len(cache.load(path, columns=["value"]).columns) == 1
+
+
+def test_modified_file_is_read_again(dataset_folder):
+    cache = DatasetCache()
+    path = dataset_folder / "sales.parquet"
+    first = cache.load(path, limit=10)
+    first["value"] = 0          # copy-on-write: the cached frame is untouched
+    assert cache.load(path, limit=10)["value"].tolist() == list(range(10))
+    first.iloc[:5].to_parquet(path)
+    assert len(cache.load(path, limit=10)) == 5
+    assert cache.stats()["entries"] == 1       # the old version was dropped
+
+
+def test_copies_are_deep_without_copy_on_write(dataset_folder, monkeypatch):
+    cache = DatasetCache()
+    path = dataset_folder / "sales.parquet"
+    shared = cache.load(path, columns=["value"])
+    assert np.shares_memory(shared["value"].to_numpy(), cache.load(path, columns=["value"])["value"].to_numpy())
+
+    monkeypatch.setattr(dataset_cache_module, "copy_on_write", lambda: False)
+    private = cache.load(path, columns=["value"])
+    assert not np.shares_memory(private["value"].to_numpy(), shared["value"].to_numpy())
+
+
+def test_geometries_are_sized_by_their_coordinates():
+    points = gpd.GeoSeries([shapely.Point(i, i) for i in range(10)])
+    circles = points.buffer(1, quad_segs=64)       # 257 coordinates each
+    assert frame_bytes(gpd.GeoDataFrame(geometry=circles)) - frame_bytes(gpd.GeoDataFrame(geometry=points)) \
+        == 10 * (257 - 1) * 16
+    points_3d = gpd.GeoSeries([shapely.Point(i, i, i) for i in range(10)])
+    assert geometry_bytes(points_3d) - geometry_bytes(points) == 10 * 8
+    assert geometry_bytes(gpd.GeoSeries([None, shapely.Point(0, 0)])) == 2 * 8 + GEOMETRY_BYTES + 16
@@ -0,0 +1,61 @@
+# Standard library
+import json
+import os
+# Third-party libraries
+import pandas as pd
+import pytest
+
+from agent_ui.catalog import DatasetCatalog
+from agent_ui.dataset_cache import DatasetCache
+from agent_ui.handles import DatasetStore, StaleHandleError, merge_handles
+
+
+@pytest.fixture
+def store():
+    return DatasetStore(DatasetCache())
+
+
+def open_sales(store, folder, **read):
+    info = DatasetCatalog(str(folder)).get("sales")
+    return store.open("sales", folder / "sales.parquet", version=info.version, **read)
+
+
+def test_handle_survives_a_checkpoint(store, dataset_folder):
+    handle, df = open_sales(store, dataset_folder, columns=["category", "value"], filters=[("value", "<", 10)])
+    assert handle["shape"] == (10, 2)
+    restored = json.loads(json.dumps(handle))       # what a checkpointer gives back
+    pd.testing.assert_frame_equal(store.resolve(restored), df)
+    assert store.key(restored) == store.key(handle)
+
+
+def test_touched_file_keeps_its_handles(store, dataset_folder):
+    handle, df = open_sales(store, dataset_folder)
+    path = dataset_folder / "sales.parquet"
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10 ** 9))
+    pd.testing.assert_frame_equal(store.resolve(handle), df)
+
+
+def test_rewritten_file_makes_handles_stale(store, dataset_folder):
+    handle, _ = open_sales(store, dataset_folder)
+    pd.DataFrame({"category": ["z"], "value": [1], "amount": [0.5]}).to_parquet(dataset_folder / "sales.parquet")
+    with pytest.raises(StaleHandleError, match="load it again"):
+        store.resolve(handle)
+
+    reloaded, df = open_sales(store, dataset_folder)
+    assert reloaded["shape"] == (1, 3)
+    pd.testing.assert_frame_equal(store.resolve(reloaded), df)
+
+
+def test_handles_without_version_resolve_the_current_file(store, dataset_folder):
+    handle, _ = store.open("sales", dataset_folder / "sales.parquet")
+    pd.DataFrame({"category": ["z"], "value": [1], "amount": [0.5]}).to_parquet(dataset_folder / "sales.parquet")
+    assert len(store.resolve(handle)) == 1
+
+
+def test_merge_handles(store, dataset_folder):
+    sales, _ = open_sales(store, dataset_folder)
+    trees, _ = store.open("trees", dataset_folder / "trees.parquet")
+    merged = merge_handles({"sales": sales}, {"trees": trees})
+    assert set(merged) == {"sales", "trees"}
+    assert merge_handles(merged, {"sales": None}) == {"trees": trees}
+    assert trees["kind"] == "GeoDataFrame"
@@ -0,0 +1,75 @@
+# Third-party libraries
+import pytest
+# LangChain
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from agent_ui.llm_cache import CachedEmbeddings, LLMCacheMiss, SQLiteLLMCache
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+    texts: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        return super().embed_documents(texts)
+
+
+def test_embeddings_are_recorded_and_replayed(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    client = CountingEmbeddings(size=8)
+    recorder = CachedEmbeddings(client, SQLiteLLMCache(path, mode="record"), "fake-embed")
+    first = recorder.embed_documents(["a", "b"])
+    assert recorder.embed_documents(["b", "a", "c"])[:2] == [first[1], first[0]]
+    assert client.texts == 3                # only "c" was embedded by the second call
+
+    replayer = CachedEmbeddings(CountingEmbeddings(size=8), SQLiteLLMCache(path, mode="replay"), "fake-embed")
+    assert replayer.embed_query("a") == pytest.approx(first[0])
+    assert replayer.embeddings.calls == 0
+    with pytest.raises(LLMCacheMiss):
+        replayer.embed_query("never embedded")
+    assert replayer.embeddings.calls == 0
+
+
+def test_chat_model_replays_from_the_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    recorder = GenericFakeChatModel(messages=iter([AIMessage(content="recorded answer")]),
+                                    cache=SQLiteLLMCache(path, mode="record"))
+    assert recorder.invoke("question").content == "recorded answer"
+
+    # the fake would fail on a second provider call: the answer must come from the cache
+    replayer = GenericFakeChatModel(messages=iter([]), cache=SQLiteLLMCache(path, mode="replay"))
+    assert replayer.invoke("question").content == "recorded answer"
+    with pytest.raises(LLMCacheMiss):
+        replayer.invoke("another question")
+
+
+def conversation(model):
+    """Two model calls in a row, the second one seeing the first answer (as in an agent loop)."""
+    def call(state: MessagesState):
+        return {"messages": [model.invoke(state["messages"])]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("first", call)
+    builder.add_node("second", call)
+    builder.add_edge(START, "first")
+    builder.add_edge("first", "second")
+    builder.add_edge("second", END)
+    return builder.compile()
+
+
+def test_multi_call_graph_replays_from_the_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    recorder = GenericFakeChatModel(messages=iter([AIMessage(content="one"), AIMessage(content="two")]),
+                                    cache=SQLiteLLMCache(path, mode="record"))
+    recorded = conversation(recorder).invoke({"messages": [("user", "hi")]})
+
+    # the first answer now comes from the cache, with its own usage and id: the second call must still hit
+    replayer = GenericFakeChatModel(messages=iter([]), cache=SQLiteLLMCache(path, mode="replay"))
+    replayed = conversation(replayer).invoke({"messages": [("user", "hi")]})
+    assert [m.content for m in replayed["messages"]] == [m.content for m in recorded["messages"]]
+    assert [m.content for m in replayed["messages"]] == ["hi", "one", "two"]
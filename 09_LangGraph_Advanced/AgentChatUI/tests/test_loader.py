@@ -0,0 +1,57 @@
+# Third-party libraries
+import pandas as pd
+import geopandas as gpd
+import pytest
+
+from agent_ui.loader import decode_geometries, describe_read, frame_to_table, geo_metadata, read_dataset
+
+
+def test_projection_and_filters(dataset_folder):
+    path = dataset_folder / "sales.parquet"
+    df = read_dataset(path, columns=["value", "category", "value"], filters=[("value", ">=", 990)])
+    assert list(df.columns) == ["value", "category"]
+    assert df["value"].tolist() == list(range(990, 1000))
+
+    # a list of lists is an OR of ANDs
+    df = read_dataset(path, filters=[[("value", "<", 2)], [("value", ">", 997), ("category", "==", "c")]])
+    assert sorted(df["value"]) == [0, 1, 998]
+
+
+def test_limit_stops_the_scan(dataset_folder):
+    df = read_dataset(dataset_folder / "sales.parquet", filters=[("category", "==", "c")], limit=5)
+    assert df["value"].tolist() == [2, 6, 10, 14, 18]
+
+
+def test_missing_columns_are_reported(dataset_folder):
+    with pytest.raises(KeyError, match="Available columns"):
+        read_dataset(dataset_folder / "sales.parquet", columns=["value", "price"])
+
+
+def test_spatial_datasets_stay_spatial(dataset_folder):
+    gdf = read_dataset(dataset_folder / "trees.parquet", columns=["species"], filters=[("species", "==", "oak")],
+                       limit=10)
+    assert isinstance(gdf, gpd.GeoDataFrame)
+    assert list(gdf.columns) == ["species", "geometry"]
+    assert len(gdf) == 10 and gdf.crs.to_epsg() == 4326
+    assert gdf.geometry.geom_type.eq("Point").all()
+
+
+def test_frame_to_table_round_trip(dataset_folder):
+    gdf = read_dataset(dataset_folder / "quarters.parquet")
+    table = frame_to_table(gdf)
+    geo = geo_metadata(table.schema)
+    assert geo["primary_column"] == "geometry"
+
+    decoded = decode_geometries(table.to_pandas(), geo)
+    assert decoded.crs == gdf.crs
+    assert decoded.geometry.geom_equals(gdf.geometry).all()
+    pd.testing.assert_frame_equal(pd.DataFrame(decoded.drop(columns="geometry")),
+                                  pd.DataFrame(gdf.drop(columns="geometry")))
+
+    plain = pd.DataFrame({"a": [1, 2]})
+    assert geo_metadata(frame_to_table(plain).schema) is None
+
+
+def test_describe_read():
+    assert describe_read(None, None, None) == ""
+    assert describe_read(["a"], [("a", ">", 1)], 5) == " (columns ['a'], filtered by [('a', '>', 1)], first 5 rows)"
@@ -0,0 +1,47 @@
+# Standard library
+import json
+# Third-party libraries
+import folium
+import pytest
+import shapely
+from shapely.geometry import Point, mapping
+
+from agent_ui import repl_worker
+from agent_ui.maps import export_map
+
+
+def circle():
+    """A detailed polygon (1025 vertices) around Bologna, as a JSON round trip gives it."""
+    return json.loads(json.dumps(mapping(Point(11.34, 44.49).buffer(0.01, quad_segs=256))))
+
+
+def vertices(geometry: dict) -> int:
+    return shapely.get_num_coordinates(shapely.from_geojson(json.dumps(geometry)))
+
+
+@pytest.mark.parametrize("wrap", [
+    lambda geometry: {"type": "FeatureCollection",
+                      "features": [{"type": "Feature", "properties": {}, "geometry": geometry}]},
+    lambda geometry: {"type": "Feature", "properties": {}, "geometry": geometry},
+    lambda geometry: geometry,
+], ids=["collection", "feature", "geometry"])
+def test_layers_are_compacted_whatever_their_geojson_type(wrap):
+    m = folium.Map(location=[44.49, 11.34], zoom_start=12)
+    layer = folium.GeoJson(wrap(circle())).add_to(m)
+    export_map(m)
+
+    data = layer.data
+    geometry = {"FeatureCollection": lambda: data["features"][0]["geometry"],
+                "Feature": lambda: data["geometry"]}.get(data["type"], lambda: data)()
+    assert geometry["type"] == "Polygon"
+    assert vertices(geometry) < vertices(circle()) / 4
+    assert all(len(str(c).split(".")[-1]) <= 6 for c in geometry["coordinates"][0][0])
+
+
+def test_map_export_runs_under_the_cpu_limit(monkeypatch):
+    calls = []
+    monkeypatch.setattr(repl_worker, "limit_cpu", lambda seconds: calls.append(("limit", seconds)))
+    monkeypatch.setattr(repl_worker, "export_map", lambda m: calls.append(("export",)) or "<html>")
+    result = repl_worker.Session().run("import folium\nm = folium.Map()", cpu_limit=5)
+    assert result["html"] == "<html>"
+    assert calls == [("limit", 5), ("export",), ("limit", None)]
@@ -0,0 +1,88 @@
+# Standard library
+import os
+# Third-party libraries
+import pytest
+
+from agent_ui.dataset_cache import DatasetCache
+from agent_ui.handles import DatasetStore
+from agent_ui.repl_pool import REPLPool
+
+
+class StubWorker:
+    """Runs nothing: records the datasets each cell was given."""
+
+    def __init__(self):
+        self.datasets = []
+
+    def run(self, code, datasets, cpu_limit, timeout):
+        self.datasets.append(datasets)
+        return {"stdout": "", "error": None, "image": None, "html": None}
+
+
+def make_pool(monkeypatch, budget):
+    pool = REPLPool(warm=0, cache=None, store=DatasetStore(DatasetCache(budget=budget)))
+    workers = {}
+    monkeypatch.setattr(pool, "worker", lambda session_id: workers.setdefault(session_id, StubWorker()))
+    return pool
+
+
+@pytest.fixture
+def sales(dataset_folder):
+    store = DatasetStore(DatasetCache())
+
+    def handle(low):
+        return store.open("sales", dataset_folder / "sales.parquet", filters=[("value", ">=", low)])[0]
+    return handle
+
+
+def exported_bytes(pool):
+    return sum(os.path.getsize(path) for path in pool.exported)
+
+
+def test_unused_exports_are_removed_over_budget(monkeypatch, sales):
+    pool = make_pool(monkeypatch, budget=1)     # everything is over budget
+    try:
+        files = []
+        for low in (0, 100, 200):
+            pool.run("a", "sales.shape", {"sales": sales(low)})
+            files.append(next(iter(pool.exported)))
+        assert len(pool.exported) == 1
+        assert not os.path.exists(files[0]) and not os.path.exists(files[1])
+        assert pool.store.cache.bytes_external == exported_bytes(pool)
+
+        pool.run("b", "sales.shape", {"sales": sales(500)})
+        assert len(pool.exported) == 2          # both held by a session: kept over budget
+
+        pool.release("a")
+        assert set(pool.exported) == pool.held["b"] and os.path.exists(next(iter(pool.exported)))
+        assert pool.store.cache.bytes_external == exported_bytes(pool)
+    finally:
+        pool.shutdown()
+    assert pool.store.cache.bytes_external == 0
+
+
+def test_unused_exports_are_kept_within_budget(monkeypatch, sales):
+    pool = make_pool(monkeypatch, budget=10 ** 9)
+    try:
+        pool.run("a", "sales.shape", {"sales": sales(0)})
+        first = next(iter(pool.exported))
+        pool.run("a", "sales.shape", {"sales": sales(100)})
+        pool.run("a", "sales.shape", {"sales": sales(0)})     # mapped again, not written again
+        assert len(pool.exported) == 2 and list(pool.exported)[-1] == first
+        assert pool.store.cache.stats()["bytes_external"] == exported_bytes(pool)
+    finally:
+        pool.shutdown()
+
+
+def test_exports_evict_cached_frames(monkeypatch, sales):
+    pool = make_pool(monkeypatch, budget=10 ** 9)
+    cache = pool.store.cache
+    try:
+        pool.store.resolve(sales(0))
+        assert cache.bytes_resident > 0
+        cache.budget = cache.bytes_resident + 1
+        pool.run("a", "sales.shape", {"sales": sales(0)})
+        assert cache.bytes_resident == 0        # the frame made room for the export the session holds
+        assert cache.bytes_external == exported_bytes(pool)
+    finally:
+        pool.shutdown()
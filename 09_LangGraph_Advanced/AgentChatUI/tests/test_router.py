@@ -0,0 +1,74 @@
+# Third-party libraries
+import pytest
+
+from agent_ui.router import ANALYST, LIST_LOADABLE, LIST_LOADED, SUPERVISOR, PreRouter
+
+
+@pytest.fixture
+def router():
+    return PreRouter(dataset_names=lambda: ["trees", "quarters", "sales"])
+
+
+@pytest.mark.parametrize("text, target", [
+    ("list the datasets", LIST_LOADABLE),
+    ("What datasets are available?", LIST_LOADABLE),
+    ("show me the files", LIST_LOADABLE),
+    ("which datasets are loaded?", LIST_LOADED),
+    ("what is loaded", LIST_LOADED),
+    ("what datasets can I load?", LIST_LOADABLE),
+    ("what data do you have", LIST_LOADABLE),
+    ("load the dataset", ANALYST),
+    ("describe the columns", ANALYST),
+    ("count the rows of sales", ANALYST),
+    ("plot the trees", ANALYST),                            # a dataset of the catalog
+    ("plot the number of trees per quarter", ANALYST),
+    ("list the datasets and plot the biggest one", ANALYST),
+    ("compute the average amount by category", ANALYST),  # classifier
+])
+def test_unambiguous_requests_skip_the_supervisor(router, text, target):
+    assert router.classify(text).target == target
+
+
+@pytest.mark.parametrize("text", [
+    "hi!",
+    "hello there",
+    "thanks a lot",
+    "what can you do with the data?",
+    "what data do you have about parks?",   # more than a listing
+    "can you explain why the map is empty?",
+    # analysis verbs that do not apply to data
+    "describe yourself",
+    "please describe how you work",
+    "count me in",
+    "map out what you can do for me",
+    "load",
+    "Map the hospitals please",             # not a dataset of the catalog: the supervisor decides
+    "",
+])
+def test_ambiguous_requests_go_to_the_supervisor(router, text):
+    assert router.classify(text).target == SUPERVISOR
+
+
+@pytest.mark.parametrize("text", [
+    "what is the average price in the data we have",
+    "what is the mean population in the dataset I loaded",
+    "list the columns of the trees file",
+    "show me the rows of the trees datasets",
+    "which files have a population column",
+])
+def test_questions_about_the_data_are_not_listings(router, text):
+    assert router.classify(text).target not in (LIST_LOADABLE, LIST_LOADED)
+
+
+def test_verbs_without_an_object_never_match_a_rule(router):
+    for text in ("describe yourself", "count me in", "load"):
+        assert router.classify(text).reason != "rule"
+
+
+def test_hops_saved_are_counted(router):
+    router.route("list the datasets")     # catalog answer: 4 calls saved
+    router.route("plot the trees")        # direct analyst: 2
+    router.route("hello there")           # supervisor: 0
+    assert router.hops_saved == 6
+    assert router.routes == {LIST_LOADABLE: 1, ANALYST: 1, SUPERVISOR: 1}
+    assert router.stats() == "3 messages routed (analyst=1, list_loadable=1, supervisor=1), 6 LLM calls saved"
@@ -0,0 +1,82 @@
+# Standard library
+import asyncio
+import time
+# Third-party libraries
+import pytest
+# LangChain
+from langchain_core.caches import InMemoryCache
+from langchain_core.embeddings import FakeEmbeddings
+
+from agent_ui.fake_provider import FakeProvider, FakeProviderChatModel
+from agent_ui.scheduler import LLMScheduler
+
+
+@pytest.fixture
+def scheduler():
+    return LLMScheduler(limits={"fake": {"rpm": 1000, "tpm": 100_000}, "fake-embed": {"rpm": 1000, "tpm": 100_000}})
+
+
+def test_cache_hits_are_not_counted(scheduler):
+    provider = FakeProvider(rpm=1000, tpm=100_000)
+    model = FakeProviderChatModel(provider=provider, tokens_per_call=600, cache=InMemoryCache(),
+                                  **scheduler.client_kwargs("fake"))
+    for _ in range(5):
+        model.invoke("the same question")
+
+    lane = scheduler.lane("fake")
+    assert provider.served == 1
+    assert scheduler.metrics()["fake"]["tokens_used"] == 600
+    assert scheduler.metrics()["fake"]["lanes"]["interactive"]["granted"] == 1
+    assert not lane.reservations
+
+
+def test_usage_is_settled_against_the_call_reservation():
+    # a very long period: the buckets don't refill noticeably during the test
+    scheduler = LLMScheduler(limits={"fake": {"rpm": 1000, "tpm": 100_000}}, period=1e6)
+    provider = FakeProvider(rpm=1000, tpm=100_000)
+    model = FakeProviderChatModel(provider=provider, tokens_per_call=600, **scheduler.client_kwargs("fake"))
+    lane = scheduler.lane("fake")
+    model.invoke("first")                   # nothing reserved yet: the whole usage is debited on settlement
+    level = lane.tokens.level
+    model.invoke("second")                  # reserves the 600 average, settles 600: no extra debit
+    assert lane.tokens.level == pytest.approx(level - 600, abs=1)
+    assert scheduler.metrics()["fake"]["tokens_used"] == 1200
+    assert not lane.reservations
+
+
+def test_async_calls_are_settled(scheduler):
+    provider = FakeProvider(rpm=1000, tpm=100_000)
+    model = FakeProviderChatModel(provider=provider, tokens_per_call=100, cache=InMemoryCache(),
+                                  **scheduler.client_kwargs("fake"))
+
+    async def run():
+        await asyncio.gather(*(model.ainvoke(f"question {i}") for i in range(4)))
+        await model.ainvoke("question 0")   # cache hit
+
+    asyncio.run(run())
+    assert provider.served == 4
+    assert scheduler.metrics()["fake"]["tokens_used"] == 400
+    assert not scheduler.lane("fake").reservations
+
+
+def test_embeddings_usage_is_recorded(scheduler):
+    embeddings = scheduler.embeddings(FakeEmbeddings(size=8), "fake-embed")
+    embeddings.embed_documents(["a" * 40, "b" * 40])
+    embeddings.embed_query("c" * 40)
+    assert scheduler.metrics()["fake-embed"]["tokens_used"] == 21 + 11
+
+
+@pytest.mark.parametrize("rpm", [1, 0.5, 5])
+def test_small_limits_refill(rpm):
+    scheduler = LLMScheduler(limits={"fake": {"rpm": rpm, "tpm": 100_000}}, period=0.2)
+    start = time.monotonic()
+    for _ in range(3):
+        scheduler.acquire("fake")
+    # the first request uses the burst, the next ones wait for the refill: about one period / rpm each
+    assert 0.3 / rpm <= time.monotonic() - start < 2 / rpm
+    assert scheduler.metrics()["fake"]["lanes"]["interactive"]["granted"] == 3
+
+
+def test_invalid_limits_are_refused():
+    with pytest.raises(ValueError, match="Invalid rate limit"):
+        LLMScheduler(limits={"fake": {"rpm": 0, "tpm": 100}}).lane("fake")
@@ -0,0 +1,92 @@
+# Third-party libraries
+import numpy as np
+import geopandas as gpd
+import pytest
+import shapely
+
+from agent_ui.dataset_cache import DatasetCache
+from agent_ui.handles import DatasetStore
+from agent_ui.spatial import (METRIC_CRS, SpatialIndex, count_within, features_table, get_spatial_index,
+                              resolve_target)
+
+
+@pytest.fixture
+def store():
+    return DatasetStore(DatasetCache())
+
+
+@pytest.fixture
+def loaded(store, dataset_folder):
+    return {name: store.open(name, dataset_folder / f"{name}.parquet")[0] for name in ("trees", "quarters", "sales")}
+
+
+def brute_force(index: SpatialIndex, target) -> np.ndarray:
+    return shapely.distance(index.geoms, target)
+
+
+def test_nearest_matches_brute_force(loaded, store):
+    trees = get_spatial_index(loaded["trees"], store)
+    target = resolve_target(loaded, lon=11.33, lat=44.51)
+    distances = brute_force(trees, target)
+    for k in (1, 5, 200, 500):
+        positions, found = trees.nearest(target, k)
+        assert len(positions) == min(k, len(trees))
+        assert found == pytest.approx(np.sort(distances)[:k])
+        assert found == pytest.approx(distances[positions])
+
+    far = resolve_target(loaded, lon=12.5, lat=45.5)      # well outside the data: the radius has to grow
+    positions, found = trees.nearest(far, 3)
+    assert found == pytest.approx(np.sort(brute_force(trees, far))[:3])
+
+
+def test_within_distance(loaded, store):
+    trees = get_spatial_index(loaded["trees"], store)
+    target = resolve_target(loaded, lon=11.35, lat=44.50)
+    positions, distances = trees.within_distance(target, 1000)
+    assert set(positions) == set(np.flatnonzero(brute_force(trees, target) <= 1000))
+    assert (np.diff(distances) >= 0).all()
+
+    table = features_table(trees, positions, distances)
+    assert list(table.columns) == ["tree_id", "species", "distance_m"]
+    assert table["tree_id"].tolist() == trees.frame["tree_id"].iloc[positions].tolist()
+
+
+def test_count_within_matches_a_spatial_join(loaded, store):
+    trees = get_spatial_index(loaded["trees"], store)
+    quarters = get_spatial_index(loaded["quarters"], store)
+    table = count_within(trees, quarters, "quarter")
+    joined = gpd.sjoin(trees.frame, quarters.frame, predicate="within")
+    assert dict(zip(table["quarter"], table["count"])) == joined["quarter"].value_counts().to_dict()
+    assert table["count"].sum() == len(trees)
+    assert table["count"].is_monotonic_decreasing
+
+    half = SpatialIndex(quarters.frame[quarters.frame["quarter"].isin(["sw", "nw"])])
+    table = count_within(trees, half, "quarter")
+    inside = (trees.frame.geometry.x < 11.35).sum()
+    assert table.set_index("quarter")["count"]["(outside every polygon)"] == len(trees) - inside
+
+
+def test_indexes_are_built_once(loaded, store):
+    assert get_spatial_index(loaded["trees"], store) is get_spatial_index(dict(loaded["trees"]), store)
+    assert get_spatial_index(loaded["trees"], store).geoms[0].distance(shapely.Point(0, 0)) > 1e6   # meters
+    with pytest.raises(ValueError, match="no geometries"):
+        get_spatial_index(loaded["sales"], store)
+
+
+def test_target_from_a_dataset(loaded):
+    target = resolve_target(loaded, target_dataset="quarters", target_column="quarter", target_value="ne")
+    expected = gpd.GeoSeries([shapely.box(11.35, 44.50, 11.40, 44.55)], crs="EPSG:4326").to_crs(METRIC_CRS).iloc[0]
+    assert target.symmetric_difference(expected).area < 1e-3 * expected.area
+
+    with pytest.raises(ValueError, match="fuzzy_match_name"):
+        resolve_target(loaded, target_dataset="quarters", target_column="quarter", target_value="center")
+    with pytest.raises(ValueError, match="is not loaded"):
+        resolve_target(loaded, target_dataset="parks", target_column="name", target_value="x")
+    with pytest.raises(ValueError, match="Give either"):
+        resolve_target(loaded, lon=11.3)
+
+
+def test_datasets_without_crs_are_refused():
+    gdf = gpd.GeoDataFrame({"a": [1]}, geometry=[shapely.Point(0, 0)])
+    with pytest.raises(ValueError, match="no CRS"):
+        SpatialIndex(gdf)
@@ -0,0 +1,60 @@
+# Standard library
+from concurrent.futures import ThreadPoolExecutor
+# Third-party libraries
+import pytest
+
+from agent_ui.catalog import DatasetCatalog
+from agent_ui.sql import SQLEngine, format_result
+
+
+@pytest.fixture
+def engine(dataset_folder):
+    return SQLEngine(DatasetCatalog(str(dataset_folder)))
+
+
+def test_files_are_views(engine):
+    df, truncated = engine.query("SELECT category, count(*) AS n FROM sales GROUP BY category ORDER BY category")
+    assert df.to_dict("list") == {"category": ["a", "b", "c", "d"], "n": [250, 250, 250, 250]}
+    assert not truncated
+    assert "geometry" not in engine.query("SELECT * FROM trees")[0].columns
+
+
+def test_results_are_capped(engine):
+    df, truncated = engine.query("SELECT * FROM sales", max_rows=10)
+    assert len(df) == 10 and truncated
+    assert "truncated to the first 10 rows" in format_result(df, truncated)
+
+
+@pytest.mark.parametrize("sql", [
+    "DROP VIEW sales",
+    "SELECT 1; SELECT 2",
+    "COPY (SELECT * FROM sales) TO 'out.csv'",
+])
+def test_only_single_selects(engine, sql):
+    with pytest.raises(ValueError, match="single SELECT"):
+        engine.query(sql)
+
+
+def test_files_outside_the_folder_are_not_readable(engine, tmp_path_factory):
+    outside = tmp_path_factory.mktemp("outside") / "secret.csv"
+    outside.write_text("a\n1\n")
+    with pytest.raises(Exception):
+        engine.query(f"SELECT * FROM read_csv('{outside}')")
+
+
+def test_tables_do_not_touch_the_catalog(engine, monkeypatch):
+    engine.query("SELECT 1")
+
+    def unreachable():
+        raise OSError("folder unreachable")
+
+    monkeypatch.setattr(engine.catalog, "list", unreachable)
+    assert engine.tables().splitlines() == [
+        "- quarters(quarter)", "- sales(category, value, amount)", "- trees(tree_id, species)"]
+
+
+def test_parallel_queries(engine):
+    queries = [f"SELECT sum(value) AS s FROM sales WHERE value < {i}" for i in range(1, 41)]
+    with ThreadPoolExecutor(8) as pool:
+        sums = list(pool.map(lambda q: int(engine.query(q)[0]["s"][0]), queries))
+    assert sums == [i * (i - 1) // 2 for i in range(1, 41)]
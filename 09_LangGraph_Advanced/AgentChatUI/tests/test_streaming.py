@@ -0,0 +1,68 @@
+# Third-party libraries
+import pandas as pd
+import pytest
+
+from agent_ui.streaming import aggregate, iter_batches, stream_progress, top_k
+
+
+@pytest.fixture
+def sales(dataset_folder):
+    return dataset_folder / "sales.parquet"
+
+
+def test_group_by_matches_pandas(sales):
+    # one batch per row group: the partials of the 4 row groups are merged
+    result = aggregate(sales, [("*", "count"), ("amount", "mean"), ("value", "sum"), ("value", "max")],
+                       group_by=["category"]).to_pandas()
+    df = pd.read_parquet(sales)
+    expected = df.groupby("category").agg(count=("value", "size"), mean_amount=("amount", "mean"),
+                                          sum_value=("value", "sum"), max_value=("value", "max")).reset_index()
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_filtered_count_reads_only_the_matching_row_groups(sales):
+    calls = []
+    result = aggregate(sales, [("*", "count"), ("value", "min")], filters=[("value", "<", 100)],
+                       progress=lambda done, total, rows: calls.append((done, total, rows)))
+    assert result.to_pylist() == [{"count": 100, "min_value": 0}]
+    assert calls == [(1, 1, 100)]       # the 3 other row groups are skipped by their statistics
+
+
+def test_nothing_matches(sales):
+    assert aggregate(sales, [("*", "count")], filters=[("value", "<", 0)]).to_pylist() == [{"count": 0}]
+    assert aggregate(sales, [("value", "sum")], group_by=["category"], filters=[("value", "<", 0)]).num_rows == 0
+
+
+def test_unknown_aggregation(sales):
+    with pytest.raises(ValueError, match="Unknown aggregation"):
+        aggregate(sales, [("value", "median")])
+    with pytest.raises(ValueError, match="can only be counted"):
+        aggregate(sales, [("*", "sum")])
+
+
+def test_top_k_matches_pandas(sales):
+    # amounts are rounded: ties are compared in value order
+    result = top_k(sales, "amount", k=7, columns=["value"]).to_pandas()
+    expected = pd.read_parquet(sales).nlargest(7, "amount", keep="all")[["value", "amount"]]
+    assert len(expected) == 7
+    pd.testing.assert_frame_equal(result.sort_values(["amount", "value"]).reset_index(drop=True),
+                                  expected.sort_values(["amount", "value"]).reset_index(drop=True))
+
+    smallest = top_k(sales, "value", k=3, descending=False, filters=[("category", "==", "d")])
+    assert smallest.column("value").to_pylist() == [3, 7, 11]
+
+
+def test_top_k_leaves_geometries_out(dataset_folder):
+    result = top_k(dataset_folder / "trees.parquet", "tree_id", k=2)
+    assert result.column_names == ["tree_id", "species"]
+    assert result.column("tree_id").to_pylist() == [199, 198]
+
+
+def test_batches_stay_bounded(sales):
+    batches = list(iter_batches(sales, columns=["value"], batch_size=100))
+    assert max(batch.num_rows for batch in batches) <= 100
+    assert sum(batch.num_rows for batch in batches) == 1000
+
+
+def test_progress_is_silent_outside_a_graph_run():
+    assert stream_progress("scan") is None
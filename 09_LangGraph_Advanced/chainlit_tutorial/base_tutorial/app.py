@@ -1,9 +1,6 @@
 # ------------------ app.py ------------------------
 
-from typing import Literal
-from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
-from langgraph.prebuilt import ToolNode
 from langchain.schema.runnable.config import RunnableConfig
 from langchain_core.messages import HumanMessage
 
@@ -13,6 +10,9 @@ import chainlit as cl
 import getpass
 import os
 from dotenv import load_dotenv
+from agent_ui.llm_cache import enable_llm_cache
+from agent_ui.scheduler import scheduler
+from graph import build_graph
 
 env_path = "../.env"
 load_dotenv(dotenv_path=env_path)
@@ -25,85 +25,13 @@ _set_if_undefined("OPENAI_API_KEY")
 _set_if_undefined("LANGSMITH_API_KEY")
 _set_if_undefined("LANGSMITH_TRACING")
 
-# example tool
-@tool
-def get_weather(city: Literal["nyc", "sf"]):
-    """Use this to get weather information."""
-    if city == "nyc":
-        return "It might be cloudy in nyc"
-    elif city == "sf":
-        return "It's always sunny in sf"
-    else:
-        raise AssertionError("Unknown city")
+enable_llm_cache()   # set LLM_CACHE_MODE=record|replay to record/replay LLM responses
 
+model = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0, **scheduler.client_kwargs("gpt-3.5-turbo"))
+final_model = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0, **scheduler.client_kwargs("gpt-3.5-turbo"))
 
-tools = [get_weather]
-model = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0)
-final_model = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0)
-
-model = model.bind_tools(tools)
-# NOTE: this is where we're adding a tag that we'll can use later to filter the model stream events to only the model called in the final node.
-# This is not necessary if you call a single LLM but might be important in case you call multiple models within the node and want to filter events
-# from only one of them.
-final_model = final_model.with_config(tags=["final_node"])
-tool_node = ToolNode(tools=tools)
-
-from typing import Annotated
-from typing_extensions import TypedDict
-
-from langgraph.graph import END, StateGraph, START
-from langgraph.graph.message import MessagesState
-from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
-
-
-def should_continue(state: MessagesState) -> Literal["tools", "final"]:
-    messages = state["messages"]
-    last_message = messages[-1]
-    # If the LLM makes a tool call, then we route to the "tools" node
-    if last_message.tool_calls:
-        return "tools"
-    # Otherwise, we stop (reply to the user)
-    return "final"
-
-
-def call_model(state: MessagesState):
-    messages = state["messages"]
-    response = model.invoke(messages)
-    # We return a list, because this will get added to the existing list
-    return {"messages": [response]}
-
-
-def call_final_model(state: MessagesState):
-    messages = state["messages"]
-    last_ai_message = messages[-1]
-    response = final_model.invoke(
-        [
-            SystemMessage("Rewrite this in the voice of Al Roker"),
-            HumanMessage(last_ai_message.content),
-        ]
-    )
-    # overwrite the last AI message from the agent
-    response.id = last_ai_message.id
-    return {"messages": [response]}
-
-
-builder = StateGraph(MessagesState)
-
-builder.add_node("agent", call_model)
-builder.add_node("tools", tool_node)
-# add a separate final node
-builder.add_node("final", call_final_model)
-
-builder.add_edge(START, "agent")
-builder.add_conditional_edges(
-    "agent",
-    should_continue,
-)
-
-builder.add_edge("tools", "agent")
-builder.add_edge("final", END)
-
-graph = builder.compile()
+# async nodes (ainvoke) and tools: see graph.py
+graph = build_graph(model, final_model)
 
 @cl.on_message
 async def on_message(msg: cl.Message):
@@ -111,7 +39,8 @@ async def on_message(msg: cl.Message):
     cb = cl.LangchainCallbackHandler()
     final_answer = cl.Message(content="")
     
-    for msg, metadata in graph.stream({"messages": [HumanMessage(content=msg.content)]}, stream_mode="messages", config=RunnableConfig(callbacks=[cb], **config)):
+    # astream: while this session waits on the model, the event loop serves the other sessions
+    async for msg, metadata in graph.astream({"messages": [HumanMessage(content=msg.content)]}, stream_mode="messages", config=RunnableConfig(callbacks=[cb], **config)):
         if (
             msg.content
             and not isinstance(msg, HumanMessage)
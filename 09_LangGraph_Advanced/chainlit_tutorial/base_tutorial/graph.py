@@ -0,0 +1,86 @@
+# ------------------ graph.py ------------------------
+# The tutorial graph, fully async: nodes await the models and tools, so a chat session waiting on the LLM
+# never blocks the chainlit event loop for the other sessions. Models are passed in, so the same graph
+# runs with ChatOpenAI in app.py and with a fake model in load_test.py.
+
+from typing import Literal
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import SystemMessage, HumanMessage
+from langgraph.graph import END, StateGraph, START
+from langgraph.graph.message import MessagesState
+from langgraph.prebuilt import ToolNode
+
+# tool result cache (agent_ui)
+from agent_ui.tool_cache import cached_tool
+
+
+# example tool (deterministic, so its results are memoized)
+@cached_tool
+async def get_weather(city: Literal["nyc", "sf"]):
+    """Use this to get weather information."""
+    if city == "nyc":
+        return "It might be cloudy in nyc"
+    elif city == "sf":
+        return "It's always sunny in sf"
+    else:
+        raise AssertionError("Unknown city")
+
+
+tools = [get_weather]
+
+
+def should_continue(state: MessagesState) -> Literal["tools", "final"]:
+    messages = state["messages"]
+    last_message = messages[-1]
+    # If the LLM makes a tool call, then we route to the "tools" node
+    if last_message.tool_calls:
+        return "tools"
+    # Otherwise, we stop (reply to the user)
+    return "final"
+
+
+def build_graph(model: BaseChatModel, final_model: BaseChatModel):
+    model = model.bind_tools(tools)
+    # NOTE: this is where we're adding a tag that we'll can use later to filter the model stream events to only the model called in the final node.
+    # This is not necessary if you call a single LLM but might be important in case you call multiple models within the node and want to filter events
+    # from only one of them.
+    final_model = final_model.with_config(tags=["final_node"])
+    tool_node = ToolNode(tools=tools)   # runs the async tools with ainvoke when the graph is streamed with astream
+
+    async def call_model(state: MessagesState):
+        messages = state["messages"]
+        response = await model.ainvoke(messages)
+        # We return a list, because this will get added to the existing list
+        return {"messages": [response]}
+
+    async def call_final_model(state: MessagesState):
+        messages = state["messages"]
+        last_ai_message = messages[-1]
+        response = await final_model.ainvoke(
+            [
+                SystemMessage("Rewrite this in the voice of Al Roker"),
+                HumanMessage(last_ai_message.content),
+            ]
+        )
+        # overwrite the last AI message from the agent
+        response.id = last_ai_message.id
+        return {"messages": [response]}
+
+    builder = StateGraph(MessagesState)
+
+    builder.add_node("agent", call_model)
+    builder.add_node("tools", tool_node)
+    # add a separate final node
+    builder.add_node("final", call_final_model)
+
+    builder.add_edge(START, "agent")
+    builder.add_conditional_edges(
+        "agent",
+        should_continue,
+    )
+
+    builder.add_edge("tools", "agent")
+    builder.add_edge("final", END)
+
+    return builder.compile()
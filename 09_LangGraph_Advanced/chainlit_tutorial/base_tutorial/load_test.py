@@ -0,0 +1,98 @@
+"""
+Local load test of the tutorial graph, with a fake model answering after a fixed latency (no API key needed).
+
+    python load_test.py --sessions 20 --latency 0.5
+
+Each session is one chat turn: agent (tool call) -> tools -> agent (answer) -> final, i.e. three model calls.
+The async graph streamed with astream serves all the sessions concurrently, so N sessions finish in about the
+time of one. For comparison, the sessions are also run one after the other: that is what the previous app did,
+since its sync graph.stream held the event loop for a whole turn, so every other user waited.
+"""
+
+# Standard library
+import argparse
+import asyncio
+import time
+from typing import Any, List, Optional
+# LangChain and LangGraph
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from graph import build_graph
+
+
+class FakeWeatherModel(BaseChatModel):
+    """Calls get_weather on the first turn, then answers (or rewrites, in the final node). Every call takes `latency` seconds."""
+
+    latency: float = 0.5
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-weather"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "FakeWeatherModel":
+        return self
+
+    def _reply(self, messages: List[BaseMessage]) -> ChatResult:
+        if isinstance(messages[0], SystemMessage):      # final node: "Rewrite this in the voice of Al Roker"
+            message = AIMessage(content=f"Well folks, {messages[-1].content}")
+        elif not any(isinstance(m, ToolMessage) for m in messages):
+            message = AIMessage(content="", tool_calls=[{"name": "get_weather", "args": {"city": "sf"}, "id": "call_1"}])
+        else:
+            message = AIMessage(content=f"Here is the forecast: {messages[-1].content}")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._reply(messages)
+
+
+async def async_session(graph, i: int) -> str:
+    """What on_message does: stream the final node's tokens with astream."""
+    answer = ""
+    async for msg, metadata in graph.astream({"messages": [HumanMessage(content=f"weather in sf? ({i})")]},
+                                             stream_mode="messages",
+                                             config={"configurable": {"thread_id": f"session-{i}"}}):
+        if msg.content and not isinstance(msg, HumanMessage) and metadata["langgraph_node"] == "final":
+            answer += msg.content
+    return answer
+
+
+async def run(graph, sessions: int, concurrent: bool = True) -> float:
+    start = time.monotonic()
+    if concurrent:
+        answers = await asyncio.gather(*(async_session(graph, i) for i in range(sessions)))
+    else:
+        answers = [await async_session(graph, i) for i in range(sessions)]
+    assert all(answers), "a session got no answer"
+    return time.monotonic() - start
+
+
+async def main(sessions: int, latency: float, sequential: bool):
+    model = FakeWeatherModel(latency=latency)
+    graph = build_graph(model, model)
+
+    one = await run(graph, 1)
+    print(f"1 session: {one:.2f}s")
+    many = await run(graph, sessions)
+    print(f"{sessions} concurrent sessions: {many:.2f}s ({many / one:.1f}x one session)")
+    if sequential:
+        many = await run(graph, sessions, concurrent=False)
+        print(f"{sessions} sessions one after the other (blocking handler): {many:.2f}s ({many / one:.1f}x one session)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per model call")
+    parser.add_argument("--no-sequential", dest="sequential", action="store_false",
+                        help="skip the comparison with sessions served one after the other")
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.latency, args.sequential))
@@ -4,16 +4,24 @@ from langgraph.prebuilt import InjectedState
 from langchain_core.messages import ToolMessage
 import geopandas as gpd
 import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.figure import Figure
 import folium
 import os
 from pathlib import Path
 from typing_extensions import Annotated
-from typing import Union, Dict
-from langchain_experimental.utilities import PythonREPL
+from typing import Union, Dict, List, Optional
+from langchain_core.runnables import RunnableConfig
 from langgraph.types import Command
 from langgraph.graph import MessagesState
+from agent_ui.tool_cache import cached_tool
+from agent_ui.handles import DatasetHandle, StaleHandleError, describe_handle, merge_handles
+from agent_ui.scheduler import scheduler
+from agent_ui.repl_pool import repl_pool
+from agent_ui.artifacts import artifact_store
+from agent_ui.sql import MAX_ROWS, format_result
+from agent_ui.fuzzy import get_index
+from agent_ui.profiling import get_profile
+from agent_ui.spatial import count_within, features_table, get_spatial_index, resolve_target
+from agent_ui.compaction import history_compactor
 
 
 # setup keys
@@ -33,42 +41,23 @@ _set_if_undefined("OPENAI_API_KEY")
 _set_if_undefined("ANTHROPIC_API_KEY")
 
 
-DATASET_FOLDER = "./LLM_data"
+# dataset tools shared with AgentChatUI, on the files next to this app
+os.environ.setdefault("DATASET_FOLDER", "./LLM_data")
+from agent_ui.tools import catalog, list_loadable_datasets, load_dataset, unload_dataset, sql_query, aggregate_dataset, \
+    top_k_rows
 
 
-def merge_dictionary_entries(existing_dict: Union[dict, None] = None, new_dict: Union[dict, None] = None) -> dict:
-    """
-    Custom reducer to merge dictionary updates:
-    adds keys from new_dict only if they are not already in existing_dict.
-    """
-    if not existing_dict:
-        existing_dict = {}
-    if not new_dict:
-        new_dict = {}
-
-    for key, data in new_dict.items():
-        if key not in existing_dict:
-            existing_dict[key] = data
-    
-    return existing_dict
-
 # custom state schema 
 from langgraph.managed.is_last_step import RemainingSteps
 
 class AgentState(MessagesState):
-    loaded: Annotated[Dict[str, Union[pd.DataFrame, gpd.GeoDataFrame]], merge_dictionary_entries]
+    loaded: Annotated[Dict[str, DatasetHandle], merge_handles]     # frames live in dataset_store
     remaining_steps: RemainingSteps     # key to let LangGraph automatically manage graph's supersteps
 
 
 # ----------------------
 # Tool: list datasets
 # ----------------------
-@tool
-def list_loadable_datasets() -> str:
-    """Lists all available parquet datasets in the dataset folder."""
-    files = [f for f in os.listdir(DATASET_FOLDER) if f.endswith(".parquet")]
-    return "\n".join(files) if files else "No parquet datasets found."
-
 @tool
 def list_inmemory_datasets(
     state: Annotated[AgentState, InjectedState],
@@ -79,11 +68,7 @@ def list_inmemory_datasets(
         output = "No loaded datasets in memory. Use list_loadable_datasets() to see available files."
     
     else:
-        lines = [
-            f"- {name}: {'GeoDataFrame' if isinstance(df, gpd.GeoDataFrame) else 'DataFrame'} (shape={df.shape})"
-            for name, df in state["loaded"].items()
-        ]
-        output = "\n".join(lines)
+        output = "\n".join(describe_handle(handle) for handle in state["loaded"].values())
 
     return Command(update={
         "messages": [ToolMessage(content=output, tool_call_id=tool_call_id)],
@@ -93,102 +78,56 @@ def list_inmemory_datasets(
 # ----------------------
 # Tool: python repl
 # ----------------------
-repl = PythonREPL()
+repl_pool.start()     # pre-warmed worker processes, one per chat session
 @tool
 def python_repl_tool(
     code: Annotated[str, "The python code to execute"], 
     state: Annotated[AgentState, InjectedState], 
-    tool_call_id: Annotated[str, InjectedToolCallId]
+    tool_call_id: Annotated[str, InjectedToolCallId],
+    config: RunnableConfig,
 ) -> Command:
     """
     Use this to execute python code. If you want to see the output of a value,
     print it out with `print(...)`. This is visible to the user. 
     """
 
-    for name, df in state["loaded"].items():
-        repl.globals[name] = df
-    
-    try:
-        result = repl.run(code)
-    except BaseException as e:
-        tool_err_1 = f"Failed to execute. Error: {repr(e)}"
+    # each session has its own worker process (variables persist across calls), datasets are memory-mapped into it
+    session_id = config.get("configurable", {}).get("thread_id", "default")
+    result = repl_pool.run(session_id, code, state["loaded"])
+
+    if result["error"]:
+        tool_err_1 = f"Failed to execute. Error: {result['error']}"
+        if result["stdout"]:
+            tool_err_1 += f"\nStdout: {result['stdout']}"
         return Command(update={"messages": [ToolMessage(content=tool_err_1, tool_call_id=tool_call_id)]})
-    
-    # Check if a figure was created
-    fig: Figure | None = None
-    if plt.get_fignums():  # returns list of active figure numbers
-        fig = plt.gcf()
-
-    # Scan globals and locals for Folium maps 
-    ns = {}
-    if hasattr(repl, "locals"):
-        ns.update(repl.locals)
-    map_obj = next((v for v in ns.values() if isinstance(v, folium.Map)), None)
-    iframe_html = map_obj.get_root()._repr_html_() if map_obj else None
-    if map_obj:
-        iframe_html = map_obj.get_root()._repr_html_()
-    
-    tool_output = f"Successfully executed:\n```python\n{code}\n```\nStdout: {result}"
 
+    tool_output = f"Successfully executed:\n```python\n{code}\n```\nStdout: {result['stdout']}"
+    if result.get("spilled"):
+        # the session went over its memory budget: the least recently used frames were written to disk
+        tool_output += (f"\nNote: variables {result['spilled']} were moved to disk to free memory, "
+                        f"they are read back automatically when a cell uses them.")
+
+    # stored under this tool call: the message only carries references, the frontend looks them up by id
     artifacts = {}
-    if fig is not None:
-        artifacts["image"] = fig
-    if iframe_html is not None:
-        artifacts["html"] = iframe_html
+    if result["image"] is not None:
+        # figure drawn by the cell, already encoded and closed in the worker: no Figure object reaches this process
+        artifacts["image"] = artifact_store.put(tool_call_id, "image", result["image"], result.get("image_format"))
+    if result["html"] is not None:
+        artifacts["html"] = artifact_store.put(tool_call_id, "html", result["html"])       # folium map created by the cell
 
     return Command(update={"messages": [ToolMessage(content=tool_output, artifact=artifacts, tool_call_id=tool_call_id)]})
 
 
-# ----------------------
-# Tool: load datasets
-# ----------------------
-@tool
-def load_dataset(file_name: str, 
-                 tool_call_id: Annotated[str, InjectedToolCallId]
-) -> Command:
-    """
-    Loads a Parquet dataset (optionally as GeoDataFrame) and updates state['loaded'][name].
-    """
-    update = {}
-
-    file_stem = Path(file_name).stem
-    file_name = f"{file_stem}.parquet"
-    path = Path(DATASET_FOLDER) / file_name
-
-    if not path.exists():
-        available_files = os.listdir(DATASET_FOLDER)
-        tool_err_result1 = f"File '{file_name}' not found. Available files: {available_files}"
-        return Command(update={"messages": [ToolMessage(tool_err_result1, tool_call_id=tool_call_id)]})
-
-
-    try:
-        df = pd.read_parquet(path)
-        if "geometry" in df.columns:
-            try:
-                df = gpd.read_parquet(path)
-            except Exception as geo_err:
-                tool_err_result2 = f"Geometry column found but failed to load as GeoDataFrame: {geo_err}"
-                return Command(update={"messages": [ToolMessage(tool_err_result2, tool_call_id=tool_call_id)]})
-            
-        update[file_stem] = df
-
-    except Exception as e:
-        tool_err_result3 = f"Error loading dataset '{file_name}': {e}"
-        return Command(update={"messages": [ToolMessage(tool_err_result3, tool_call_id=tool_call_id)]})
-
-
-    return Command(update={
-        "loaded": update,   
-        "messages": [
-            ToolMessage(f"Loaded dataset '{file_stem}' into memory.", tool_call_id=tool_call_id)
-        ]
-    })
-
-
 # ----------------------
 # Tool: describe_dataset
 # ----------------------
-@tool
+def catalog_version(name: str) -> str | None:
+    info = catalog.get(name)
+    return info.version if info else None
+
+# a dataset can be loaded again with other read options: its handle is part of the state version
+@cached_tool(version=lambda name, state, tool_call_id: (tuple(sorted(state.get("loaded", {}))),
+                                                        state.get("loaded", {}).get(name), catalog_version(name)))
 def describe_dataset(name: str, 
                      state: Annotated[AgentState, InjectedState], 
                      tool_call_id: Annotated[str, InjectedToolCallId]
@@ -196,61 +135,36 @@ def describe_dataset(name: str,
     """
     Generates a detailed description for a loaded dataset.
 
-    This function returns a summary including:
-    - the dataset type (DataFrame or GeoDataFrame),
-    - a preview of the first few rows,
-    - and the list of column names.
+    This function returns a profile including:
+    - the dataset type (DataFrame or GeoDataFrame) and shape,
+    - for every column: dtype, null rate, number of distinct values, min/max and mean, most frequent values,
+      and for geometry columns the geometry types, bounds and CRS,
+    - a preview of the first few rows.
+    Use it instead of describe(), isnull().sum() or value_counts() in the REPL.
+    Datasets that are not loaded yet are described from their file schema (no preview), without loading them.
     """
 
     loaded = state.get('loaded')
 
-    df = loaded.get(name)
-    if df is None:
+    handle = loaded.get(name)
+    if handle is None:
+        info = catalog.get(name)
+        if info is not None:
+            tool_output = f"{info.describe()}\n\n(not loaded yet: use `load_dataset` to analyze it)"
+            return Command(update={"messages": [ToolMessage(content=tool_output, tool_call_id=tool_call_id)]})
+
         loaded_keys = list(loaded.keys())
-        available_data = [f for f in os.listdir(DATASET_FOLDER) if f.endswith(".parquet")]
+        available_data = [f"{info.name}.parquet" for info in catalog.list()]
         tool_err = f"Dataset '{name}' not found. \nLoaded datasets are: {loaded_keys} \nAvailable datasets to load are {available_data}"
         return Command(update={"messages": [ToolMessage(tool_err, tool_call_id=tool_call_id)]})
 
-    dtype_str = type(df).__name__   # DataFrame or GeoDataFrame
-    shape_info = f"{df.shape[0]} rows x {df.shape[1]} columns" # dataset shape
-    # Show only the first N columns and limit long values
-    MAX_COLS = 5
-    MAX_ROWS = 5
-
     try:
-        # Limit columns
-        preview_df = df.iloc[:MAX_ROWS, :MAX_COLS].copy()
-        # Truncate long values
-        for col in preview_df.columns:
-            preview_df[col] = preview_df[col].astype(str).str.slice(0, 40)
-
-        head_str = preview_df.to_string(index=False)
+        # computed once per dataset version and read options, then shared by all sessions
+        tool_output = get_profile(handle).render()
     except Exception as e:
-        tool_err = f"[Could not generate preview: {str(e)}]"
+        tool_err = f"[Could not profile dataset '{name}': {e}]"
         return Command(update={"messages": [ToolMessage(content=tool_err, tool_call_id=tool_call_id)]})
 
-    # show column types too
-    cols_str = "\n".join([f"- {col} ({df[col].dtype})" for col in df.columns[:MAX_COLS]])
-    if df.shape[1] > MAX_COLS:
-        cols_str += f"\n...and {df.shape[1] - MAX_COLS} more columns"
-
-    geometry_info = ""
-    if dtype_str.lower() == "geodataframe":
-        geometry_col = df.geometry.name if df.geometry.name in df.columns else None
-        if geometry_col:
-            geometry_info = f"\nActive geometry column: '{geometry_col}'"
-        else:
-            geometry_info = "\n No active geometry column set!"
-
-
-    tool_output = (
-        f"{dtype_str} | {shape_info}\n"
-        f"{geometry_info}\n"
-        f"---\n"
-        f"Preview (first {MAX_ROWS} rows, {MAX_COLS} columns):\n{head_str}\n\n"
-        f"Columns:\n{cols_str}"
-    )
-
     return Command(
         update={
             "messages" : [ToolMessage(content=tool_output, tool_call_id=tool_call_id)],
@@ -261,12 +175,10 @@ def describe_dataset(name: str,
 # ----------------------
 # Tool: fuzzy match name
 # ----------------------
-from rapidfuzz import process, fuzz
-
 @tool
 def fuzzy_match_name(dataset_name : str, 
                      dataset_column : str, 
-                     input_str : str, 
+                     input_str : Union[str, List[str]], 
                      state : Annotated[AgentState, InjectedState],
                      tool_call_id: Annotated[str, InjectedToolCallId],
                      threshold : int = 65,
@@ -274,6 +186,7 @@ def fuzzy_match_name(dataset_name : str,
     """
     Performs fuzzy matching to find the best match for the input string
     within a specified column of a dataset.
+    Pass a list of strings to resolve many names in one call.
 
     Returns the best matching string and score if above the threshold,
     otherwise a message indicating no match.
@@ -287,32 +200,27 @@ def fuzzy_match_name(dataset_name : str,
     loaded = state.get('loaded')
 
     try:
-        known_names = (
-            loaded[dataset_name][dataset_column]
-            .dropna()
-            .astype(str)
-            .str.strip()
-            .unique()
-        )
+        # built once per dataset version and column, then shared by all calls and sessions
+        index = get_index(loaded[dataset_name], dataset_column)
     except KeyError:
         tool_err = f"Dataset '{dataset_name}' or column '{dataset_column}' not found."
         return Command(update={"messages": [ToolMessage(tool_err, tool_call_id=tool_call_id)]})
+    except StaleHandleError as e:
+        return Command(update={"messages": [ToolMessage(str(e), tool_call_id=tool_call_id)]})
 
-    match_result = process.extractOne(
-        input_str,
-        known_names,
-        scorer=fuzz.token_sort_ratio
-    )
-
-    if match_result is None:
+    if not len(index):
         tool_err2 = f"No match candidates available in {dataset_name}.{dataset_column}."
-        Command(update={"messages": [ToolMessage(tool_err2, tool_call_id=tool_call_id)]})
+        return Command(update={"messages": [ToolMessage(tool_err2, tool_call_id=tool_call_id)]})
 
-    match, score, _ = match_result
-    if score >= threshold:
-        tool_output = f"{match} | score: {score}"
-    else:
-        tool_output = f"No match found for '{input_str}' in '{dataset_name}.{dataset_column}' (best score: {score})"
+    queries = [input_str] if isinstance(input_str, str) else list(input_str)
+    lines = []
+    for query, (match, score) in zip(queries, index.match(queries, threshold=threshold)):
+        if match is not None:
+            line = f"{match} | score: {score:.0f}"
+        else:
+            line = f"No match found for '{query}' in '{dataset_name}.{dataset_column}' (best score: {score:.0f})"
+        lines.append(line if isinstance(input_str, str) else f"{query} -> {line}")
+    tool_output = "\n".join(lines)
 
     return Command(
         update={
@@ -321,25 +229,123 @@ def fuzzy_match_name(dataset_name : str,
     )
 
 
+# ----------------------
+# Tool: spatial queries
+# ----------------------
+# geometries are projected to meters and indexed (STRtree) once per dataset version, then shared by all calls
+@tool
+def features_within_distance(dataset_name: str,
+                             distance_m: float,
+                             state: Annotated[AgentState, InjectedState],
+                             tool_call_id: Annotated[str, InjectedToolCallId],
+                             lon: Optional[float] = None,
+                             lat: Optional[float] = None,
+                             target_dataset: Optional[str] = None,
+                             target_column: Optional[str] = None,
+                             target_value: Optional[str] = None,
+                             max_rows: int = 50,
+) -> Command:
+    """
+    Finds the features of a loaded spatial dataset within `distance_m` meters of a target, closest first.
+    The target is either a point (lon, lat in WGS84), or the features of a loaded dataset
+    whose `target_column` equals `target_value` (e.g. target_dataset="quartieri", target_column="quartiere", target_value="Navile").
+    Distance 0 selects the features intersecting the target.
+
+    Example: ("points_of_interest", 1000, target_dataset="quartieri", target_column="quartiere", target_value="Navile")
+    """
+    loaded = state.get('loaded', {})
+    try:
+        target = resolve_target(loaded, lon, lat, target_dataset, target_column, target_value)
+        index = get_spatial_index(loaded[dataset_name])
+        positions, distances = index.within_distance(target, distance_m)
+        table = features_table(index, positions[:max_rows], distances[:max_rows])
+        tool_output = f"{len(positions)} features of '{dataset_name}' within {distance_m:g} m.\n" + \
+            format_result(table, len(positions) > max_rows)
+    except KeyError:
+        tool_output = f"Dataset '{dataset_name}' is not loaded. Loaded datasets: {list(loaded)}"
+    except ValueError as e:
+        tool_output = str(e)
+
+    return Command(update={"messages": [ToolMessage(content=tool_output, tool_call_id=tool_call_id)]})
+
+@tool
+def nearest_features(dataset_name: str,
+                     state: Annotated[AgentState, InjectedState],
+                     tool_call_id: Annotated[str, InjectedToolCallId],
+                     k: int = 5,
+                     lon: Optional[float] = None,
+                     lat: Optional[float] = None,
+                     target_dataset: Optional[str] = None,
+                     target_column: Optional[str] = None,
+                     target_value: Optional[str] = None,
+) -> Command:
+    """
+    Finds the k features of a loaded spatial dataset closest to a target, with their distance in meters.
+    The target is given like in `features_within_distance`: lon/lat, or target_dataset/target_column/target_value.
+    """
+    loaded = state.get('loaded', {})
+    try:
+        target = resolve_target(loaded, lon, lat, target_dataset, target_column, target_value)
+        index = get_spatial_index(loaded[dataset_name])
+        positions, distances = index.nearest(target, min(k, MAX_ROWS))
+        tool_output = format_result(features_table(index, positions, distances), False)
+    except KeyError:
+        tool_output = f"Dataset '{dataset_name}' is not loaded. Loaded datasets: {list(loaded)}"
+    except ValueError as e:
+        tool_output = str(e)
+
+    return Command(update={"messages": [ToolMessage(content=tool_output, tool_call_id=tool_call_id)]})
+
+@tool
+def points_in_polygons(points_dataset: str,
+                       polygons_dataset: str,
+                       polygon_label_column: str,
+                       state: Annotated[AgentState, InjectedState],
+                       tool_call_id: Annotated[str, InjectedToolCallId],
+) -> Command:
+    """
+    Spatial join of two loaded datasets: counts how many features of `points_dataset` fall within
+    each polygon of `polygons_dataset`, labelled by `polygon_label_column`.
+
+    Example: ("points_of_interest", "quartieri", "quartiere") -> number of points of interest per quartiere
+    """
+    loaded = state.get('loaded', {})
+    try:
+        points = get_spatial_index(loaded[points_dataset])
+        polygons = get_spatial_index(loaded[polygons_dataset])
+        table = count_within(points, polygons, polygon_label_column)
+        tool_output = format_result(table.head(MAX_ROWS), len(table) > MAX_ROWS)
+    except KeyError as e:
+        tool_output = f"Dataset {e} is not loaded. Loaded datasets: {list(loaded)}"
+    except ValueError as e:
+        tool_output = str(e)
+
+    return Command(update={"messages": [ToolMessage(content=tool_output, tool_call_id=tool_call_id)]})
+
+
 analyst_suffix = (
     "You are a data analyst. Use your tools to explore and load datasets relevant to the task, analize them and then produce a visualization if requested.\n"
     "The files you need to load are in the subdirectory at ./LLM_data as .parquet files\n"
     "You can check which datasets are currently loaded with the `list_inmemory_datasets` tool, \
     and which datasets are available to load using the `list_loadable_datasets` tool.\n"
-    "You can describe datasets with the `describe_dataset` tool.\n"
+    "Use `unload_dataset` to free datasets you no longer need; loading a dataset again replaces it.\n"
+    "You can describe datasets with the `describe_dataset` tool: per-column statistics (nulls, distinct values, ranges, top values, geometry bounds) and a preview, so you rarely need the REPL to inspect a dataset (it also works on datasets that are not loaded yet).\n"
+    "For counts, aggregations, filters or joins on tabular columns, prefer the `sql_query` tool: it runs SQL directly on the parquet files, without loading them.\n"
+    "For datasets too large to load, use `aggregate_dataset` (group-by, counts) and `top_k_rows`: they stream the file in bounded memory.\n"
     "You can write custom python code with your `python_repl_tool`\n"
     "When asked to analize a law, use your `analize_law` tool. Laws are stored as graph state, so don't try to get them from datasets. Use your `analize_law` tool.\n\n"
     "**VERY IMPORTANT** : **When printing Python code, ALWAYS use `print(...)`**. Do NOT rely on implicit output like `quartieri.head()`. ALWAYS USE `print(...)`\n"
     "In your `python_repl_tool`, loaded datasets will appear as variables (e.g., if you load quartieri.parquet, the dataset will be accessible as `quartieri`)\n\n"
     "All spatial datasets use a geometry column (GeoDataFrame) containing shapely Point or Polygon objects.\n"
     "Always use the 'geometry' field when doing spatial operations, and avoid computing or reconstructing from latitude/longitude.\n"
-    "When doing spatial queries (e.g., selecting features within 1 km), ensure you are working in a projected CRS (not WGS84). Use `.to_crs(epsg=32632)` to convert if needed.\n\n"
+    "For spatial queries on loaded datasets, use `features_within_distance` (e.g. features within 1 km), `nearest_features` and `points_in_polygons` (counts per polygon): they work in meters on cached indexes.\n"
+    "Only for other spatial operations in `python_repl_tool`, ensure you are working in a projected CRS (not WGS84): use `.to_crs(epsg=32632)` if needed.\n\n"
     "When matching column names in datasets, use the fuzzy_name_match() tool to first inspect what name the item is registered as in the dataframe.\n\n"
     "-------\n"
     "**Visualization**\n"
     "If visualization is requested, you must:\n"
     "   - Use the `python_repl_tool` to create **one clear, interpretable figure**, based on the request. DO NOT show the figure with .show().\n"
-    "   - save the output figure to the `SAVING_DIRECTORY` folder, i.e. `./visualizer_outputs/`.\n"
+    "   - you don't need to save it: the figure drawn by the cell (or the folium map it creates) is shown to the user automatically.\n"
     "Always aim to produce visually appealing plots. Your visualizations should be easy to interpret and presentation-ready."
     "\nDefault visualization preferences:\n"
     "- Use line plots, bar charts, or scatter plots for tabular data.\n"
@@ -347,16 +353,25 @@ analyst_suffix = (
 )
 
 from langgraph.prebuilt import create_react_agent
+from langchain.chat_models import init_chat_model
 
 analyst_agent = create_react_agent(
-    model="openai:gpt-4o",  
+    model=init_chat_model("openai:gpt-4o", **scheduler.client_kwargs("openai:gpt-4o")),
     tools=[list_loadable_datasets,
            list_inmemory_datasets, 
            load_dataset, 
+           unload_dataset,
            describe_dataset, 
+           sql_query,
+           aggregate_dataset,
+           top_k_rows,
            python_repl_tool,
-           fuzzy_match_name,],
+           fuzzy_match_name,
+           features_within_distance,
+           nearest_features,
+           points_in_polygons,],
     prompt=analyst_suffix,
+    pre_model_hook=history_compactor.hook("analyst_agent"),    # old tool outputs summarized for the model
     name="analyst_agent",
     state_schema=AgentState
 )
\ No newline at end of file
@@ -1,44 +1,30 @@
 from langgraph_supervisor import create_supervisor
 from langchain.chat_models import init_chat_model
-from analyst import analyst_agent, AgentState 
-import matplotlib
+from analyst import analyst_agent, AgentState, catalog
+from agent_ui.llm_cache import enable_llm_cache
+from agent_ui.scheduler import scheduler
+from agent_ui.repl_pool import repl_pool
+from agent_ui.artifacts import artifact_store
+from agent_ui.checkpoint import checkpointer
+from agent_ui.router import PreRouter, with_fast_path
+from agent_ui.chat_stream import TurnStream
+from agent_ui.compaction import history_compactor
 
 import chainlit as cl
+from chainlit.server import app as chainlit_server
+from fastapi import HTTPException
+from fastapi.responses import FileResponse
+from fastapi.routing import APIRoute
 
 from langchain.schema.runnable.config import RunnableConfig
-from langchain_core.messages import HumanMessage, ToolMessage, AIMessage
+from langchain_core.messages import HumanMessage, ToolMessage
 
-from pathlib import Path
-
-
-# helper functions to get last html and last png from outputs folder
-
-def get_html(folder = "./visualizer_outputs"):
-    folder = Path(folder)          # or wherever you save them
-    html_files = sorted(folder.glob("*.html"),
-                        key=lambda p: p.stat().st_mtime,
-                        reverse=True)
-    if not html_files:
-        return f"no html file found"
-    
-    html = html_files[0].read_text(encoding="utf-8")
-
-    return html
-
-def get_img(folder="./visualizer_outputs"):
-    folder = Path(folder)
-    png_files = sorted(folder.glob("*.png"),
-                       key=lambda p: p.stat().st_mtime,
-                       reverse=True)
-    if not png_files:
-        return "No PNG file found"
-
-    return str(png_files[0])
+enable_llm_cache()   # set LLM_CACHE_MODE=record|replay to record/replay LLM responses
 
 
 # build graph with create_supervisor()
 supervisor = create_supervisor(
-    model=init_chat_model("anthropic:claude-sonnet-4-0"),   
+    model=init_chat_model("anthropic:claude-sonnet-4-0", **scheduler.client_kwargs("anthropic:claude-sonnet-4-0")),
     agents=[analyst_agent],
     prompt=(
         "You are coordinating a data analyst. He can analize data reguarding the city of Bologna\n\n"
@@ -46,12 +32,16 @@ supervisor = create_supervisor(
         "You must only manage the workflow, greet the user and report what the workers do to the user."
     ),
     state_schema = AgentState,  
+    pre_model_hook=history_compactor.hook("supervisor"),    # old tool outputs summarized for the model
     add_handoff_back_messages=True,
     output_mode="full_history"
 )
 
-# compile graph
-graph = supervisor.compile(name="supervisor")
+# compile graph: catalog listings and unambiguous requests skip the supervisor LLM (see agent_ui.router);
+# each chat session is a thread, persisted in SQLite (CHECKPOINT_DB) and resumed on the next message
+router = PreRouter(dataset_names=lambda: [info.name for info in catalog.list()])
+graph = with_fast_path(supervisor.compile(name="supervisor"), analyst_agent, AgentState, catalog, router) \
+    .compile(checkpointer=checkpointer)
 
 
 '''@cl.on_chat_start
@@ -63,79 +53,62 @@ async def on_chat_start():
 @cl.on_chat_end
 async def on_chat_end():
     print("The user disconnected!")
+    print(f"Fast path: {router.stats()}")
+    print(f"History compaction: {history_compactor.stats()}")
+    repl_pool.release(cl.context.session.id)    # stop this session's python worker
+
+
+async def serve_artifact(name: str):
+    """Maps are loaded by the browser from here (an iframe src), not sent through the websocket."""
+    path = artifact_store.path_of(name)
+    if path is None:
+        raise HTTPException(status_code=404)
+    return FileResponse(path)
+
+# ahead of chainlit's catch-all route, which serves the UI for any other path
+chainlit_server.router.routes.insert(0, APIRoute("/artifacts/{name}", serve_artifact, methods=["GET"]))
+
+
+async def show_artifacts(message: ToolMessage):
+    """
+    The figures and maps of an analyst tool call, looked up by its tool_call_id. Its message carries the references
+    too: they are indexed again if the app restarted since the call (the checkpoint outlives the in-memory index).
+    """
+    refs = artifact_store.get(message.tool_call_id) or artifact_store.restore(list(message.artifact.values()))
+    for ref in refs:
+        if ref["kind"] == "image":
+            image = cl.Image(path=ref["path"], name="Generated Plot", display="inline", size="large")
+            await cl.Message(content="Generated plot:", elements=[image]).send()
+        else:
+            await cl.Message(
+                content="Interactive map:",
+                elements=[
+                    cl.CustomElement(
+                        name="HtmlElement",
+                        props={"src": f"/artifacts/{artifact_store.file_name(ref)}"},
+                        display="inline",
+                    )
+                ]
+            ).send()
 
 
 @cl.on_message
 async def on_message(msg: cl.Message):
-    matplotlib.use("Agg")   # this should stop displaying with .show()
-
     config = {"configurable": {"thread_id": cl.context.session.id}, "recursion_limit" : 35}
     cb = cl.LangchainCallbackHandler()
 
     await cl.Message(content="Thinking...").send()
-    
-    async for chunk, metadata in graph.astream({"messages": [HumanMessage(content=msg.content)]}, stream_mode="messages", config=RunnableConfig(callbacks=[cb], **config)):
-
-        # problem: all images in a run are still in memory. If i ask for another plot, the previous one will be shown as well.   
-        if (
-            chunk.content
-            and isinstance(chunk, AIMessage)
-            and metadata["langgraph_node"] == "supervisor"
-            ):
-            text = chunk.content[-1].get('text')
-            await cl.Message(content=text, author="supervisor").send()
-
-        elif isinstance(chunk, ToolMessage) and metadata["langgraph_node"] == "analyst_agent":
-            
-            '''if not chunk.artifact:
-                tool_output = chunk.content
-                # tool_name = chunk.name
-                await cl.Message(
-                    content=f"🔧 Tool output from analyst:\n```\n{tool_output}\n```",
-                    author="tool",
-                    type="tool"
-                ).send()
-            else:'''
-
-            # workarounds: streaming toolmessages as chunks conflicts with how i save images in toolmessages (i get same image / same html printed many times)
-            # so i get the last png from folder instead. But if the model doesn't save it we're fucked, so fix this
-            if chunk.artifact:
-                
-                fig = chunk.artifact.get("image")
-                html = chunk.artifact.get("html")
-
-                if fig:
-                    print("image detected")
-
-                    last_img_path = get_img()
-                    image = cl.Image(path=last_img_path, name="Generated Plot", display="inline", size="large")
-
-                    await cl.Message(
-                        content="Generated plot:",
-                        elements=[image]
-                    ).send()
-
-                if html:    
-                    print("html detected!")
-
-                    #retrieve last produced html 
-                    last_html = get_html()  # limited: only gets the last html from folder
-
-                    await cl.Message(
-                        content="Interactive map:",
-                        elements=[
-                            cl.CustomElement(
-                                name="HtmlElement",
-                                props={"html": last_html},
-                                display="inline",
-                            )
-                        ]
-                    ).send()
-
-                    
-
-
-
-# also: if it detects fig AND html it shows a figure. Why?  
-
-# https://www.datacamp.com/tutorial/chainlit
\ No newline at end of file
+
+    # who speaks is decided from the subgraph namespace of each chunk, see agent_ui.chat_stream
+    turn = TurnStream(new_message=lambda author: cl.Message(content="", author=author),
+                      show_artifacts=show_artifacts, analyst=analyst_agent.name)
+    try:
+        async for namespace, mode, payload in graph.astream({"messages": [HumanMessage(content=msg.content)]}, stream_mode=["messages", "custom"], subgraphs=True, config=RunnableConfig(callbacks=[cb], **config)):
+            await turn.feed(namespace, mode, payload)
+    finally:
+        await turn.close()      # an error or a stopped task still flushes and finalizes the streamed messages
+    if turn.tokens_saved:
+        print(f"History compaction: {turn.tokens_saved} prompt tokens saved this turn")
+
+
+# https://www.datacamp.com/tutorial/chainlit
@@ -1,8 +1,8 @@
 export default function HtmlElement() {
   return (
     <iframe
-      sandbox="allow-scripts allow-same-origin"
-      srcDoc={props.html}             /* full file content arrives via prop */
+      sandbox="allow-scripts"
+      src={props.src}                 /* the map file, served by the app: only its URL arrives via prop */
       style={{ width: '100%', height: '500px', border: 'none' }}
     />
   );